@@ -0,0 +1,164 @@
+"""
+Content-addressed cache in front of LLM invocations.
+
+Keys are a SHA-256 of the model name, the call parameters and the normalized prompt, so
+the same question asked with the same settings is answered once. Two tiers:
+
+- memory: a per-process LRU bounded by ``MAX_ENTRIES`` with a TTL;
+- persistent (optional): a Django cache alias from ``CACHES`` (e.g. DatabaseCache or
+  FileBasedCache) shared by all workers and surviving restarts.
+
+Settings live in ``LLM_RESPONSE_CACHE``. Lookups are counted in
+``journey_llm_cache_requests_total`` and in ``llm_cache.stats()``.
+"""
+import copy
+import functools
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 1024,
+    'TTL': 60 * 60 * 24,
+    'PERSISTENT_ALIAS': None,  # name of a CACHES entry, or None for memory only
+    'KEY_PREFIX': 'llm:response:',
+}
+
+MISSING = object()
+
+
+def normalize_prompt(text):
+    """Unicode-normalizes the prompt and collapses whitespace."""
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+def make_key(model_name, params, prompt):
+    """Hashes (model, params, normalized prompt) into a stable cache key."""
+    payload = json.dumps(
+        {'model': model_name, 'params': params or {}, 'prompt': normalize_prompt(prompt)},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + optional Django cache) store for LLM responses."""
+
+    def __init__(self, options=None):
+        self._options = options
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @property
+    def options(self):
+        options = dict(DEFAULTS)
+        options.update(self._options if self._options is not None
+                       else getattr(settings, 'LLM_RESPONSE_CACHE', {}))
+        return options
+
+    def _persistent(self, options):
+        alias = options['PERSISTENT_ALIAS']
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        options = self.options
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    metrics.llm_cache_requests.labels('memory', 'hit').inc()
+                    return copy.deepcopy(entry[1])
+                del self._entries[key]
+        metrics.llm_cache_requests.labels('memory', 'miss').inc()
+
+        persistent = self._persistent(options)
+        if persistent is not None:
+            value = persistent.get(options['KEY_PREFIX'] + key, MISSING)
+            if value is not MISSING:
+                metrics.llm_cache_requests.labels('persistent', 'hit').inc()
+                self._remember(key, value, options)
+                with self._lock:
+                    self._stats['hits'] += 1
+                return copy.deepcopy(value)
+            metrics.llm_cache_requests.labels('persistent', 'miss').inc()
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return MISSING
+
+    def set(self, key, value):
+        options = self.options
+        self._remember(key, value, options)
+        persistent = self._persistent(options)
+        if persistent is not None:
+            persistent.set(options['KEY_PREFIX'] + key, value, options['TTL'])
+
+    def _remember(self, key, value, options):
+        max_entries = options['MAX_ENTRIES']
+        if max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + options['TTL'], copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get_or_call(self, model_name, params, prompt, func):
+        """Returns the cached response for the call, invoking ``func()`` on a miss.
+        Exceptions are not cached."""
+        if not self.options['ENABLED']:
+            return func()
+        key = make_key(model_name, params, prompt)
+        value = self.get(key)
+        if value is MISSING:
+            value = func()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats, size=len(self._entries),
+                        hit_ratio=self._stats['hits'] / lookups if lookups else 0.0)
+
+
+llm_cache = LLMResponseCache()
+
+
+def cached_completion(model_name, **params):
+    """Decorator caching a generator function on its arguments.
+
+    The arguments are serialized as the prompt of the key, with string arguments
+    normalized like prompts; the function itself receives them unchanged. It must
+    therefore answer the same for arguments that only differ in whitespace or Unicode
+    form, and be deterministic for a given (model, params, arguments)."""
+    def decorator(func):
+        call_params = dict(params, function=f'{func.__module__}.{func.__qualname__}')
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key_args = [normalize_prompt(arg) if isinstance(arg, str) else arg for arg in args]
+            key_kwargs = {name: normalize_prompt(arg) if isinstance(arg, str) else arg for name, arg in kwargs.items()}
+            prompt = json.dumps([key_args, key_kwargs], sort_keys=True, ensure_ascii=False, default=str)
+            return llm_cache.get_or_call(model_name, call_params, prompt, lambda: func(*args, **kwargs))
+        wrapper.uncached = func
+        return wrapper
+    return decorator
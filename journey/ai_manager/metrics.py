@@ -0,0 +1,48 @@
+"""
+Prometheus metrics for LLM calls, exported on django_prometheus' /metrics endpoint
+(prometheus_client's default registry).
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+llm_cache_requests = Counter(
+    'journey_llm_cache_requests_total',
+    'LLM response cache lookups.',
+    ['tier', 'result'],  # tier: memory | persistent, result: hit | miss
+)
+
+llm_stream_ttft = Histogram(
+    'journey_llm_stream_time_to_first_token_seconds',
+    'Time from the start of a streamed LLM call to its first token.',
+    ['provider', 'mode'],  # mode: sync | async
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16),
+)
+
+llm_streams = Counter(
+    'journey_llm_streams_total',
+    'Streamed LLM responses by outcome.',
+    ['provider', 'mode', 'outcome'],  # outcome: completed | cached | disconnected | error | unavailable
+)
+
+llm_calls = Counter(
+    'journey_llm_calls_total',
+    'LLM provider calls by outcome.',
+    ['provider', 'outcome'],  # success | error | timeout | cancelled | rejected | short_circuited
+)
+
+llm_queue_depth = Gauge(
+    'journey_llm_queue_depth',
+    'Requests waiting for an LLM concurrency slot.',
+    ['provider'],
+)
+
+llm_in_flight = Gauge(
+    'journey_llm_in_flight',
+    'LLM calls currently holding a concurrency slot.',
+    ['provider'],
+)
+
+llm_circuit_state = Gauge(
+    'journey_llm_circuit_state',
+    'Circuit breaker state per provider (0 closed, 1 half-open, 2 open).',
+    ['provider'],
+)
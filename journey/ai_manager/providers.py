@@ -0,0 +1,193 @@
+"""
+Pluggable LLM providers, built lazily and reused per process.
+
+Providers are configured like Django's CACHES::
+
+    LLM_PROVIDERS = {
+        'vertex': {'BACKEND': 'ai_manager.providers.VertexAIProvider', 'OPTIONS': {...}},
+        'stub': {'BACKEND': 'ai_manager.providers.StubProvider', 'OPTIONS': {...}},
+    }
+    LLM_PROVIDER = 'vertex'  # alias used by get_provider()
+
+Nothing talks to Vertex AI or Langfuse until the first call, so workers, management
+commands and tests boot offline. ``StubProvider`` answers deterministically without any
+network access and is meant for local development and load tests.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class BaseProvider:
+    """Interface every provider implements."""
+    model_name = None
+
+    def __init__(self, alias, options):
+        self.alias = alias
+        self.options = options
+        self.params = options.get('PARAMS', {})
+        self.model_name = options.get('MODEL', self.model_name)
+
+    def invoke(self, prompt):
+        """Returns the completion text for ``prompt``."""
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        """Yields the completion in text chunks. Providers without streaming yield it whole."""
+        yield self.invoke(prompt)
+
+    async def astream(self, prompt):
+        """Async variant of ``stream``."""
+        yield await sync_to_async(self.invoke, thread_sensitive=False)(prompt)
+
+
+class VertexAIProvider(BaseProvider):
+    """Gemini on Vertex AI through LangChain, traced with Langfuse when keys are set."""
+    model_name = 'gemini-2.0-flash-lite-001'
+
+    def __init__(self, alias, options):
+        super().__init__(alias, options)
+        self._client = None
+        self._callbacks = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        # Imported here: these packages are slow to import and vertexai.init needs credentials
+        import vertexai
+        from langchain_google_vertexai.chat_models import ChatVertexAI
+
+        vertexai.init(
+            project=self.options.get('PROJECT'),
+            location=self.options.get('LOCATION'),
+            staging_bucket=self.options.get('STAGING_BUCKET'),
+        )
+        client = ChatVertexAI(
+            project=self.options.get('PROJECT'),
+            location=self.options.get('LOCATION'),
+            model_name=self.model_name,
+            **self.params,
+        )
+
+        callbacks = []
+        langfuse = self.options.get('LANGFUSE') or {}
+        if langfuse.get('PUBLIC_KEY') and langfuse.get('SECRET_KEY'):
+            from langfuse.callback import CallbackHandler
+            callbacks.append(CallbackHandler(
+                secret_key=langfuse['SECRET_KEY'],
+                public_key=langfuse['PUBLIC_KEY'],
+                host=langfuse.get('HOST'),
+            ))
+        return client, callbacks
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client, self._callbacks = self._build()
+        return self._client
+
+    def invoke(self, prompt):
+        message = self.client.invoke(prompt, config={'callbacks': self._callbacks})
+        return message.content
+
+    def stream(self, prompt):
+        for chunk in self.client.stream(prompt, config={'callbacks': self._callbacks}):
+            if chunk.content:
+                yield chunk.content
+
+    async def astream(self, prompt):
+        client = await sync_to_async(lambda: self.client, thread_sensitive=False)()
+        async for chunk in client.astream(prompt, config={'callbacks': self._callbacks}):
+            if chunk.content:
+                yield chunk.content
+
+
+class StubProvider(BaseProvider):
+    """Deterministic offline provider: the same prompt always yields the same text.
+
+    ``OPTIONS['LATENCY']`` (seconds) simulates model latency for load tests and
+    ``OPTIONS['TOKEN_LATENCY']`` the delay between streamed tokens.
+    """
+    model_name = 'stub'
+
+    def invoke(self, prompt):
+        latency = self.options.get('LATENCY', 0)
+        if latency:
+            time.sleep(latency)
+        return self.complete(prompt)
+
+    def complete(self, prompt):
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+        return f"[stub:{digest}] {' '.join(prompt.split()[-32:])}"
+
+    def _tokens(self, prompt):
+        words = self.complete(prompt).split(' ')
+        return [word + ' ' for word in words[:-1]] + words[-1:]
+
+    def stream(self, prompt):
+        latency = self.options.get('LATENCY', 0)
+        token_latency = self.options.get('TOKEN_LATENCY', 0)
+        if latency:
+            time.sleep(latency)
+        for token in self._tokens(prompt):
+            if token_latency:
+                time.sleep(token_latency)
+            yield token
+
+    async def astream(self, prompt):
+        latency = self.options.get('LATENCY', 0)
+        token_latency = self.options.get('TOKEN_LATENCY', 0)
+        if latency:
+            await asyncio.sleep(latency)
+        for token in self._tokens(prompt):
+            if token_latency:
+                await asyncio.sleep(token_latency)
+            yield token
+
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def get_provider(alias=None):
+    """Returns the provider for ``alias`` (default ``settings.LLM_PROVIDER``), creating it once per process."""
+    alias = alias or getattr(settings, 'LLM_PROVIDER', 'stub')
+    provider = _providers.get(alias)
+    if provider is None:
+        with _lock:
+            provider = _providers.get(alias)
+            if provider is None:
+                provider = _providers[alias] = _create(alias)
+    return provider
+
+
+def _create(alias):
+    config = getattr(settings, 'LLM_PROVIDERS', {}).get(alias)
+    if config is None:
+        raise ImproperlyConfigured(f"LLM provider '{alias}' is not defined in LLM_PROVIDERS.")
+    try:
+        backend = import_string(config['BACKEND'])
+    except ImportError as exc:
+        raise ImproperlyConfigured(f"Could not import LLM provider backend '{config['BACKEND']}': {exc}")
+    return backend(alias, config.get('OPTIONS', {}))
+
+
+def reset_providers():
+    """Drops every built provider (they are rebuilt on next use)."""
+    with _lock:
+        _providers.clear()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting in ('LLM_PROVIDER', 'LLM_PROVIDERS'):
+        reset_providers()
@@ -0,0 +1,235 @@
+"""
+Isolation of LLM calls from the rest of the API.
+
+Every provider call goes through a per-process ``LLMGuard`` (one per provider alias):
+
+- concurrency gate: at most ``MAX_CONCURRENCY`` calls run at once; others wait up to
+  ``QUEUE_TIMEOUT`` seconds for a slot and are then rejected;
+- deadline: a call that takes longer than ``CALL_TIMEOUT`` is abandoned (its slot is only
+  released when the underlying call really returns, so the cap always holds);
+- circuit breaker: once ``BREAKER_ERROR_RATE`` of the calls in the last ``BREAKER_WINDOW``
+  seconds failed (with at least ``BREAKER_MIN_CALLS`` calls), calls are rejected
+  immediately for ``BREAKER_RESET_TIMEOUT`` seconds, then a single trial call decides
+  whether to close it again.
+
+Rejections raise ``LLMUnavailable`` so views can answer right away with a cached or
+fallback response. Settings live in ``LLM_RESILIENCE``; queue depth, in-flight calls
+and breaker state are exported through django_prometheus' /metrics.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import metrics
+
+DEFAULTS = {
+    'MAX_CONCURRENCY': 8,
+    'QUEUE_TIMEOUT': 2.0,
+    'CALL_TIMEOUT': 30.0,
+    'BREAKER_WINDOW': 60.0,
+    'BREAKER_MIN_CALLS': 10,
+    'BREAKER_ERROR_RATE': 0.5,
+    'BREAKER_RESET_TIMEOUT': 30.0,
+    'FALLBACK_RESPONSE': "AI 응답을 일시적으로 사용할 수 없습니다. 잠시 후 다시 시도해주세요.",
+}
+
+
+class LLMUnavailable(Exception):
+    """The call was not made (or abandoned): queue full, deadline exceeded or circuit open."""
+
+    def __init__(self, reason, retry_after=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name, window, min_calls, error_rate, reset_timeout):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.outcomes = deque()  # (timestamp, succeeded)
+        self._lock = threading.Lock()
+        self._publish()
+
+    def _publish(self):
+        metrics.llm_circuit_state.labels(self.name).set(self.STATE_VALUES[self.state])
+
+    def _set_state(self, state):
+        self.state = state
+        self._publish()
+
+    def allow(self):
+        """Admits a call or raises LLMUnavailable while the circuit is open."""
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise LLMUnavailable('circuit_open', retry_after=remaining)
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self.trial_running:
+                    raise LLMUnavailable('circuit_open', retry_after=self.reset_timeout)
+                self.trial_running = True
+
+    def cancel_trial(self):
+        """Ends a half-open trial that did not reach the provider, without an outcome."""
+        with self._lock:
+            self.trial_running = False
+
+    def record(self, succeeded):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.trial_running = False
+                self.outcomes.clear()
+                if succeeded:
+                    self._set_state(self.CLOSED)
+                else:
+                    self.opened_at = now
+                    self._set_state(self.OPEN)
+                return
+
+            self.outcomes.append((now, succeeded))
+            while self.outcomes and self.outcomes[0][0] < now - self.window:
+                self.outcomes.popleft()
+            failures = sum(1 for _, ok in self.outcomes if not ok)
+            if (self.state == self.CLOSED and len(self.outcomes) >= self.min_calls
+                    and failures / len(self.outcomes) >= self.error_rate):
+                self.opened_at = now
+                self._set_state(self.OPEN)
+
+
+class LLMGuard:
+    """Concurrency gate + deadline + circuit breaker for one provider."""
+
+    def __init__(self, name, options):
+        self.name = name
+        self.options = options
+        self.slots = threading.BoundedSemaphore(options['MAX_CONCURRENCY'])
+        self.executor = ThreadPoolExecutor(max_workers=options['MAX_CONCURRENCY'],
+                                           thread_name_prefix=f'llm-{name}')
+        self.breaker = CircuitBreaker(
+            name,
+            window=options['BREAKER_WINDOW'],
+            min_calls=options['BREAKER_MIN_CALLS'],
+            error_rate=options['BREAKER_ERROR_RATE'],
+            reset_timeout=options['BREAKER_RESET_TIMEOUT'],
+        )
+
+    def acquire(self):
+        """Takes a concurrency slot (waiting up to QUEUE_TIMEOUT) after the breaker admitted the call."""
+        try:
+            self.breaker.allow()
+        except LLMUnavailable:
+            metrics.llm_calls.labels(self.name, 'short_circuited').inc()
+            raise
+        queue_depth = metrics.llm_queue_depth.labels(self.name)
+        queue_depth.inc()
+        try:
+            acquired = self.slots.acquire(timeout=self.options['QUEUE_TIMEOUT'])
+        finally:
+            queue_depth.dec()
+        if not acquired:
+            # Not the provider's fault: release the breaker trial without counting an outcome
+            self.breaker.cancel_trial()
+            metrics.llm_calls.labels(self.name, 'rejected').inc()
+            raise LLMUnavailable('queue_full', retry_after=self.options['QUEUE_TIMEOUT'])
+        metrics.llm_in_flight.labels(self.name).inc()
+
+    def release(self, outcome):
+        """Frees the slot and records ``outcome`` ('success', 'error', 'timeout' or 'cancelled')."""
+        self._release_slot()
+        self.record(outcome)
+
+    def record(self, outcome):
+        metrics.llm_calls.labels(self.name, outcome).inc()
+        if outcome == 'cancelled':
+            # The client left; says nothing about the provider's health
+            self.breaker.cancel_trial()
+        else:
+            self.breaker.record(outcome == 'success')
+
+    def call(self, func, *args, **kwargs):
+        """Runs ``func`` under the gate, deadline and breaker."""
+        self.acquire()
+        future = self.executor.submit(func, *args, **kwargs)
+        try:
+            result = future.result(timeout=self.options['CALL_TIMEOUT'])
+        except FutureTimeoutError:
+            self.abandon(future)
+            raise LLMUnavailable('timeout')
+        except Exception:
+            self.release('error')
+            raise
+        self.release('success')
+        return result
+
+    def abandon(self, future, cleanup=None):
+        """Records a timeout for a call running on ``future``.
+
+        The slot is kept until the abandoned call really returns, so concurrency stays
+        capped; ``cleanup`` then runs before the slot is freed.
+        """
+        self.record('timeout')
+
+        def done(_):
+            try:
+                if cleanup is not None:
+                    cleanup()
+            finally:
+                self._release_slot()
+        future.add_done_callback(done)
+
+    def _release_slot(self):
+        self.slots.release()
+        metrics.llm_in_flight.labels(self.name).dec()
+
+
+_guards = {}
+_lock = threading.Lock()
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LLM_RESILIENCE', {}))
+    return options
+
+
+def get_guard(provider):
+    """Returns the guard of a provider, created once per process."""
+    guard = _guards.get(provider.alias)
+    if guard is None:
+        with _lock:
+            guard = _guards.get(provider.alias)
+            if guard is None:
+                guard = _guards[provider.alias] = LLMGuard(provider.alias, get_options())
+    return guard
+
+
+def fallback_response():
+    return get_options()['FALLBACK_RESPONSE']
+
+
+def reset_guards():
+    with _lock:
+        _guards.clear()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting in ('LLM_RESILIENCE', 'LLM_PROVIDER', 'LLM_PROVIDERS'):
+        reset_guards()
@@ -0,0 +1,218 @@
+"""
+Server-sent events for streamed LLM completions.
+
+Each chunk from the provider is sent as ``event: token`` with ``{"text": ...}``, followed
+by ``event: done`` (or ``event: error`` with a reason code and the fallback answer). Both
+generators are pull-based: the next token is only requested from the provider once the
+server has taken the previous event, so a slow client slows the model stream down
+instead of piling up chunks in memory.
+
+When the client goes away the WSGI server closes the sync generator and the ASGI handler
+cancels the async one; either way the upstream provider stream is closed right away.
+Complete answers are stored in the LLM response cache and served from it next time.
+
+Streams hold a slot of the provider's LLMGuard (ai_manager.resilience) while they run.
+When the guard rejects the call, a single ``error`` event carries the fallback answer.
+Both streams enforce CALL_TIMEOUT between tokens: the sync one pulls each token on the
+guard's executor, and a stalled provider stream keeps its slot until it returns, as in
+``LLMGuard.call``. A client leaving the async stream while it still waits for a slot
+hands the slot back as soon as the waiting thread gets it.
+"""
+import asyncio
+import functools
+import json
+import logging
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+from . import metrics
+from .cache import MISSING, llm_cache
+from .resilience import LLMUnavailable, fallback_response, get_guard, get_options
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the stream
+    return response
+
+
+class StreamRecorder:
+    """Records time-to-first-token and the outcome of one stream."""
+
+    def __init__(self, provider, mode):
+        self.labels = (provider.alias, mode)
+        self.started = time.perf_counter()
+        self.first_token_seen = False
+
+    def token(self):
+        if not self.first_token_seen:
+            self.first_token_seen = True
+            metrics.llm_stream_ttft.labels(*self.labels).observe(time.perf_counter() - self.started)
+
+    def finish(self, outcome):
+        metrics.llm_streams.labels(*self.labels, outcome).inc()
+
+
+def _cached(cache_key):
+    if not llm_cache.options['ENABLED']:
+        return MISSING
+    return llm_cache.get(cache_key)
+
+
+def _store(cache_key, text):
+    if llm_cache.options['ENABLED']:
+        llm_cache.set(cache_key, text)
+
+
+def _error_event(reason):
+    # Only a reason code reaches the client; provider errors are logged
+    return sse_event('error', {'detail': reason, 'fallback': fallback_response()})
+
+
+def _unavailable_event(exc):
+    return _error_event(exc.reason)
+
+
+def stream_events(provider, prompt, cache_key):
+    """Sync SSE generator (WSGI)."""
+    recorder = StreamRecorder(provider, 'sync')
+    cached = _cached(cache_key)
+    if cached is not MISSING:
+        recorder.token()
+        recorder.finish('cached')
+        yield sse_event('token', {'text': cached})
+        yield sse_event('done', {'cached': True})
+        return
+
+    guard = get_guard(provider)
+    try:
+        guard.acquire()
+    except LLMUnavailable as exc:
+        recorder.finish('unavailable')
+        yield _unavailable_event(exc)
+        return
+
+    chunks = []
+    outcome = 'error'
+    timeout = get_options()['CALL_TIMEOUT']
+    tokens = pending = None
+    try:
+        tokens = provider.stream(prompt)
+        while True:
+            pending = guard.executor.submit(next, tokens, MISSING)
+            text = pending.result(timeout=timeout)
+            if text is MISSING:
+                break
+            recorder.token()
+            chunks.append(text)
+            yield sse_event('token', {'text': text})
+        outcome = 'success'
+    except GeneratorExit:
+        outcome = 'cancelled'
+        recorder.finish('disconnected')
+        raise
+    except FutureTimeoutError:
+        outcome = 'timeout'
+        recorder.finish('error')
+        yield _unavailable_event(LLMUnavailable('timeout'))
+        return
+    except Exception:
+        logger.exception("LLM stream failed")
+        recorder.finish('error')
+        yield _error_event('provider_error')
+        return
+    finally:
+        if outcome == 'timeout':
+            # The provider is still inside next(): close it and free the slot once it returns
+            guard.abandon(pending, tokens.close)
+        else:
+            if tokens is not None:
+                tokens.close()
+            guard.release(outcome)
+
+    _store(cache_key, ''.join(chunks))
+    recorder.finish('completed')
+    yield sse_event('done', {'cached': False})
+
+
+async def _acquire(guard):
+    """Waits for a guard slot off the event loop (acquiring blocks)."""
+    waiter = asyncio.ensure_future(sync_to_async(guard.acquire, thread_sensitive=False)())
+    try:
+        # Shielded: the waiting thread cannot be interrupted and may still get the slot
+        await asyncio.shield(waiter)
+    except asyncio.CancelledError:
+        waiter.add_done_callback(functools.partial(_release_abandoned, guard))
+        raise
+
+
+def _release_abandoned(guard, waiter):
+    if not waiter.cancelled() and waiter.exception() is None:
+        guard.release('cancelled')
+
+
+async def astream_events(provider, prompt, cache_key):
+    """Async SSE generator (ASGI). Cancellation on disconnect arrives as CancelledError."""
+    recorder = StreamRecorder(provider, 'async')
+    # The persistent cache tier may be database-backed
+    cached = await sync_to_async(_cached)(cache_key)
+    if cached is not MISSING:
+        recorder.token()
+        recorder.finish('cached')
+        yield sse_event('token', {'text': cached})
+        yield sse_event('done', {'cached': True})
+        return
+
+    guard = get_guard(provider)
+    try:
+        await _acquire(guard)
+    except LLMUnavailable as exc:
+        recorder.finish('unavailable')
+        yield _unavailable_event(exc)
+        return
+
+    chunks = []
+    outcome = 'error'
+    timeout = get_options()['CALL_TIMEOUT']
+    tokens = provider.astream(prompt)
+    try:
+        while True:
+            try:
+                text = await asyncio.wait_for(anext(tokens), timeout)
+            except StopAsyncIteration:
+                break
+            recorder.token()
+            chunks.append(text)
+            yield sse_event('token', {'text': text})
+        outcome = 'success'
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = 'cancelled'
+        recorder.finish('disconnected')
+        raise
+    except TimeoutError:
+        outcome = 'timeout'
+        recorder.finish('error')
+        yield _unavailable_event(LLMUnavailable('timeout'))
+        return
+    except Exception:
+        logger.exception("LLM stream failed")
+        recorder.finish('error')
+        yield _error_event('provider_error')
+        return
+    finally:
+        await tokens.aclose()
+        guard.release(outcome)
+
+    await sync_to_async(_store)(cache_key, ''.join(chunks))
+    recorder.finish('completed')
+    yield sse_event('done', {'cached': False})
@@ -1,3 +1,475 @@
-from django.test import TestCase
+import asyncio
+import json
+import shutil
+import tempfile
+import threading
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from user_manager.models import User
+
+from . import cache as llm_response_cache
+from . import metrics
+from .cache import MISSING, LLMResponseCache, cached_completion, make_key
+from .providers import BaseProvider, StubProvider, VertexAIProvider, get_provider
+from . import resilience
+from .resilience import CircuitBreaker, LLMGuard, LLMUnavailable, get_guard, get_options
+from .streaming import astream_events, stream_events
+
+RESILIENCE = {'MAX_CONCURRENCY': 1, 'QUEUE_TIMEOUT': 1.0, 'CALL_TIMEOUT': 0.2}
+
+
+class BlockingProvider(BaseProvider):
+    """Streams one token, then stalls until ``resume`` is set."""
+
+    def __init__(self, alias):
+        super().__init__(alias, {})
+        self.resume = threading.Event()
+        self.closed = threading.Event()
+
+    def stream(self, prompt):
+        try:
+            yield 'first '
+            self.resume.wait(5)
+            yield 'late'
+        finally:
+            self.closed.set()
+
+
+class FailingProvider(BaseProvider):
+    def stream(self, prompt):
+        yield 'partial '
+        raise RuntimeError('upstream secret')
+
+
+def parse_sse(payload):
+    """``[(event, data), ...]`` of a server-sent events body."""
+    events = []
+    for block in payload.strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def in_flight(alias):
+    return metrics.llm_in_flight.labels(alias)._value.get()
+
+
+@override_settings(LLM_RESILIENCE=RESILIENCE, LLM_RESPONSE_CACHE={'ENABLED': False})
+class StreamGuardTests(SimpleTestCase):
+    """Streams must honour CALL_TIMEOUT and never leak a concurrency slot."""
+
+    def test_sync_stream_deadline(self):
+        provider = BlockingProvider('stalled-sync')
+        guard = get_guard(provider)
+        events = list(stream_events(provider, 'prompt', 'key'))
+
+        self.assertEqual(len(events), 2)
+        self.assertTrue(events[0].startswith('event: token'))
+        self.assertTrue(events[1].startswith('event: error'))
+        self.assertIn('"timeout"', events[1])
+        # The stalled call keeps its slot until the provider returns
+        self.assertFalse(guard.slots.acquire(blocking=False))
+
+        provider.resume.set()
+        self.assertTrue(provider.closed.wait(1))
+        self.assertTrue(guard.slots.acquire(timeout=1))
+        guard.slots.release()
+
+    def test_async_disconnect_while_queued(self):
+        provider = BlockingProvider('queued-async')
+        guard = get_guard(provider)
+        guard.acquire()  # Take the only slot so the stream has to queue
+
+        async def consume():
+            async for _ in astream_events(provider, 'prompt', 'key'):
+                pass
+
+        async def scenario():
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.1)
+            task.cancel()  # The client goes away while waiting for a slot
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            guard.release('success')
+            # The waiting thread now gets the slot and must hand it back
+            await asyncio.sleep(0.2)
+
+        asyncio.run(scenario())
+        self.assertEqual(in_flight(provider.alias), 0)
+        self.assertTrue(guard.slots.acquire(blocking=False))
+        guard.slots.release()
+
+
+@override_settings(LLM_PROVIDER='stub')
+class StreamingTests(TestCase):
+    """SSE streaming against the offline stub provider."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='stream@example.com', nickname='stream')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # A fresh question per test keeps the shared response cache out of the way
+        self.query = f'how do I keep a streak {uuid.uuid4()}'
+
+    def post(self):
+        response = self.client.post('/api/ai/stream/', {'query_text': self.query}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return parse_sse(b''.join(response.streaming_content).decode())
+
+    def expected_text(self):
+        return get_provider().complete(f"Query: {self.query}\nResponse:")
+
+    def test_sse_framing(self):
+        events = self.post()
+        self.assertGreater(len(events), 2)
+        self.assertEqual({event for event, _ in events[:-1]}, {'token'})
+        self.assertEqual(''.join(data['text'] for _, data in events[:-1]), self.expected_text())
+        self.assertEqual(events[-1], ('done', {'cached': False}))
+
+    def test_cached_answer(self):
+        self.post()
+        events = self.post()
+        self.assertEqual(events, [('token', {'text': self.expected_text()}), ('done', {'cached': True})])
+
+    def test_time_to_first_token_metrics(self):
+        labels = {'provider': 'stub', 'mode': 'sync'}
+        ttft = 'journey_llm_stream_time_to_first_token_seconds_count'
+        before = sample(ttft, **labels)
+        completed = sample('journey_llm_streams_total', outcome='completed', **labels)
+        cached = sample('journey_llm_streams_total', outcome='cached', **labels)
+        self.post()
+        self.post()
+        self.assertEqual(sample(ttft, **labels), before + 2)
+        self.assertEqual(sample('journey_llm_streams_total', outcome='completed', **labels), completed + 1)
+        self.assertEqual(sample('journey_llm_streams_total', outcome='cached', **labels), cached + 1)
+
+    def test_async_stream(self):
+        provider = get_provider()
+        prompt = f"Query: {self.query}\nResponse:"
+
+        async def collect():
+            return ''.join([event async for event in astream_events(provider, prompt, self.query)])
+
+        events = parse_sse(asyncio.run(collect()))
+        self.assertEqual(''.join(data['text'] for _, data in events[:-1]), provider.complete(prompt))
+        self.assertEqual(events[-1], ('done', {'cached': False}))
+
+
+@override_settings(LLM_RESPONSE_CACHE={'ENABLED': False})
+class StreamFailureTests(SimpleTestCase):
+    """Disconnects and provider errors end the stream cleanly."""
+
+    def test_client_disconnect_closes_upstream(self):
+        provider = BlockingProvider('disconnect-sync')
+        provider.resume.set()
+        labels = {'provider': provider.alias, 'mode': 'sync', 'outcome': 'disconnected'}
+        events = stream_events(provider, 'prompt', 'key')
+        self.assertTrue(next(events).startswith('event: token'))
+        events.close()  # What the WSGI server does when the client goes away
+
+        self.assertTrue(provider.closed.is_set())
+        self.assertEqual(in_flight(provider.alias), 0)
+        self.assertEqual(sample('journey_llm_streams_total', **labels), 1)
+
+    def test_error_event_hides_details(self):
+        provider = FailingProvider('failing', {})
+        with self.assertLogs('ai_manager.streaming', 'ERROR'):
+            events = parse_sse(''.join(stream_events(provider, 'prompt', 'key')))
+        self.assertEqual(events[0], ('token', {'text': 'partial '}))
+        event, data = events[-1]
+        self.assertEqual((event, data['detail']), ('error', 'provider_error'))
+        self.assertNotIn('secret', json.dumps(data))
+
+
+class LLMResponseCacheTests(SimpleTestCase):
+    """Memory LRU with TTL in front of an optional persistent Django cache."""
+
+    def make_cache(self, **options):
+        return LLMResponseCache(dict({'MAX_ENTRIES': 2, 'TTL': 60}, **options))
+
+    def test_key(self):
+        self.assertEqual(make_key('m', {'t': 1}, ' Plan  my\nweek '), make_key('m', {'t': 1}, 'Plan my week'))
+        self.assertEqual(make_key('m', {}, '\uff30lan'), make_key('m', {}, 'Plan'))  # NFKC
+        self.assertNotEqual(make_key('m', {}, 'plan'), make_key('m', {}, 'Plan'))
+        self.assertNotEqual(make_key('m', {'t': 1}, 'Plan'), make_key('m', {'t': 2}, 'Plan'))
+        self.assertNotEqual(make_key('m', {}, 'Plan'), make_key('n', {}, 'Plan'))
+
+    def test_lru_eviction(self):
+        cache = self.make_cache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)  # a is now the most recently used
+        cache.set('c', 3)
+        self.assertEqual([cache.get(key) for key in 'abc'], [1, MISSING, 3])
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_ttl(self):
+        cache = self.make_cache()
+        with mock.patch.object(llm_response_cache.time, 'monotonic', return_value=1000.0):
+            cache.set('a', ['value'])
+        with mock.patch.object(llm_response_cache.time, 'monotonic', return_value=1059.0):
+            self.assertEqual(cache.get('a'), ['value'])
+        with mock.patch.object(llm_response_cache.time, 'monotonic', return_value=1060.0):
+            self.assertIs(cache.get('a'), MISSING)
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_copies(self):
+        cache = self.make_cache()
+        value = {'plan': ['run']}
+        cache.set('a', value)
+        value['plan'].append('swim')
+        cache.get('a')['plan'].append('bike')
+        self.assertEqual(cache.get('a'), {'plan': ['run']})
+
+    def test_persistent_alias(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                  'llm': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+        with override_settings(CACHES=caches):
+            self.make_cache(PERSISTENT_ALIAS='llm').set('a', 'answer')
+            # Another worker (or a restart) starts with an empty memory tier
+            worker = self.make_cache(PERSISTENT_ALIAS='llm')
+            self.assertEqual(worker.get('a'), 'answer')
+            self.assertEqual(worker.stats()['size'], 1)
+            self.assertIs(self.make_cache().get('a'), MISSING)
+
+    def test_get_or_call(self):
+        cache = self.make_cache()
+        calls = []
+
+        def call():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual([cache.get_or_call('m', {}, 'p', call) for _ in range(2)], [1, 1])
+        self.assertEqual(self.make_cache(ENABLED=False).get_or_call('m', {}, 'p', call), 2)
+        with self.assertRaises(ZeroDivisionError):
+            cache.get_or_call('m', {}, 'q', lambda: 1 / 0)
+        self.assertEqual(cache.get_or_call('m', {}, 'q', call), 3)  # Failures are not cached
+
+    def test_cached_completion_keeps_arguments(self):
+        received = []
+
+        @cached_completion('test-model', task=str(uuid.uuid4()))
+        def generate(goal, detail=''):
+            received.append((goal, detail))
+            return len(received)
+
+        with mock.patch.object(llm_response_cache, 'llm_cache', self.make_cache()):
+            self.assertEqual(generate('Run  Daily\n', detail=' 5km '), 1)
+            self.assertEqual(generate('Run Daily', detail='5km'), 1)
+            self.assertEqual(generate('run daily', detail='5km'), 2)
+        # The model sees what the caller wrote; only the key is normalized
+        self.assertEqual(received, [('Run  Daily\n', ' 5km '), ('run daily', '5km')])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """closed -> open -> half-open -> closed, and back to open when the trial fails."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(resilience.time, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('breaker-test', window=60, min_calls=4, error_rate=0.5, reset_timeout=30)
+
+    def record(self, *outcomes):
+        for succeeded in outcomes:
+            self.breaker.allow()
+            self.breaker.record(succeeded)
+
+    def assertRejected(self, retry_after=None):
+        with self.assertRaises(LLMUnavailable) as raised:
+            self.breaker.allow()
+        self.assertEqual(raised.exception.reason, 'circuit_open')
+        if retry_after is not None:
+            self.assertAlmostEqual(raised.exception.retry_after, retry_after)
+
+    def state(self):
+        return self.breaker.state, sample('journey_llm_circuit_state', provider='breaker-test')
+
+    def test_opens_at_error_rate(self):
+        self.record(False, False, True)
+        self.assertEqual(self.state(), ('closed', 0))  # Fewer than min_calls
+        self.record(False)
+        self.assertEqual(self.state(), ('open', 2))
+        self.assertRejected(retry_after=30)
+        self.clock.now += 29
+        self.assertRejected(retry_after=1)
+
+    def test_half_open_trial_closes(self):
+        self.record(False, False, False, False)
+        self.clock.now += 30
+        self.breaker.allow()  # The trial call
+        self.assertEqual(self.state(), ('half_open', 1))
+        self.assertRejected()  # Only one trial at a time
+        self.breaker.record(True)
+        self.assertEqual(self.state(), ('closed', 0))
+        # The failures before opening no longer count
+        self.record(False, True, True)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_half_open_failure_reopens(self):
+        self.record(False, False, False, False)
+        self.clock.now += 30
+        self.record(False)
+        self.assertEqual(self.state(), ('open', 2))
+        self.clock.now += 29
+        self.assertRejected(retry_after=1)
+        self.clock.now += 1
+        self.record(True)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_cancelled_trial(self):
+        self.record(False, False, False, False)
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.cancel_trial()
+        self.breaker.allow()
+        self.assertEqual(self.breaker.state, 'half_open')
+
+    def test_window(self):
+        self.record(False, False, False)
+        self.clock.now += 61
+        self.record(True, False, True, True)
+        self.assertEqual(self.breaker.state, 'closed')
+
+
+class LLMGuardTests(SimpleTestCase):
+    """Queue rejections, provider errors and deadlines reach the breaker as they should."""
+
+    def guard(self, name, **options):
+        return LLMGuard(name, dict(get_options(), MAX_CONCURRENCY=1, QUEUE_TIMEOUT=0.05, CALL_TIMEOUT=0.2,
+                                   BREAKER_MIN_CALLS=2, **options))
+
+    def test_queue_full(self):
+        guard = self.guard('guard-queue')
+        guard.acquire()
+        with self.assertRaises(LLMUnavailable) as raised:
+            guard.call(lambda: 'never')
+        self.assertEqual(raised.exception.reason, 'queue_full')
+        guard.release('success')
+        self.assertEqual(guard.call(lambda: 'ok'), 'ok')
+        self.assertEqual(guard.breaker.state, 'closed')
+
+    def test_errors_open_circuit(self):
+        guard = self.guard('guard-errors')
+        for _ in range(2):
+            with self.assertRaises(ZeroDivisionError):
+                guard.call(lambda: 1 / 0)
+        with self.assertRaises(LLMUnavailable) as raised:
+            guard.call(lambda: 'ok')
+        self.assertEqual(raised.exception.reason, 'circuit_open')
+        self.assertEqual(sample('journey_llm_calls_total', provider='guard-errors', outcome='short_circuited'), 1)
+        self.assertEqual(in_flight('guard-errors'), 0)
+
+    def test_deadline(self):
+        guard = self.guard('guard-deadline')
+        finished = threading.Event()
+        with self.assertRaises(LLMUnavailable) as raised:
+            guard.call(finished.wait, 5)
+        self.assertEqual(raised.exception.reason, 'timeout')
+        self.assertFalse(guard.slots.acquire(blocking=False))  # Still held by the abandoned call
+        finished.set()
+        self.assertTrue(guard.slots.acquire(timeout=1))
+        guard.slots.release()
+
+
+@override_settings(LLM_RESPONSE_CACHE={'ENABLED': False}, LLM_PROVIDER='slow', LLM_PROVIDERS={
+    'slow': {'BACKEND': 'ai_manager.providers.StubProvider', 'OPTIONS': {'LATENCY': 0.3}},
+})
+class FallbackResponseTests(SimpleTestCase):
+    """/api/ai/dummy/ answers 503 with the fallback text when the guard turns the call away."""
+
+    def post(self):
+        response = APIClient().post('/api/ai/dummy/', {'query_text': 'plan my week'}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['response'], get_options()['FALLBACK_RESPONSE'])
+        return response
+
+    @override_settings(LLM_RESILIENCE={'CALL_TIMEOUT': 0.05})
+    def test_timeout(self):
+        response = self.post()
+        self.assertEqual(response.json()['error'], 'timeout')
+        self.assertFalse(response.has_header('Retry-After'))
+
+    @override_settings(LLM_RESILIENCE={'BREAKER_MIN_CALLS': 1, 'BREAKER_RESET_TIMEOUT': 30})
+    def test_circuit_open(self):
+        get_guard(get_provider()).breaker.record(False)
+        response = self.post()
+        self.assertEqual(response.json()['error'], 'circuit_open')
+        self.assertIn(response['Retry-After'], ('29', '30'))
+
+
+PROVIDERS = {
+    'vertex': {'BACKEND': 'ai_manager.providers.VertexAIProvider', 'OPTIONS': {'PROJECT': 'test', 'MODEL': 'gemini-test'}},
+    'stub': {'BACKEND': 'ai_manager.providers.StubProvider', 'OPTIONS': {'PARAMS': {'temperature': 0}}},
+    'broken': {'BACKEND': 'ai_manager.providers.NoSuchProvider'},
+}
+
+
+@override_settings(LLM_PROVIDERS=PROVIDERS, LLM_PROVIDER='stub')
+class ProviderRegistryTests(SimpleTestCase):
+    """Providers are picked by alias, built once without network access and reset with the settings."""
+
+    def test_selection(self):
+        provider = get_provider()
+        self.assertIsInstance(provider, StubProvider)
+        self.assertEqual((provider.alias, provider.params), ('stub', {'temperature': 0}))
+        self.assertIs(get_provider('stub'), provider)
+        with override_settings(LLM_PROVIDER='vertex'):
+            self.assertIsInstance(get_provider(), VertexAIProvider)
+
+    def test_vertex_is_lazy(self):
+        with mock.patch.object(VertexAIProvider, '_build', return_value=(mock.Mock(), [])) as build:
+            provider = get_provider('vertex')
+            self.assertEqual(provider.model_name, 'gemini-test')
+            build.assert_not_called()
+            provider.client.invoke.return_value.content = 'answer'
+            self.assertEqual(provider.invoke('prompt'), 'answer')
+            provider.invoke('again')
+        build.assert_called_once_with()
+
+    def test_reset_on_setting_changed(self):
+        provider = get_provider()
+        with override_settings(LLM_PROVIDERS=dict(PROVIDERS, stub={
+            'BACKEND': 'ai_manager.providers.StubProvider', 'OPTIONS': {'LATENCY': 0.01},
+        })):
+            changed = get_provider()
+            self.assertIsNot(changed, provider)
+            self.assertEqual(changed.options, {'LATENCY': 0.01})
+        self.assertIsNot(get_provider(), changed)
+
+    def test_misconfigured(self):
+        for alias in ('missing', 'broken'):
+            with self.assertRaises(ImproperlyConfigured):
+                get_provider(alias)
+
+    def test_stub_streams_its_completion(self):
+        provider = get_provider()
+        self.assertEqual(''.join(provider.stream('plan my week')), provider.invoke('plan my week'))
+        self.assertEqual(provider.invoke('plan my week'), provider.complete('plan my week'))
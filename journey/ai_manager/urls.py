@@ -1,11 +1,12 @@
 # urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LLMViewSet
+from .views import LLMViewSet, stream_completion_async
 
 router = DefaultRouter()
 router.register(r'', LLMViewSet, basename='')
 
 urlpatterns = [
+    path('stream/async/', stream_completion_async, name='llm-stream-async'), # ASGI 전용 비동기 스트리밍
     path('', include(router.urls)),
 ]
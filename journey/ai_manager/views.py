@@ -1,43 +1,31 @@
-import os
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import viewsets, status, permissions
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.settings import api_settings
 from .serializers import AIQuerySerializer, LLMResponseSerializer
 from .permissions import IsAuthenticated
+from .cache import llm_cache, make_key
+from .providers import get_provider
+from .resilience import LLMUnavailable, fallback_response, get_guard
+from . import streaming
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
 
-# Langchain 관련 임포트 
-from langchain.chains import LLMChain
-from langchain_google_vertexai.chat_models import ChatVertexAI
-from langchain.prompts import PromptTemplate
-
-# Import LangChain components with Vertex AI
-import vertexai
-from vertexai.preview import reasoning_engines
+# 프롬프트 템플릿: query_text를 포함하는 형식으로 작성
+PROMPT_TEMPLATE = "Query: {query}\nResponse:"
 
-vertexai.init(
-    project=os.getenv("PROJECT_ID"),
-    location=os.getenv("LOCATION"),
-    staging_bucket=os.getenv("BUCKET_NAME"),
-)
 
-llm = ChatVertexAI(
-    project=os.getenv("PROJECT_ID"),
-    location="us-central1",  # e.g., 'us-central1'
-    model_name="gemini-2.0-flash-lite-001",
-    max_output_tokens=1024,
-    temperature=0.7,
-)
-# Initialize Langfuse handler
-from langfuse.callback import CallbackHandler
-# .env 파일에서 환경변수 지정해줘야함.
-langfuse_handler = CallbackHandler(
-    secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-    public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-    host=os.getenv("LANGFUSE_HOST"), 
-)
+def cache_params(provider):
+    """Parameters that identify an answer in the LLM response cache."""
+    return dict(provider.params, template=PROMPT_TEMPLATE)
 
 
 class LLMViewSet(viewsets.ViewSet):
@@ -61,26 +49,88 @@ class LLMViewSet(viewsets.ViewSet):
         if serializer.is_valid():
             query_text = serializer.validated_data['query_text']
 
-            # prompt 템플릿 생성: BasePromptTemplate 인스턴스를 사용
-            prompt_template = PromptTemplate(
-                template="Query: {query}\nResponse:",
-                input_variables=["query"]
-            )
-
-            # 체인 구성: prompt는 query_text를 포함하는 형식으로 작성
-            chain = LLMChain(llm=llm, prompt=prompt_template)
-
             try:
-                # LLM 요청 실행
-                response = chain.invoke({"query": query_text}, config={"callbacks": [langfuse_handler]})
+                # LLM 요청 실행 (같은 모델/파라미터/프롬프트는 캐시에서 응답)
+                # 캐시에 없으면 동시성 제한/타임아웃/서킷 브레이커를 거쳐 호출
+                provider = get_provider()
+                guard = get_guard(provider)
+                response = llm_cache.get_or_call(
+                    provider.model_name,
+                    cache_params(provider),
+                    query_text,
+                    lambda: guard.call(provider.invoke, PROMPT_TEMPLATE.format(query=query_text)),
+                )
                 
                 response_serializer = LLMResponseSerializer(data={'response': response})
                 response_serializer.is_valid()  # 별도 유효성 검증 없이 데이터를 반환
                 return Response(response_serializer.data, status=status.HTTP_200_OK)
+            except LLMUnavailable as e:
+                # 빠르게 실패: 대체 응답과 함께 503 반환
+                headers = {'Retry-After': str(max(1, round(e.retry_after)))} if e.retry_after else {}
+                return Response({"response": fallback_response(), "error": e.reason},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=headers)
             except Exception as e:
                 return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=["query_text"],
+            properties={
+                "query_text": openapi.Schema(type=openapi.TYPE_STRING, description="Input query text")
+            }
+        ),
+        responses={200: 'text/event-stream: `token` events with {"text"}, then `done` or `error`'},
+    )
+    @action(detail=False, methods=['post'], url_path='stream')
+    def stream(self, request):
+        """Streams the completion as server-sent events (sync; see stream_completion_async for ASGI)."""
+        serializer = AIQuerySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        query_text = serializer.validated_data['query_text']
+        provider = get_provider()
+        cache_key = make_key(provider.model_name, cache_params(provider), query_text)
+        return streaming.sse_response(
+            streaming.stream_events(provider, PROMPT_TEMPLATE.format(query=query_text), cache_key)
+        )
+
+
+@sync_to_async
+def _authenticate(request):
+    """Runs the DRF authenticators (JWT) for a plain Django view; returns the user or None."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    return user if user and user.is_authenticated else None
 
 
+@csrf_exempt
+async def stream_completion_async(request):
+    """Async SSE endpoint for ASGI deployments (config/asgi.py).
+
+    Same contract as LLMViewSet.stream, but no worker thread is held while the model is
+    generating and a client disconnect cancels the upstream stream.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if await _authenticate(request) is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'detail': 'Invalid JSON body.'}, status=400)
+
+    serializer = AIQuerySerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    query_text = serializer.validated_data['query_text']
+    provider = get_provider()
+    cache_key = make_key(provider.model_name, cache_params(provider), query_text)
+    return streaming.sse_response(
+        streaming.astream_events(provider, PROMPT_TEMPLATE.format(query=query_text), cache_key)
+    )
@@ -0,0 +1,65 @@
+"""
+HyperLogLog sketch for approximate distinct counts.
+
+``HyperLogLog(precision=10)`` keeps 2**10 one-byte registers (1 KiB) whatever the number
+of distinct values added, with a standard error of about 1.04 / sqrt(1024) ~ 3.3%.
+Sketches built in different processes merge by taking the register-wise maximum, so
+workers can count independently and combine their sketches when writing them back.
+
+Values are hashed with blake2b (not ``hash()``, which is salted per process) so the same
+viewer lands in the same register in every worker.
+"""
+import hashlib
+import math
+
+DEFAULT_PRECISION = 10
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            registers = bytearray(self.size)
+        elif len(registers) != self.size:
+            raise ValueError(f"Expected {self.size} registers, got {len(registers)}.")
+        self.registers = bytearray(registers)
+
+    @classmethod
+    def from_bytes(cls, data, precision=DEFAULT_PRECISION):
+        """Loads a stored sketch; empty or missing data is an empty sketch."""
+        return cls(precision, bytes(data) if data else None)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = hashed & ((1 << rest_bits) - 1)
+        # Position of the leftmost 1-bit in the remaining bits (1-based)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision.")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """Estimated number of distinct values added."""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def __bool__(self):
+        return any(self.registers)
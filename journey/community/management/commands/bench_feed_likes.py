@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from community import services
+from community.models import Feed, Like
+from user_manager.models import User
+
+
+class Command(BaseCommand):
+    help = ("Hammers like/unlike of one feed from many threads through community.services and checks "
+            "like_count against the Like rows afterwards. Benchmark rows are deleted at the end.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--users', type=int, default=32)
+        parser.add_argument('--operations', type=int, default=50, help="Operations per thread.")
+        parser.add_argument('--mode', choices=('idempotent', 'toggle'), default='idempotent',
+                            help="idempotent: like_feed/unlike_feed; toggle: toggle_like (POST .../like/).")
+
+    def handle(self, *args, **options):
+        tag = f"benchlike{int(time.time())}"
+        User.objects.bulk_create([
+            User(email=f"{tag}-{i}@bench.local", nickname=f"b{i}") for i in range(options['users'])
+        ])
+        users = list(User.objects.filter(email__startswith=f"{tag}-"))
+        feed = Feed.objects.create(user=users[0], content=tag)
+        try:
+            self._run(feed, users, options)
+        finally:
+            feed.delete()
+            User.objects.filter(email__startswith=f"{tag}-").delete()
+
+    def _operation(self, mode, rng, feed, user):
+        if mode == 'toggle':
+            return services.toggle_like(feed.pk, user)
+        if rng.random() < 0.5:
+            return services.like_feed(feed.pk, user.pk)
+        return services.unlike_feed(feed.pk, user.pk)
+
+    def _run(self, feed, users, options):
+        counters = {'liked': 0, 'unliked': 0, 'errors': 0}
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(options['operations']):
+                    user = rng.choice(users)
+                    started = time.perf_counter()
+                    try:
+                        liked, _ = self._operation(options['mode'], rng, feed, user)
+                        outcome = 'liked' if liked else 'unliked'
+                    except Exception as exc:
+                        self.stderr.write(f"{type(exc).__name__}: {exc}")
+                        outcome = 'errors'
+                    with lock:
+                        counters[outcome] += 1
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        feed.refresh_from_db()
+        actual = Like.objects.filter(feed=feed).count()
+        latencies.sort()
+        total = len(latencies)
+
+        self.stdout.write(
+            f"{options['mode']}: {total} operations in {elapsed:.2f}s ({total / elapsed:.0f} ops/s), "
+            f"p50 {latencies[total // 2] * 1000:.1f}ms, p99 {latencies[int(total * 0.99) - 1] * 1000:.1f}ms"
+        )
+        self.stdout.write(f"liked {counters['liked']}, unliked {counters['unliked']}, errors {counters['errors']}")
+        message = f"like_count {feed.like_count}, likes {actual}"
+        if feed.like_count == actual and not counters['errors']:
+            self.stdout.write(self.style.SUCCESS(f"OK: {message}"))
+        else:
+            self.stdout.write(self.style.ERROR(f"INCONSISTENT: {message}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from community.trending import refresh_all_scores
+
+
+class Command(BaseCommand):
+    help = "Recomputes Feed.trending_score of every feed (e.g. after changing FEED_TRENDING)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = refresh_all_scores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{updated} feeds updated."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from community.services import repair_feed_counters
+
+
+class Command(BaseCommand):
+    help = "Fixes Feed.like_count/comment_count drift from one GROUP BY per table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drifted feeds.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        drifted = repair_feed_counters(dry_run=options['dry_run'], batch_size=options['batch_size'])
+        for feed_id, (stored_likes, stored_comments), (likes, comments) in drifted:
+            self.stdout.write(f"feed {feed_id}: likes {stored_likes} -> {likes}, comments {stored_comments} -> {comments}")
+        verb = "would be fixed" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{len(drifted)} feeds {verb}."))
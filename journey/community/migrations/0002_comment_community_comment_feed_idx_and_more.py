@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['feed', 'created_at', 'id'], name='community_comment_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feed',
+            index=models.Index(fields=['-created_at', '-id'], name='community_feed_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:33
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    Feed = apps.get_model('community', 'Feed')
+    Like = apps.get_model('community', 'Like')
+    Comment = apps.get_model('community', 'Comment')
+    likes = dict(Like.objects.values('feed_id').annotate(count=Count('id')).order_by().values_list('feed_id', 'count'))
+    comments = dict(Comment.objects.values('feed_id').annotate(count=Count('id')).order_by().values_list('feed_id', 'count'))
+    feeds = [Feed(pk=feed_id, like_count=likes.get(feed_id, 0), comment_count=comments.get(feed_id, 0))
+             for feed_id in likes.keys() | comments.keys()]
+    Feed.objects.bulk_update(feeds, ['like_count', 'comment_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0002_comment_community_comment_feed_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='like_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0003_feed_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='unique_viewer_sketch',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='unique_viewers',
+            field=models.IntegerField(default=0),
+        ),
+    ]
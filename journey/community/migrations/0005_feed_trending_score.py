@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:37
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+# The community.trending formula and weights as of this migration, frozen so later changes
+# do not alter it. `manage.py refresh_trending_scores` rescores with the current ones.
+LIKE_WEIGHT = 3.0
+COMMENT_WEIGHT = 5.0
+VIEW_WEIGHT = 0.1
+DECAY_SECONDS = 12 * 60 * 60
+
+
+def backfill_scores(apps, schema_editor):
+    Feed = apps.get_model('community', 'Feed')
+    feeds = list(Feed.objects.only('id', 'like_count', 'comment_count', 'view_count', 'created_at'))
+    for feed in feeds:
+        engagement = (LIKE_WEIGHT * feed.like_count + COMMENT_WEIGHT * feed.comment_count
+                      + VIEW_WEIGHT * feed.view_count)
+        feed.trending_score = math.log10(max(engagement, 1)) + feed.created_at.timestamp() / DECAY_SECONDS
+    Feed.objects.bulk_update(feeds, ['trending_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0004_feed_unique_viewers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='feed',
+            index=models.Index(fields=['-trending_score', '-id'], name='community_feed_trending_idx'),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
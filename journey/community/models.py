@@ -5,8 +5,19 @@ class Feed(models.Model):
     user = models.ForeignKey('user_manager.User', on_delete=models.CASCADE, related_name='feeds')
     content = models.TextField()
     view_count = models.IntegerField(default=0)
+    like_count = models.IntegerField(default=0) # 좋아요 수 (community.services 에서 관리)
+    comment_count = models.IntegerField(default=0) # 댓글 수 (community.services 에서 관리)
+    unique_viewer_sketch = models.BinaryField(default=bytes, editable=False) # 순 방문자 HyperLogLog 스케치 (community.hll, 1KiB 고정)
+    unique_viewers = models.IntegerField(default=0) # 스케치로 추정한 순 방문자 수
+    trending_score = models.FloatField(default=0) # 시간 감쇠 인기 점수 (community.trending)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='community_feed_recent_idx'), # 피드 목록 (keyset)
+            models.Index(fields=['-trending_score', '-id'], name='community_feed_trending_idx'), # 인기 피드 목록 (keyset)
+        ]
+
     def __str__(self):
         return f"Feed {self.id} by {self.user}"
 
@@ -17,6 +28,11 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['feed', 'created_at', 'id'], name='community_comment_feed_idx'), # 피드별 댓글 목록 (keyset)
+        ]
+
     def __str__(self):
         return f"Comment by {self.user} on {self.feed}"
 
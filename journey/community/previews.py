@@ -0,0 +1,43 @@
+"""
+"Latest comments" previews for a page of feeds.
+
+The newest comments of every feed on the page come from one query that numbers each
+feed's comments with ``ROW_NUMBER() OVER (PARTITION BY feed_id ORDER BY created_at DESC,
+id DESC)`` and keeps the first ``limit``, reading community_comment_feed_idx, instead of
+one query per feed.
+"""
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+
+PREVIEW_SIZE = 3
+
+
+def latest_comments(feed_ids, limit=PREVIEW_SIZE):
+    """{feed_id: [comments]} with at most ``limit`` newest comments per feed, oldest first."""
+    if not feed_ids:
+        return {}
+    comments = (
+        Comment.objects.filter(feed_id__in=feed_ids)
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=[F('feed_id')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        ))
+        .filter(position__lte=limit)
+        .select_related('user')
+        .order_by('feed_id', 'created_at', 'id')
+    )
+    previews = {feed_id: [] for feed_id in feed_ids}
+    for comment in comments:
+        previews[comment.feed_id].append(comment)
+    return previews
+
+
+def attach_latest_comments(feeds, limit=PREVIEW_SIZE):
+    """Sets ``latest_comments`` on each feed (rendered by FeedSerializer)."""
+    previews = latest_comments([feed.pk for feed in feeds], limit)
+    for feed in feeds:
+        feed.latest_comments = previews[feed.pk]
+    return feeds
@@ -1,21 +1,37 @@
 from rest_framework import serializers
+from config.fieldsets import SparseFieldsetMixin
 from .models import Feed, Comment, Like
-from user_manager.serializer import UserSerializer
-
-class FeedSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    likes_count = serializers.SerializerMethodField()
+from user_manager.serializer import PublicUserSerializer
+from . import view_counter
+
+class FeedSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    user = PublicUserSerializer(read_only=True)
+    # Denormalized counters maintained by community.services (no per-row COUNT)
+    likes_count = serializers.IntegerField(source='like_count', read_only=True)
+    comments_count = serializers.IntegerField(source='comment_count', read_only=True)
+    # Stored value plus the views still buffered in this process (community.view_counter)
+    view_count = serializers.SerializerMethodField()
+    values_dependencies = {'view_count': ['view_count', 'id']} # config.fast_serializers
 
     class Meta:
         model = Feed
-        fields = ['id', 'user', 'content', 'view_count', 'likes_count', 'created_at']
-        read_only_fields = ['id', 'user', 'view_count', 'created_at']
-
-    def get_likes_count(self, obj):
-        return obj.likes.count()
-
-class CommentSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+        fields = ['id', 'user', 'content', 'view_count', 'unique_viewers', 'likes_count', 'comments_count', 'created_at']
+        read_only_fields = ['id', 'user', 'view_count', 'unique_viewers', 'created_at']
+
+    def get_view_count(self, obj):
+        return obj.view_count + view_counter.pending_views(obj.pk)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Only present when the view attached previews (?include_comments=true)
+        if hasattr(instance, 'latest_comments'):
+            data['latest_comments'] = CommentSerializer(
+                instance.latest_comments, many=True, context=self.context, sparse_fieldsets=False
+            ).data
+        return data
+
+class CommentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    user = PublicUserSerializer(read_only=True)
     feed = serializers.PrimaryKeyRelatedField(queryset=Feed.objects.all())
 
     class Meta:
@@ -24,8 +40,8 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at']
 
 
-class LikeSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class LikeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    user = PublicUserSerializer(read_only=True)
     feed = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
@@ -0,0 +1,153 @@
+"""
+Writes that keep Feed.like_count and Feed.comment_count in step with Like and Comment.
+
+Each change and its counter update share one transaction, and counters move with
+``F() ± 1`` so concurrent writers never lose updates. Rows removed by cascades (e.g. a
+deleted user) are not counted here; ``repair_feed_counters`` fixes such drift.
+
+``like_feed`` / ``unlike_feed`` are idempotent and lock-free: the like is written with
+``INSERT ... ON CONFLICT DO NOTHING RETURNING`` (or a plain conditional DELETE) and only
+a row that really changed moves the counter, read back with ``UPDATE ... RETURNING``.
+Both need a backend with ON CONFLICT and RETURNING (SQLite >= 3.35, PostgreSQL).
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import trending
+from .models import Comment, Feed, Like
+
+
+def _quoted_tables():
+    quote = connection.ops.quote_name
+    return quote(Feed._meta.db_table), quote(Like._meta.db_table)
+
+
+def _shift_like_count(feed_id, delta):
+    """Moves like_count by ``delta`` and rescores the feed. Returns the new like_count."""
+    feed_table, _ = _quoted_tables()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {feed_table} SET like_count = like_count + %s WHERE id = %s "
+            "RETURNING like_count, comment_count, view_count, trending_score",
+            [delta, feed_id],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        raise Feed.DoesNotExist
+    like_count, comment_count, view_count, score = row
+    trending.shift_score(feed_id, score, (like_count - delta, comment_count, view_count),
+                         (like_count, comment_count, view_count))
+    return like_count
+
+
+def _current_like_count(feed_id):
+    like_count = Feed.objects.filter(pk=feed_id).values_list('like_count', flat=True).first()
+    if like_count is None:
+        raise Feed.DoesNotExist
+    return like_count
+
+
+def like_feed(feed_id, user_id):
+    """Likes the feed unless already liked. Returns ``(True, like_count)``.
+
+    Raises Feed.DoesNotExist for an unknown feed.
+    """
+    feed_table, like_table = _quoted_tables()
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # The WHERE EXISTS keeps a missing feed from failing on the foreign key
+            cursor.execute(
+                f"INSERT INTO {like_table} (feed_id, user_id, created_at) "
+                f"SELECT %s, %s, %s WHERE EXISTS (SELECT 1 FROM {feed_table} WHERE id = %s) "
+                "ON CONFLICT (feed_id, user_id) DO NOTHING RETURNING id",
+                [feed_id, user_id, created_at, feed_id],
+            )
+            inserted = cursor.fetchone() is not None
+        like_count = _shift_like_count(feed_id, 1) if inserted else _current_like_count(feed_id)
+    return True, like_count
+
+
+def unlike_feed(feed_id, user_id):
+    """Removes the like if there is one. Returns ``(False, like_count)``.
+
+    Raises Feed.DoesNotExist for an unknown feed.
+    """
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(feed_id=feed_id, user_id=user_id).delete()
+        like_count = _shift_like_count(feed_id, -1) if deleted else _current_like_count(feed_id)
+    return False, like_count
+
+
+def toggle_like(feed_id, user):
+    """Likes the feed, or removes the like if it exists. Returns ``(liked, like_count)``."""
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(feed_id=feed_id, user=user).delete()
+        if deleted:
+            return False, _shift_like_count(feed_id, -1)
+        # A concurrent double tap that already inserted the like makes this a no-op
+        return like_feed(feed_id, user.pk)
+
+
+def create_comment(serializer, **extra):
+    """Saves a CommentSerializer and bumps the feed's comment_count."""
+    with transaction.atomic():
+        comment = serializer.save(**extra)
+        Feed.objects.filter(pk=comment.feed_id).update(comment_count=F('comment_count') + 1)
+        trending.refresh_scores([comment.feed_id])
+    return comment
+
+
+def delete_comment(comment):
+    with transaction.atomic():
+        feed_id = comment.feed_id
+        deleted, _ = Comment.objects.filter(pk=comment.pk).delete()
+        if deleted:
+            Feed.objects.filter(pk=feed_id).update(comment_count=F('comment_count') - 1)
+            trending.refresh_scores([feed_id])
+
+
+def _counts(model, feed_ids=None):
+    """{feed_id: row count} of Like or Comment from a single GROUP BY."""
+    rows = model.objects.all()
+    if feed_ids is not None:
+        rows = rows.filter(feed_id__in=feed_ids)
+    return dict(rows.values('feed_id').annotate(count=Count('id')).order_by().values_list('feed_id', 'count'))
+
+
+def _actual(feed_id, likes, comments):
+    return likes.get(feed_id, 0), comments.get(feed_id, 0)
+
+
+def repair_feed_counters(dry_run=False, batch_size=500):
+    """Recomputes like_count/comment_count of every feed from one GROUP BY per table.
+
+    Drifted feeds are then locked and recounted before writing, so likes/comments made
+    meanwhile are not overwritten. Returns ``(feed_id, stored, actual)`` for each of them,
+    where stored/actual are ``(like_count, comment_count)`` pairs.
+    """
+    likes, comments = _counts(Like), _counts(Comment)
+    stored = {
+        feed_id: (like_count, comment_count)
+        for feed_id, like_count, comment_count
+        in Feed.objects.values_list('id', 'like_count', 'comment_count').iterator()
+    }
+    drifted_ids = [feed_id for feed_id, counts in stored.items() if counts != _actual(feed_id, likes, comments)]
+    if not drifted_ids:
+        return []
+    if dry_run:
+        return [(feed_id, stored[feed_id], _actual(feed_id, likes, comments)) for feed_id in drifted_ids]
+
+    with transaction.atomic():
+        feeds = list(Feed.objects.select_for_update().filter(pk__in=drifted_ids).order_by('pk'))
+        likes, comments = _counts(Like, drifted_ids), _counts(Comment, drifted_ids)
+        drifted = [(feed.pk, (feed.like_count, feed.comment_count), _actual(feed.pk, likes, comments))
+                   for feed in feeds
+                   if (feed.like_count, feed.comment_count) != _actual(feed.pk, likes, comments)]
+        Feed.objects.bulk_update(
+            [Feed(pk=feed_id, like_count=actual[0], comment_count=actual[1]) for feed_id, _, actual in drifted],
+            ['like_count', 'comment_count'], batch_size=batch_size,
+        )
+        trending.refresh_scores([feed_id for feed_id, _, _ in drifted])
+    return drifted
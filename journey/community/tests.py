@@ -1,3 +1,423 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.db import DatabaseError
+from django.db.models import F
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.fast_serializers import ValuesSerializer
+from user_manager.models import User
+
+from . import previews, services, trending, view_counter
+from .hll import HyperLogLog
+from .models import Comment, Feed, Like
+from .serializers import FeedSerializer
+from .views import FeedViewSet
+
+
+@override_settings(FEED_VIEW_COUNTER={'ENABLED': False})
+class ValuesSerializerParityTests(TestCase):
+    """config.fast_serializers must produce exactly what FeedSerializer produces."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='writer@example.com', nickname='writer',
+                                       profile_image='https://example.com/me.png')
+        other = User.objects.create(email='reader@example.com', nickname='reader')
+        for index in range(3):
+            Feed.objects.create(user=cls.user if index % 2 else other, content=f'post {index}',
+                                view_count=index, like_count=index * 2)
+
+    def test_feed_serializer(self):
+        queryset = Feed.objects.order_by('id')
+        values_serializer = ValuesSerializer(FeedSerializer)
+        actual = values_serializer.serialize(values_serializer.project(queryset))
+        self.assertEqual(actual, [dict(item) for item in FeedSerializer(queryset, many=True).data])
+
+    def test_list_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = client.get('/api/community/feeds/?limit=2').json()
+        with override_settings(FAST_LIST_SERIALIZATION=True):
+            actual = client.get('/api/community/feeds/?limit=2').json()
+        self.assertEqual(actual, expected)
+        self.assertIsNotNone(actual['next'])
+
+
+@override_settings(FEED_VIEW_COUNTER={'ENABLED': False})
+class FeedUpdateTests(TestCase):
+    """Editing a feed must not write back its concurrently maintained counters."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='editor@example.com', nickname='editor')
+        cls.feed = Feed.objects.create(user=cls.user, content='draft', like_count=1, comment_count=1)
+
+    def test_patch_keeps_concurrent_counters(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        get_object = FeedViewSet.get_object
+
+        def get_object_then_like(view):
+            feed = get_object(view)
+            # A like and a comment land between loading the feed and saving the edit
+            Feed.objects.filter(pk=feed.pk).update(like_count=F('like_count') + 1,
+                                                   comment_count=F('comment_count') + 1)
+            return feed
+
+        with mock.patch.object(FeedViewSet, 'get_object', get_object_then_like):
+            response = client.patch(f'/api/community/feeds/{self.feed.pk}/', {'content': 'final'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['content'], 'final')
+        self.feed.refresh_from_db()
+        self.assertEqual((self.feed.content, self.feed.like_count, self.feed.comment_count), ('final', 2, 2))
+
+
+@override_settings(FEED_VIEW_COUNTER={'ENABLED': False})
+class FeedCounterTests(TestCase):
+    """like_count and comment_count follow likes and comments, and drift is repaired."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='counter@example.com', nickname='counter')
+        cls.feed = Feed.objects.create(user=cls.user, content='post')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counts(self):
+        self.feed.refresh_from_db()
+        return self.feed.like_count, self.feed.comment_count
+
+    def test_like_toggle(self):
+        url = f'/api/community/feeds/{self.feed.pk}/like/'
+        response = self.client.post(url)
+        self.assertEqual((response.status_code, response.json()['like_count']), (201, 1))
+        self.assertEqual(self.counts(), (1, 0))
+        self.assertEqual(self.client.post(url).status_code, 204)
+        self.assertEqual(self.counts(), (0, 0))
+        self.assertFalse(Like.objects.exists())
+
+    def test_comment_create_delete(self):
+        response = self.client.post('/api/community/comments/', {'feed': self.feed.pk, 'content': 'hi'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.client.post('/api/community/comments/', {'feed': self.feed.pk, 'content': 'again'}, format='json')
+        self.assertEqual(self.counts(), (0, 2))
+        self.assertEqual(self.client.delete(f"/api/community/comments/{response.json()['id']}/").status_code, 204)
+        self.assertEqual(self.counts(), (0, 1))
+
+    def repair(self, *args):
+        out = StringIO()
+        call_command('repair_feed_counters', *args, stdout=out)
+        return out.getvalue()
+
+    def test_repair(self):
+        other = Feed.objects.create(user=self.user, content='untouched')
+        Like.objects.create(feed=self.feed, user=self.user)
+        Comment.objects.create(feed=self.feed, user=self.user, content='raw')
+        Feed.objects.filter(pk=self.feed.pk).update(like_count=5)
+
+        self.assertIn(f'feed {self.feed.pk}: likes 5 -> 1, comments 0 -> 1', self.repair('--dry-run'))
+        self.assertEqual(self.counts(), (5, 0))
+        self.assertIn('1 feeds fixed', self.repair())
+        self.assertEqual(self.counts(), (1, 1))
+        other.refresh_from_db()
+        self.assertEqual((other.like_count, other.comment_count), (0, 0))
+        self.assertIn('0 feeds fixed', self.repair())
+
+
+@override_settings(FEED_VIEW_COUNTER={'ENABLED': False}, FAST_LIST_SERIALIZATION=False)
+class SparseFieldsetTests(TestCase):
+    """Narrowed feed queries still load the nested author and the comment previews."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='sparse@example.com', nickname='sparse')
+        cls.feed = Feed.objects.create(user=cls.user, content='post')
+        Comment.objects.create(feed=cls.feed, user=cls.user, content='first!')
+
+    def test_nested_fields(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertNumQueries(1):
+            rows = client.get('/api/community/feeds/', {'fields': 'id,user'}).json()['results']
+        self.assertEqual(rows, [{'id': self.feed.pk, 'user': {'id': self.user.pk, 'nickname': 'sparse',
+                                                                'profile_image': None}}])
+        rows = client.get('/api/community/feeds/', {'fields': 'id', 'include_comments': 'true'}).json()['results']
+        self.assertEqual([comment['content'] for comment in rows[0]['latest_comments']], ['first!'])
+
+
+class ViewCounterTests(TestCase):
+    """Views are buffered, written in one batch and kept when a flush fails."""
+    OPTIONS = {'ENABLED': True, 'FLUSH_INTERVAL': 3600, 'MAX_PENDING': 3}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='viewed@example.com', nickname='viewed')
+        cls.feeds = [Feed.objects.create(user=cls.user, content=f'post {index}') for index in range(2)]
+
+    def setUp(self):
+        # The flusher thread would write outside the test transaction; flushes run inline instead
+        patcher = mock.patch.object(view_counter.ViewCounterBuffer, '_ensure_flusher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = view_counter.ViewCounterBuffer(self.OPTIONS)
+
+    def stored(self):
+        return list(Feed.objects.order_by('pk').values_list('view_count', 'unique_viewers'))
+
+    def test_buffered_until_flush(self):
+        first, second = self.feeds
+        for viewer in (1, 2, 2):
+            self.buffer.add(first.pk, viewer)
+        self.buffer.add(second.pk)
+        self.assertEqual((self.buffer.pending(first.pk), len(self.buffer)), (3, 4))
+        self.assertEqual(self.stored(), [(0, 0), (0, 0)])
+
+        self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(self.stored(), [(3, 2), (1, 0)])
+        self.assertEqual((self.buffer.pending(first.pk), self.buffer.flush()), (0, 0))
+
+    def test_sketches_of_workers_merge(self):
+        # Two worker processes saw overlapping viewers; each flush merges into the stored sketch
+        feed = self.feeds[0]
+        workers = [view_counter.ViewCounterBuffer(dict(self.OPTIONS, MAX_PENDING=10 ** 6)) for _ in range(2)]
+        for worker, viewers in zip(workers, (range(0, 600), range(400, 1000))):
+            for viewer in viewers:
+                worker.add(feed.pk, viewer)
+        with mock.patch.object(Feed.objects, 'select_for_update', wraps=Feed.objects.select_for_update) as locked:
+            workers[0].flush()
+        locked.assert_called_once_with()
+        workers[1].flush()
+        feed.refresh_from_db()
+        self.assertEqual(feed.view_count, 1200)
+        self.assertAlmostEqual(feed.unique_viewers, 1000, delta=100)
+        # Register-wise max: the stored sketch is the one of all viewers
+        expected = HyperLogLog()
+        for viewer in range(1000):
+            expected.add(viewer)
+        self.assertEqual(bytes(feed.unique_viewer_sketch), expected.to_bytes())
+
+    def test_max_pending_wakes_flusher(self):
+        for _ in range(self.OPTIONS['MAX_PENDING'] - 1):
+            self.buffer.add(self.feeds[0].pk)
+        self.assertFalse(self.buffer._wakeup.is_set())
+        self.buffer.add(self.feeds[1].pk)
+        self.assertTrue(self.buffer._wakeup.is_set())
+
+    def test_failed_flush_kept(self):
+        self.buffer.add(self.feeds[0].pk, 1)
+        with mock.patch.object(Feed.objects, 'filter', side_effect=DatabaseError('locked')), \
+                self.assertLogs('community.view_counter', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.buffer.add(self.feeds[0].pk, 2)
+        self.assertEqual(self.buffer.pending(self.feeds[0].pk), 2)
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.stored()[0], (2, 2))
+
+    def test_disabled_writes_through(self):
+        buffer = view_counter.ViewCounterBuffer(dict(self.OPTIONS, ENABLED=False))
+        self.assertEqual(buffer.add(self.feeds[0].pk, 1), 1)
+        self.assertEqual((len(buffer), self.stored()[0]), (0, (1, 1)))
+
+    def test_exit_flush_skipped_without_table(self):
+        self.buffer.add(self.feeds[0].pk)
+        with mock.patch.object(view_counter, '_buffer', self.buffer), \
+                mock.patch.object(view_counter.connection.introspection, 'table_names', return_value=[]), \
+                self.assertLogs('community.view_counter', 'WARNING'):
+            view_counter._flush_at_exit()
+        self.assertEqual(self.stored()[0], (0, 0))
+        with mock.patch.object(view_counter, '_buffer', self.buffer):
+            view_counter._flush_at_exit()
+        self.assertEqual(self.stored()[0], (1, 0))
+
+
+class HyperLogLogTests(SimpleTestCase):
+    """Estimates stay within a few standard errors (~3.3%) and merges are unions."""
+
+    def sketch(self, values):
+        sketch = HyperLogLog()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def assertEstimate(self, sketch, expected):
+        self.assertAlmostEqual(sketch.count(), expected, delta=expected * 0.1)
+
+    def test_estimate(self):
+        self.assertEqual(HyperLogLog().count(), 0)
+        self.assertEqual(self.sketch([7, 7, '7']).count(), 1)
+        for size in (100, 5000, 50000):
+            self.assertEstimate(self.sketch(range(size)), size)
+
+    def test_merge(self):
+        merged = self.sketch(range(0, 3000)).merge(self.sketch(range(2000, 5000)))
+        self.assertEstimate(merged, 5000)
+        self.assertEqual(merged.to_bytes(), self.sketch(range(5000)).to_bytes())
+        with self.assertRaises(ValueError):
+            merged.merge(HyperLogLog(precision=8))
+
+    def test_round_trip(self):
+        sketch = self.sketch(range(300))
+        self.assertEqual(HyperLogLog.from_bytes(sketch.to_bytes()).count(), sketch.count())
+        self.assertFalse(HyperLogLog.from_bytes(b''))
+        with self.assertRaises(ValueError):
+            HyperLogLog.from_bytes(b'short')
+
+
+@override_settings(FEED_VIEW_COUNTER={'ENABLED': False}, FEED_TRENDING={'DECAY_SECONDS': 3600})
+class TrendingTests(TestCase):
+    """Engagement raises a feed, age sinks it, and /feeds/trending/ pages through the ranking."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='trend@example.com', nickname='trend')
+
+    def feed(self, hours_ago=0, likes=0, comments=0, views=0):
+        feed = Feed.objects.create(user=self.user, content='post', like_count=likes,
+                                   comment_count=comments, view_count=views)
+        Feed.objects.filter(pk=feed.pk).update(created_at=timezone.now() - timedelta(hours=hours_ago))
+        trending.refresh_scores([feed.pk])
+        feed.refresh_from_db()
+        return feed
+
+    def test_score(self):
+        now = timezone.now()
+
+        def score(hours_ago=0, **counts):
+            counts = {'like_count': 0, 'comment_count': 0, 'view_count': 0, **counts}
+            return trending.score(SimpleNamespace(created_at=now - timedelta(hours=hours_ago), **counts))
+
+        self.assertGreater(score(like_count=2), score(like_count=1))
+        self.assertGreater(score(comment_count=1), score(like_count=1))
+        self.assertGreater(score(), score(hours_ago=1))
+        # Ten times the engagement makes up for one DECAY_SECONDS of age
+        self.assertAlmostEqual(score(hours_ago=1, view_count=1000), score(view_count=100))
+
+    def test_trending_pages(self):
+        old_hit = self.feed(hours_ago=2, likes=1000)
+        fresh = self.feed()
+        old = self.feed(hours_ago=3)
+        ties = [self.feed(hours_ago=1, likes=20) for _ in range(2)]
+        expected = [old_hit.pk, ties[1].pk, ties[0].pk, fresh.pk, old.pk]
+        # Same score: the newer id first, as in community_feed_trending_idx
+        Feed.objects.filter(pk=ties[0].pk).update(trending_score=ties[1].trending_score)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        seen, url = [], '/api/community/feeds/trending/?limit=2'
+        while url:
+            page = client.get(url).json()
+            seen.extend(row['id'] for row in page['results'])
+            url = page['next']
+        self.assertEqual(seen, expected)
+
+    def test_like_rescores(self):
+        leader, follower = self.feed(likes=2), self.feed()
+        for liker in range(3):
+            services.like_feed(follower.pk, User.objects.create(email=f'{liker}@example.com', nickname=f'l{liker}').pk)
+        follower.refresh_from_db()
+        self.assertGreater(follower.trending_score, leader.trending_score)
+        self.assertAlmostEqual(follower.trending_score, trending.score(follower))
+
+
+@override_settings(FEED_VIEW_COUNTER={'ENABLED': False}, FAST_LIST_SERIALIZATION=False)
+class CommentPreviewTests(TestCase):
+    """Feed pages embed the 3 newest comments of each feed from one query; comment lists page per feed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='preview@example.com', nickname='preview')
+        cls.busy = Feed.objects.create(user=cls.user, content='busy')
+        cls.quiet = Feed.objects.create(user=cls.user, content='quiet')
+        cls.silent = Feed.objects.create(user=cls.user, content='silent')
+        for index in range(5):
+            Comment.objects.create(feed=cls.busy, user=cls.user, content=f'busy {index}')
+        Comment.objects.create(feed=cls.quiet, user=cls.user, content='quiet 0')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_latest_comments(self):
+        with self.assertNumQueries(1):
+            result = previews.latest_comments([self.busy.pk, self.quiet.pk, self.silent.pk])
+        self.assertEqual({feed_id: [comment.content for comment in comments] for feed_id, comments in result.items()}, {
+            self.busy.pk: ['busy 2', 'busy 3', 'busy 4'],
+            self.quiet.pk: ['quiet 0'],
+            self.silent.pk: [],
+        })
+        self.assertEqual(previews.latest_comments([]), {})
+
+    def test_feed_page(self):
+        # Feed page, then one query for every preview on it
+        with self.assertNumQueries(2):
+            rows = self.client.get('/api/community/feeds/', {'include_comments': 'true'}).json()['results']
+        embedded = {row['id']: [comment['content'] for comment in row['latest_comments']] for row in rows}
+        self.assertEqual(embedded[self.busy.pk], ['busy 2', 'busy 3', 'busy 4'])
+        self.assertEqual(embedded[self.silent.pk], [])
+        rows = self.client.get('/api/community/feeds/').json()['results']
+        self.assertNotIn('latest_comments', rows[0])
+
+    def test_comment_list(self):
+        seen, url = [], f'/api/community/comments/?feed={self.busy.pk}&limit=2'
+        while url:
+            page = self.client.get(url).json()
+            seen.extend(comment['content'] for comment in page['results'])
+            url = page['next']
+        self.assertEqual(seen, [f'busy {index}' for index in range(5)])
+        self.assertEqual(self.client.get('/api/community/comments/', {'feed': 'x'}).status_code, 400)
+
+
+@override_settings(FEED_VIEW_COUNTER={'ENABLED': False})
+class IdempotentLikeTests(TestCase):
+    """PUT / DELETE on /like/ set the like state, however often they are repeated."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='liker@example.com', nickname='liker')
+        cls.other = User.objects.create(email='fan@example.com', nickname='fan')
+        cls.feed = Feed.objects.create(user=cls.user, content='hot')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/community/feeds/{self.feed.pk}/like/'
+
+    def send(self, method, url=None):
+        response = getattr(self.client, method)(url or self.url)
+        return response.status_code, response.json() if response.status_code == 200 else None
+
+    def test_put_delete(self):
+        services.like_feed(self.feed.pk, self.other.pk)
+        for _ in range(2):
+            self.assertEqual(self.send('put'), (200, {'liked': True, 'like_count': 2}))
+        for _ in range(2):
+            self.assertEqual(self.send('delete'), (200, {'liked': False, 'like_count': 1}))
+        self.feed.refresh_from_db()
+        self.assertEqual(self.feed.like_count, 1)
+        self.assertEqual(list(Like.objects.values_list('user_id', flat=True)), [self.other.pk])
+
+    def test_missing_feed(self):
+        for method in ('put', 'delete'):
+            self.assertEqual(self.send(method, '/api/community/feeds/0/like/')[0], 404)
+        self.assertFalse(Like.objects.exists())
+
+    def test_insert_on_conflict(self):
+        # The raw INSERT ... ON CONFLICT DO NOTHING RETURNING on the test backend
+        self.assertEqual(services.like_feed(self.feed.pk, self.user.pk), (True, 1))
+        self.assertEqual(services.like_feed(self.feed.pk, self.user.pk), (True, 1))
+        like = Like.objects.get()
+        self.assertEqual((like.feed_id, like.user_id), (self.feed.pk, self.user.pk))
+        self.assertIsNotNone(like.created_at)
+        with self.assertRaises(Feed.DoesNotExist):
+            services.like_feed(0, self.user.pk)
+        self.assertEqual(services.unlike_feed(self.feed.pk, self.user.pk), (False, 0))
+        self.assertEqual(services.unlike_feed(self.feed.pk, self.user.pk), (False, 0))
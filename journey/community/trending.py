@@ -0,0 +1,85 @@
+"""
+Time-decayed trending score of feeds.
+
+    score = log10(max(engagement, 1)) + created_at / DECAY_SECONDS
+    engagement = LIKE_WEIGHT * likes + COMMENT_WEIGHT * comments + VIEW_WEIGHT * views
+
+A post needs ten times the engagement to rank level with one published DECAY_SECONDS
+later, so older posts sink without ever being rescored: the score only changes when the
+post's own counters do. It is stored in the indexed ``Feed.trending_score`` column and
+refreshed by community.services (likes, comments; the lock-free like path shifts the
+engagement term with ``shift_score`` instead of rereading the row), community.view_counter
+(view flushes) and FeedViewSet.perform_create, so ``/feeds/trending/`` is a top-K scan of that index.
+``refresh_trending_scores`` recomputes every feed, e.g. after changing the weights.
+"""
+import math
+
+from django.conf import settings
+
+from .models import Feed
+
+DEFAULTS = {
+    'LIKE_WEIGHT': 3.0,
+    'COMMENT_WEIGHT': 5.0,
+    'VIEW_WEIGHT': 0.1,
+    'DECAY_SECONDS': 12 * 60 * 60,
+}
+
+SCORE_FIELDS = ('id', 'like_count', 'comment_count', 'view_count', 'created_at', 'trending_score')
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'FEED_TRENDING', {}))
+    return options
+
+
+def engagement_term(like_count, comment_count, view_count, options):
+    engagement = (options['LIKE_WEIGHT'] * like_count
+                  + options['COMMENT_WEIGHT'] * comment_count
+                  + options['VIEW_WEIGHT'] * view_count)
+    return math.log10(max(engagement, 1))
+
+
+def score(feed, options=None):
+    options = options or get_options()
+    return (engagement_term(feed.like_count, feed.comment_count, feed.view_count, options)
+            + feed.created_at.timestamp() / options['DECAY_SECONDS'])
+
+
+def shift_score(feed_id, current_score, before, after):
+    """Rescores a feed whose ``(likes, comments, views)`` went from ``before`` to ``after``
+    by swapping the engagement term of ``current_score``, without reading the row."""
+    options = get_options()
+    new_score = current_score - engagement_term(*before, options) + engagement_term(*after, options)
+    Feed.objects.filter(pk=feed_id).update(trending_score=new_score)
+    return new_score
+
+
+def refresh_scores(feed_ids):
+    """Recomputes the score of the given feeds from their stored counters."""
+    options = get_options()
+    feeds = list(Feed.objects.filter(pk__in=feed_ids).only(*SCORE_FIELDS))
+    for feed in feeds:
+        feed.trending_score = score(feed, options)
+    Feed.objects.bulk_update(feeds, ['trending_score'])
+
+
+def refresh_all_scores(batch_size=1000):
+    """Recomputes every feed's score. Returns the number of feeds updated."""
+    options = get_options()
+    updated = 0
+    batch = []
+    for feed in Feed.objects.only(*SCORE_FIELDS).order_by('pk').iterator(chunk_size=batch_size):
+        new_score = score(feed, options)
+        if new_score != feed.trending_score:
+            feed.trending_score = new_score
+            batch.append(feed)
+        if len(batch) >= batch_size:
+            Feed.objects.bulk_update(batch, ['trending_score'])
+            updated += len(batch)
+            batch = []
+    if batch:
+        Feed.objects.bulk_update(batch, ['trending_score'])
+        updated += len(batch)
+    return updated
@@ -0,0 +1,198 @@
+"""
+Write-behind buffer for Feed.view_count and the unique-viewer sketches.
+
+A feed detail GET only bumps an in-process counter; the buffered increments are written
+to the database in one short transaction every ``FLUSH_INTERVAL`` seconds, or as soon as
+``MAX_PENDING`` views are waiting. Feeds that received the same number of views share a
+single ``UPDATE ... SET view_count = view_count + n WHERE id IN (...)``, so a viral post
+costs one write per interval instead of one per reader.
+
+Viewers go into a per-feed HyperLogLog sketch (community.hll) held in the buffer. On
+flush it is merged into the stored ``Feed.unique_viewer_sketch`` under a row lock
+(register-wise max, so sketches from every worker combine), and the estimate is saved in
+``Feed.unique_viewers`` for cheap reads. Flushed feeds get their trending score refreshed.
+
+Serialized feeds show the stored value plus the views still pending in this process.
+Pending views are flushed when the process exits normally (gunicorn/runserver shutdown),
+unless the feed table is gone by then (e.g. the test database was destroyed); a failed
+flush puts its increments back into the buffer for the next attempt. Tests turn
+buffering off with ``FEED_VIEW_COUNTER['ENABLED'] = False``.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.dispatch import receiver
+
+from . import trending
+from .hll import HyperLogLog
+from .models import Feed
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'FLUSH_INTERVAL': 5.0,
+    'MAX_PENDING': 1000,
+}
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'FEED_VIEW_COUNTER', {}))
+    return options
+
+
+class ViewCounterBuffer:
+    def __init__(self, options):
+        self.options = options
+        self._pending = Counter()
+        self._viewers = {}  # feed_id -> HyperLogLog of viewers not yet written
+        self._total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, feed_id, viewer_id=None):
+        """Counts one view of ``feed_id`` (by ``viewer_id``, if known). Returns how many views
+        were written right away (1 when buffering is disabled, else 0)."""
+        viewers = {}
+        if viewer_id is not None:
+            viewers[feed_id] = HyperLogLog()
+            viewers[feed_id].add(viewer_id)
+        if not self.options['ENABLED']:
+            self._write(Counter({feed_id: 1}), viewers)
+            return 1
+        self._ensure_flusher()
+        with self._lock:
+            self._pending[feed_id] += 1
+            if viewer_id is not None:
+                self._viewers.setdefault(feed_id, HyperLogLog()).add(viewer_id)
+            self._total += 1
+            full = self._total >= self.options['MAX_PENDING']
+        if full:
+            self._wakeup.set()
+        return 0
+
+    def pending(self, feed_id):
+        """Views of ``feed_id`` counted in this process but not yet written."""
+        with self._lock:
+            return self._pending.get(feed_id, 0)
+
+    def __len__(self):
+        """Number of views waiting to be written."""
+        with self._lock:
+            return self._total
+
+    def flush(self):
+        """Writes every pending increment. Returns the number of views written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                viewers, self._viewers = self._viewers, {}
+                self._total = 0
+            if not pending and not viewers:
+                return 0
+            try:
+                self._write(pending, viewers)
+            except Exception:
+                logger.exception("Flushing %d feed views failed; keeping them for the next flush", pending.total())
+                with self._lock:
+                    self._pending.update(pending)
+                    self._total += pending.total()
+                    for feed_id, sketch in viewers.items():
+                        self._viewers.setdefault(feed_id, HyperLogLog()).merge(sketch)
+                return 0
+            return pending.total()
+
+    @staticmethod
+    def _write(pending, viewers):
+        by_delta = defaultdict(list)
+        for feed_id, delta in pending.items():
+            by_delta[delta].append(feed_id)
+        with transaction.atomic():
+            for delta, feed_ids in by_delta.items():
+                Feed.objects.filter(pk__in=feed_ids).update(view_count=F('view_count') + delta)
+            if viewers:
+                feeds = list(Feed.objects.select_for_update().filter(pk__in=viewers)
+                             .only('id', 'unique_viewer_sketch').order_by('pk'))
+                for feed in feeds:
+                    sketch = HyperLogLog.from_bytes(feed.unique_viewer_sketch).merge(viewers[feed.pk])
+                    feed.unique_viewer_sketch = sketch.to_bytes()
+                    feed.unique_viewers = sketch.count()
+                Feed.objects.bulk_update(feeds, ['unique_viewer_sketch', 'unique_viewers'])
+            if pending:
+                trending.refresh_scores(list(pending))
+
+    def _ensure_flusher(self):
+        # Started lazily so the thread belongs to the worker process, not a pre-fork master
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='feed-view-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.options['FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # The flusher holds its own connection; do not keep it open between flushes
+                close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ViewCounterBuffer(get_options())
+    return _buffer
+
+
+def record_view(feed_id, viewer_id=None):
+    return get_buffer().add(feed_id, viewer_id)
+
+
+def pending_views(feed_id):
+    return _buffer.pending(feed_id) if _buffer is not None else 0
+
+
+def flush():
+    return _buffer.flush() if _buffer is not None else 0
+
+
+@atexit.register
+def _flush_at_exit():
+    if not _buffer:
+        return
+    try:
+        usable = Feed._meta.db_table in connection.introspection.table_names()
+    except Exception:
+        usable = False
+    if usable:
+        flush()
+    else:
+        logger.warning("Dropping %d buffered feed views: the feed table is not available", len(_buffer))
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    global _buffer
+    if setting == 'FEED_VIEW_COUNTER':
+        flush()
+        with _buffer_lock:
+            _buffer = None
@@ -1,61 +1,125 @@
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404
-from django.db.models import F
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from .models import Feed, Comment, Like
 from .serializers import FeedSerializer, CommentSerializer, LikeSerializer
 from .permissions import IsOwnerOrReadOnly
+from config.fast_serializers import ValuesListMixin
+from config.fieldsets import SparseFieldsetViewMixin
+from config.pagination import KeysetPagination
+from . import previews, services, trending, view_counter
 
-class FeedViewSet(viewsets.ModelViewSet):
-    queryset = Feed.objects.all()
+
+class TrendingPagination(KeysetPagination):
+    ordering = ('-trending_score', '-id')  # community_feed_trending_idx
+
+class FeedViewSet(SparseFieldsetViewMixin, ValuesListMixin, viewsets.ModelViewSet):
+    # The viewer sketch is only read when flushing views (community.view_counter)
+    queryset = Feed.objects.select_related('user').defer('unique_viewer_sketch')
     serializer_class = FeedSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = KeysetPagination # newest first, (created_at, id)
+
+    def wants_comment_preview(self):
+        # ?include_comments=true embeds each feed's latest comments (community.previews)
+        return self.request.query_params.get('include_comments', '').lower() in ('1', 'true', 'yes')
+
+    def use_values_list(self):
+        # Comment previews are attached to Feed instances
+        return super().use_values_list() and not self.wants_comment_preview()
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.wants_comment_preview():
+            # Latest comments of the whole page in one window-function query
+            previews.attach_latest_comments(page)
+        return page
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        instance.view_count = F('view_count') + 1
-        instance.save(update_fields=['view_count'])
-        instance.refresh_from_db()
-        
+        # Buffered and written in batches; the serializer adds the pending views
+        instance.view_count += view_counter.record_view(instance.pk, request.user.pk)
+
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
     def perform_create(self, serializer):
         # Automatically set the user to the logged-in user upon creation
-        serializer.save(user=self.request.user)
+        feed = serializer.save(user=self.request.user)
+        feed.trending_score = trending.score(feed)
+        feed.save(update_fields=['trending_score'])
+
+    def perform_update(self, serializer):
+        # Save only the edited fields: the counters are written concurrently with F()
+        # (community.services, view_counter) and saving the loaded values would undo those writes
+        feed = serializer.instance
+        for field, value in serializer.validated_data.items():
+            setattr(feed, field, value)
+        feed.save(update_fields=list(serializer.validated_data))
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Feeds ranked by time-decayed engagement (see community.trending), highest first.
+        Accepts `?include_comments=true` like the list."""
+        paginator = TrendingPagination()
+        page = paginator.paginate_queryset(self.get_queryset(), request, view=self)
+        if self.wants_comment_preview():
+            previews.attach_latest_comments(page)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def like(self, request, pk=None):
         feed = self.get_object()
-        user = request.user
-        
+
+        # Toggle the like and like_count in one transaction
+        liked, like_count = services.toggle_like(feed.pk, request.user)
+        if liked:
+            return Response({'status': 'liked', 'like_count': like_count}, status=status.HTTP_201_CREATED)
+        # The like existed and was removed (unlike)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @like.mapping.put
+    def set_like(self, request, pk=None):
+        """Idempotent like: PUT likes the feed whether or not it was liked before."""
+        return self._like_state_response(services.like_feed, pk)
+
+    @like.mapping.delete
+    def unset_like(self, request, pk=None):
+        """Idempotent unlike: DELETE removes the like if there is one."""
+        return self._like_state_response(services.unlike_feed, pk)
+
+    def _like_state_response(self, operation, pk):
+        # No get_object(): the write itself tells whether the feed exists
         try:
-            # Check if the user already liked this feed
-            like = Like.objects.get(feed=feed, user=user)
-            # If like exists, delete it (unlike)
-            like.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except Like.DoesNotExist:
-            # If like does not exist, create it (like)
-            Like.objects.create(feed=feed, user=user)
-            # Optionally return the created like data or just success
-            # serializer = LikeSerializer(like_instance) # If you need to return data
-            return Response({'status': 'liked'}, status=status.HTTP_201_CREATED)
-
-class CommentViewSet(viewsets.ModelViewSet):
+            liked, like_count = operation(int(pk), self.request.user.pk)
+        except (Feed.DoesNotExist, ValueError):
+            raise Http404
+        return Response({'liked': liked, 'like_count': like_count})
+
+class CommentViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('created_at', 'id') # conversation order, oldest first
 
     def get_queryset(self):
-        queryset = Comment.objects.all()
-        # Filter comments based on the 'feed' query parameter
+        queryset = Comment.objects.select_related('user')
+        # Filter comments based on the 'feed' query parameter (served by community_comment_feed_idx)
         feed_id = self.request.query_params.get('feed', None)
         if feed_id is not None:
-            queryset = queryset.filter(feed__id=feed_id)
+            if not feed_id.isdigit():
+                raise ValidationError({'feed': 'A valid feed id is required.'})
+            queryset = queryset.filter(feed_id=feed_id)
         return queryset
 
     def perform_create(self, serializer):
         # Automatically set the user upon creation
         # Feed is now handled by the serializer based on request data
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        services.create_comment(serializer, user=self.request.user)
+
+    def perform_destroy(self, instance):
+        services.delete_comment(instance)
\ No newline at end of file
@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve with an ASGI server (e.g. ``uvicorn config.asgi:application``) to use the async
+LLM streaming endpoint ``/api/ai/stream/async/``, which does not hold a worker thread
+while the model is generating.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
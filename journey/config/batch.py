@@ -0,0 +1,159 @@
+"""
+Batched GET sub-requests: POST /api/batch/
+
+    {"requests": [{"id": "crews", "path": "/api/crew/my-crews/"},
+                  {"id": "live", "path": "/api/users/my-challenges/?status=LIVE"}]}
+
+Each sub-request is resolved with the URL resolver and dispatched in-process to its view,
+so it gets the view's own permissions, pagination, caching and validators. The batch is
+authenticated once: sub-requests reuse the caller's user instance (DRF forced
+authentication), on which the crew memberships (crew.membership_cache) are loaded once
+for all of them. The response lists
+``{"id", "status", "body"}`` in request order; one failing sub-request does not fail the
+others.
+
+Sub-requests run on a small thread pool (``BATCH['WORKERS']``); each worker thread has
+its own database connection, closed when the sub-request ends. Inside a transaction
+(e.g. ATOMIC_REQUESTS or tests) they run one after another instead, since other
+connections would not see its uncommitted rows. Only GET is allowed, at most
+``BATCH['MAX_REQUESTS']`` per batch, and batches cannot be nested.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve, reverse
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from crew import membership_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_REQUESTS': 10,
+    'WORKERS': 4,
+}
+
+# Headers of the batch request that must not leak into its sub-requests
+SKIPPED_META = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH',
+                'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_UNMODIFIED_SINCE', 'HTTP_IF_RANGE')
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'BATCH', {}))
+    return options
+
+
+class SubRequestError(Exception):
+    def __init__(self, detail, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def build_request(request, path):
+    """A GET HttpRequest for ``path`` carrying the batch request's environment and user."""
+    url = urlsplit(path)
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = url.path
+    sub.META = {key: value for key, value in request.META.items() if key not in SKIPPED_META}
+    sub.META.update(REQUEST_METHOD='GET', PATH_INFO=url.path, QUERY_STRING=url.query)
+    sub.GET = QueryDict(url.query)
+    sub.COOKIES = request.COOKIES
+    # Authenticated once for the whole batch (see rest_framework.request.Request)
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def resolve_view(path):
+    if not isinstance(path, str) or not path.startswith('/api/'):
+        raise SubRequestError("path must be an /api/ URL.")
+    url_path = urlsplit(path).path
+    if url_path == reverse('batch'):
+        raise SubRequestError("Batches cannot be nested.")
+    try:
+        match = resolve(url_path)
+    except Resolver404:
+        raise SubRequestError("Not found.", status.HTTP_404_NOT_FOUND)
+    if iscoroutinefunction(match.func):
+        raise SubRequestError("Asynchronous (streaming) endpoints cannot be batched.")
+    return match
+
+
+def response_body(response):
+    if isinstance(response, Response):
+        return response.data
+    if not response.streaming and response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(response.content or 'null')
+    return None
+
+
+def dispatch(request, item):
+    """Runs one sub-request; returns ``(status, body)``."""
+    try:
+        if not isinstance(item, dict):
+            raise SubRequestError("Each request must be an object.")
+        if str(item.get('method') or 'GET').upper() != 'GET':
+            raise SubRequestError("Only GET requests can be batched.")
+        path = item.get('path')
+        match = resolve_view(path)
+        response = match.func(build_request(request, path), *match.args, **match.kwargs)
+        return response.status_code, response_body(response)
+    except SubRequestError as e:
+        return e.status_code, {'detail': e.detail}
+    except Exception:
+        logger.exception("Batched request %r failed", item)
+        return status.HTTP_500_INTERNAL_SERVER_ERROR, {'detail': 'Internal server error.'}
+
+
+def _dispatch_in_thread(request, item):
+    try:
+        return dispatch(request, item)
+    finally:
+        # Worker threads hold their own connection; do not leak it
+        connection.close()
+
+
+class BatchView(APIView):
+    """
+    Runs several GET sub-requests in one round trip.
+
+    Body: ``{"requests": [{"id": "<any>", "path": "/api/...?query"}, ...]}``.
+    Response: ``{"responses": [{"id", "status", "body"}, ...]}`` in the same order.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        options = get_options()
+        items = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({'detail': 'requests must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > options['MAX_REQUESTS']:
+            return Response({'detail': f"At most {options['MAX_REQUESTS']} requests per batch."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Memoized on the user instance every sub-request shares: one membership lookup per batch
+        membership_cache.get_memberships(request.user)
+
+        workers = min(options['WORKERS'], len(items))
+        if workers <= 1 or connection.in_atomic_block:
+            results = [dispatch(request, item) for item in items]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as executor:
+                results = list(executor.map(lambda item: _dispatch_in_thread(request, item), items))
+
+        return Response({'responses': [
+            {'id': item.get('id') if isinstance(item, dict) else None, 'status': status_code, 'body': body}
+            for item, (status_code, body) in zip(items, results)
+        ]})
@@ -0,0 +1,96 @@
+"""
+Conditional GET (ETag / Last-Modified) for list and detail endpoints.
+
+``ConditionalGetMixin`` versions a ``list`` response with one aggregate over the filtered
+queryset, ``Max(updated_at)``, ``Count(pk)`` and ``Sum(pk)``: an insert or an update moves
+the maximum, a delete lowers the count, and a row leaving the set while an older one
+enters it (same count, same maximum) moves the id sum. Only a swap of rows whose ids add
+up to exactly the same total goes unnoticed. A ``retrieve`` response is versioned by the
+object's own ``updated_at`` once ``get_object()`` and its permission checks ran. When the
+request's If-None-Match / If-Modified-Since still match, a 304 is returned before
+anything is serialized.
+
+The strong ETag hashes that version together with the endpoint, the user and the crews
+they are an accepted member of (which decide what most lists show), the query string and
+the negotiated media type, which all shape the body. A response cached for every user
+(``cached_response(..., per_user=False)``, which marks the request with
+``SHARED_RESPONSE_ATTR``) is the same for all of them, and so is its ETag: the user and
+their crews are left out, as the validator is replayed to whoever hits the entry. Last-Modified is only sent on
+detail responses: after a delete the list's newest ``updated_at`` stays the same, which
+a date cannot express.
+
+Only the model's own columns are versioned; a change to a related row shown nested in
+the response (e.g. a user's nickname) does not produce a new ETag. Code writing with
+``QuerySet.update()`` / ``bulk_update()`` must set ``updated_at`` itself.
+"""
+import hashlib
+import json
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from crew import membership_cache
+
+# Set on requests whose response is shared by all users (see config.response_cache)
+SHARED_RESPONSE_ATTR = '_shared_response'
+
+
+def make_etag(*parts):
+    """Strong ETag of JSON-serializable ``parts``."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return quote_etag(hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32])
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def conditional_response(request, etag, last_modified=None):
+    """The 304 (or 412) response the request's preconditions call for, else None."""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified.timestamp() if last_modified else None,
+    )
+    if response is not None and response.status_code == 304:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """Adds ETag / Last-Modified validators to ``list`` and ``retrieve`` (see module docs)."""
+    updated_field = 'updated_at'
+
+    def get_etag(self, version):
+        request = self.request
+        if getattr(request, SHARED_RESPONSE_ATTR, False):
+            viewer = None
+        else:
+            viewer = [request.user.pk, sorted(membership_cache.get_accepted_crew_ids(request.user))]
+        return make_etag(
+            type(self).__name__, getattr(self, 'action', None), viewer,
+            sorted(request.query_params.lists()), request.accepted_media_type, version,
+        )
+
+    def list(self, request, *args, **kwargs):
+        version = self.filter_queryset(self.get_queryset()).aggregate(
+            updated=Max(self.updated_field), count=Count('pk'), checksum=Sum('pk'),
+        )
+        etag = self.get_etag([version['updated'], version['count'], version['checksum']])
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        updated = getattr(instance, self.updated_field)
+        etag = self.get_etag([instance.pk, updated])
+        not_modified = conditional_response(request, etag, updated)
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), etag, updated)
@@ -0,0 +1,206 @@
+"""
+Read-only list serialization straight from ``QuerySet.values()`` rows.
+
+``ValuesSerializer(SomeModelSerializer, context)`` inspects the serializer's readable
+fields once and compiles, per field, the column to fetch and a converter for its value.
+Rows then go from the database cursor to the response dict without instantiating model
+objects or running DRF's per-row field machinery. The output is the same as
+``SomeModelSerializer(instances, many=True).data``.
+
+Supported fields: model columns (converted like DRF does), PrimaryKeyRelatedField,
+nested ModelSerializers of a foreign key, File/ImageField, and SerializerMethodFields
+listed in the serializer's ``values_dependencies`` (``{'field': ['column', ...]}``; the
+``get_<field>`` method receives a row with attribute access). Anything else raises
+``UnsupportedField`` and callers fall back to the regular serializer. Custom
+``to_representation`` overrides are not called.
+
+``ValuesListMixin`` serves a ViewSet's ``list`` action this way.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .pagination import view_position_fields
+
+# Field types whose to_representation returns database values unchanged
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.JSONField,
+)
+
+
+class UnsupportedField(Exception):
+    """The serializer has a field that cannot be produced from values() rows."""
+
+
+class Row(dict):
+    """A values() row with attribute access, handed to SerializerMethodField getters."""
+
+    def __getattr__(self, name):
+        try:
+            return self['id' if name == 'pk' else name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def _model_field(model, lookup):
+    """Resolves ``a__b__c`` to the final model field, or raises UnsupportedField."""
+    field = None
+    for part in lookup.split('__'):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            raise UnsupportedField(f"{model.__name__}.{lookup} is not a model field")
+        if field.many_to_many or field.one_to_many:
+            raise UnsupportedField(f"{model.__name__}.{lookup} is a multi-valued relation")
+        model = field.related_model if field.is_relation else model
+    return field
+
+
+def _file_converter(field, model_field, context):
+    request = context.get('request')
+    use_url = getattr(field, 'use_url', settings.REST_FRAMEWORK.get('UPLOADED_FILES_USE_URL', True))
+    storage = model_field.storage
+
+    def convert(name):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    # DateTimeField.to_representation for aware values, with the format and zone resolved once
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        text = value.astimezone(field_timezone).isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+
+class ValuesSerializer:
+    def __init__(self, serializer_class, context=None, prefix='', serializer=None):
+        self.context = context or {}
+        if serializer is None:
+            serializer = serializer_class(context=self.context)
+        self.model = serializer.Meta.model
+        self.columns = []
+        self.related = []  # foreign keys followed by nested serializers (for select_related)
+        # (output name, column, converter, nested ValuesSerializer or None)
+        self.plan = []
+        self.method_fields = []
+
+        dependencies = getattr(serializer_class, 'values_dependencies', {})
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if prefix or name not in dependencies:
+                    raise UnsupportedField(f"{serializer_class.__name__}.{name} has no values_dependencies")
+                self.columns.extend(prefix + column for column in dependencies[name])
+                self.method_fields.append((name, getattr(serializer, field.method_name)))
+                self.plan.append((name, None, None, None))
+                continue
+            if field.source == '*' or isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+                raise UnsupportedField(f"{serializer_class.__name__}.{name} is not a single column")
+
+            lookup = field.source.replace('.', '__')
+            column = prefix + lookup
+            model_field = _model_field(self.model, lookup)
+
+            if isinstance(field, serializers.ModelSerializer):
+                nested = ValuesSerializer(type(field), self.context, prefix=column + '__', serializer=field)
+                self.columns.append(column)  # the foreign key itself, to tell a missing object
+                self.columns.extend(nested.columns)
+                self.related.append(column)
+                self.related.extend(nested.related)
+                self.plan.append((name, column, None, nested))
+                continue
+
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    raise UnsupportedField(f"{serializer_class.__name__}.{name} uses pk_field")
+                convert = None
+            elif isinstance(field, serializers.FileField):
+                convert = _file_converter(field, model_field, self.context)
+            elif isinstance(field, serializers.DateTimeField):
+                convert = _datetime_converter(field)
+            elif isinstance(field, IDENTITY_FIELDS):
+                convert = None
+            else:
+                convert = field.to_representation
+            self.columns.append(column)
+            self.plan.append((name, column, convert, None))
+
+    def project(self, queryset, extra_columns=()):
+        """The queryset as values() rows holding every column the output needs."""
+        columns = list(dict.fromkeys([*self.columns, *extra_columns]))
+        return queryset.values(*columns)
+
+    def to_representation(self, row):
+        data = {}
+        for name, column, convert, nested in self.plan:
+            if column is None:
+                continue  # method field, filled in below
+            value = row[column]
+            if value is None:
+                data[name] = None
+            elif nested is not None:
+                data[name] = nested.to_representation(row)
+            else:
+                data[name] = convert(value) if convert is not None else value
+        if self.method_fields:
+            obj = Row(row)
+            for name, method in self.method_fields:
+                data[name] = method(obj)
+            # Keep the serializer's field order
+            data = {name: data[name] for name, _, _, _ in self.plan}
+        return data
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class ValuesListMixin:
+    """Serves ``list`` from values() rows (see ValuesSerializer) when the serializer allows it.
+
+    Set ``FAST_LIST_SERIALIZATION = False`` to use the regular serializers everywhere, or
+    override ``use_values_list`` to opt out per request.
+    """
+
+    def use_values_list(self):
+        return getattr(settings, 'FAST_LIST_SERIALIZATION', True)
+
+    def get_values_serializer(self):
+        return ValuesSerializer(self.get_serializer_class(), context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values_list():
+            return super().list(request, *args, **kwargs)
+        try:
+            values_serializer = self.get_values_serializer()
+        except UnsupportedField:
+            return super().list(request, *args, **kwargs)
+
+        # Keyset cursors are read from the last row, so its ordering key must be fetched too
+        queryset = values_serializer.project(self.filter_queryset(self.get_queryset()), view_position_fields(self))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.serialize(page))
+        return Response(values_serializer.serialize(queryset))
@@ -0,0 +1,80 @@
+"""
+Sparse fieldsets: ``?fields=id,content`` keeps only the listed fields of a response,
+``?exclude=content`` drops fields. Both apply to GET/HEAD requests and to the top-level
+serializer of the response (each item of a list); nested serializers are left whole and
+unknown names are ignored.
+
+``SparseFieldsetMixin`` goes on serializers. ``SparseFieldsetViewMixin`` also narrows the
+list query to the columns the remaining fields need (``.only()`` plus ``select_related``
+for nested objects), so unrequested columns are neither read nor encoded.
+"""
+from rest_framework.permissions import SAFE_METHODS
+
+from .fast_serializers import UnsupportedField, ValuesSerializer
+from .pagination import view_position_fields
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def _names(request, param):
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def requested_fieldset(request):
+    """``(fields, exclude)`` name sets from the query string, or None for each missing one."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    return _names(request, FIELDS_PARAM), _names(request, EXCLUDE_PARAM)
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin applying ?fields= / ?exclude= from the request in the context.
+    Pass ``sparse_fieldsets=False`` for serializers embedded by hand in another response."""
+
+    def __init__(self, *args, sparse_fieldsets=True, **kwargs):
+        self.sparse_fieldsets = sparse_fieldsets
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Only the response's own serializer (or each item of a root list)
+        parent = self.parent
+        is_root = parent is None or (parent.parent is None and getattr(parent, 'child', None) is self)
+        if not self.sparse_fieldsets or not is_root:
+            return fields
+        keep, exclude = requested_fieldset(self.context.get('request'))
+        if keep is not None:
+            fields = {name: field for name, field in fields.items() if name in keep}
+        if exclude is not None:
+            fields = {name: field for name, field in fields.items() if name not in exclude}
+        return fields
+
+
+def narrow_queryset(queryset, serializer_class, context, extra_columns=()):
+    """Restricts the queryset to the columns the (sparse) serializer reads.
+    Left unchanged when a field does not map to columns (see ValuesSerializer)."""
+    try:
+        plan = ValuesSerializer(serializer_class, context=context)
+    except UnsupportedField:
+        return queryset
+    queryset = queryset.select_related(None)
+    if plan.related:
+        queryset = queryset.select_related(*plan.related)
+    return queryset.only(*dict.fromkeys([*plan.columns, *extra_columns]))
+
+
+class SparseFieldsetViewMixin:
+    """Narrows the list query to the fields requested with ?fields= / ?exclude=."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Plain generic views have no action; for them this is their list
+        if getattr(self, 'action', 'list') != 'list' or requested_fieldset(self.request) == (None, None):
+            return queryset
+        # Keyset cursors read the ordering key from the last row
+        return narrow_queryset(queryset, self.get_serializer_class(), self.get_serializer_context(),
+                               view_position_fields(self))
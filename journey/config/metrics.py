@@ -0,0 +1,11 @@
+"""
+Prometheus metrics of the shared config helpers, exported on django_prometheus' /metrics
+endpoint (prometheus_client's default registry).
+"""
+from prometheus_client import Counter
+
+response_cache_requests = Counter(
+    'journey_response_cache_requests_total',
+    'Cached GET endpoint lookups (see config.response_cache).',
+    ['endpoint', 'result'],  # result: hit | miss
+)
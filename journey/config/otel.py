@@ -13,6 +13,7 @@ from opentelemetry.sdk.metrics import MeterProvider
 from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
 from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
 import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from typing import Optional
 
 
@@ -55,12 +56,20 @@ def instrument_django():
 
 class RequestLoggingMiddleware:
     """Middleware to log all requests and responses"""
-    
+    # Works in both modes so async views under ASGI are not forced through a thread
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
         self.logger = logging.getLogger(__name__)
-    
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         # Log request
         self.logger.info(f"🔹 Request: {request.method} {request.get_full_path()}")
         
@@ -71,4 +80,10 @@ class RequestLoggingMiddleware:
         self.logger.info(f"🔹 Response: {response.status_code} {request.get_full_path()}")
         
         return response
-        
\ No newline at end of file
+        
+
+    async def __acall__(self, request):
+        self.logger.info(f"🔹 Request: {request.method} {request.get_full_path()}")
+        response = await self.get_response(request)
+        self.logger.info(f"🔹 Response: {response.status_code} {request.get_full_path()}")
+        return response
@@ -0,0 +1,169 @@
+"""
+Keyset (cursor) pagination for high-volume list endpoints.
+
+Pages are selected with a WHERE condition on the ordering key, e.g.
+``created_at < c OR (created_at = c AND id < i)``, instead of OFFSET, and no
+COUNT(*) is issued. Cursors are opaque base64 tokens holding the key of the last
+row of the previous page. Requests that still send ``?offset=`` get the regular
+LimitOffsetPagination response so existing clients keep working.
+"""
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def position_fields(ordering):
+    return [field.lstrip('-').rsplit('__', 1)[-1] for field in ordering]
+
+
+def view_position_fields(view):
+    """Row attributes the keyset paginator of ``view`` reads cursors from ([] for other paginators)."""
+    paginator = view.paginator
+    if not isinstance(paginator, KeysetPagination):
+        return []
+    return position_fields(getattr(view, 'keyset_ordering', paginator.ordering))
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on (created_at, id).
+
+    Views may set ``keyset_ordering`` to order on other fields. The position of a row is
+    read from the attribute named after the last part of each lookup
+    (``visibility_index__created_at`` -> ``created_at``), so those values must match.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    legacy_pagination_class = LimitOffsetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+        queryset = queryset.order_by(*self.ordering)
+
+        self.legacy_paginator = None
+        if 'offset' in request.query_params:
+            self.legacy_paginator = self.legacy_pagination_class()
+            return self.legacy_paginator.paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_position_filter(position))
+            except (TypeError, ValueError, ValidationError):
+                # Cursor values that do not fit the ordering fields
+                raise NotFound(self.invalid_cursor_message)
+
+        # Fetch one extra row to know whether there is a next page without counting
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if self.legacy_paginator is not None:
+            return self.legacy_paginator.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_position_fields(self):
+        """Attribute names that hold the ordering key of a row."""
+        return position_fields(self.ordering)
+
+    def get_position_filter(self, position):
+        """Builds ``(a < x) OR (a = x AND b < y) OR ...`` for the ordering key."""
+        conditions = []
+        for index, field in enumerate(self.ordering):
+            lookup = field.lstrip('-')
+            comparison = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{lookup}__{comparison}': position[index]})
+            for previous, value in zip(self.ordering[:index], position[:index]):
+                condition &= Q(**{previous.lstrip('-'): value})
+            conditions.append(condition)
+        return reduce(or_, conditions)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        position = [
+            last[name] if isinstance(last, Mapping) else getattr(last, name)
+            for name in self.get_position_fields()
+        ]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position))
+
+    def encode_cursor(self, position):
+        values = [value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+                  for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': force_str('The pagination cursor value.'),
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': force_str('Number of results to return per page.'),
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,186 @@
+"""
+Cache of GET responses, keyed on (endpoint, user scope, query params).
+
+A view method decorated with ``@cached_response(scopes)`` stores the data of its 200
+responses in the Django cache (``RESPONSE_CACHE['ALIAS']``). ``scopes(view, request)``
+names what the response is built from, e.g. ``scope('crew', 5, 'members')``. Every scope
+has a version number kept in the same cache, and the versions of a response's scopes
+are part of its key, so ``invalidate(scope)`` makes every response depending on that
+scope miss without having to know or delete their keys. Stale entries simply expire.
+
+Model signals call ``invalidate`` once the writing transaction commits (see
+crew.signals and retrospect.signals); code writing with ``QuerySet.update()`` calls it
+itself. Only the response data is cached, so rendering still happens per request.
+Authentication, permission checks and content negotiation run before the lookup. The
+ETag / Last-Modified validators of the response (config.conditional) are cached along
+with it, and a hit whose validators still match the request is answered with a 304.
+Entries shared by all users (``per_user=False``) mark the request so that their ETag
+leaves out the user who happened to fill the entry.
+
+Versions live in ``RESPONSE_CACHE['ALIAS']``, so invalidations only reach the processes
+sharing that cache. With a per-process backend (LocMemCache, the default) a write made
+outside the web workers, e.g. by ``process_pending_challenges`` or
+``reconcile_member_counts``, is not seen by them until their entries expire after
+``TIMEOUT``; those commands warn about it (``process_local_warning``). Point ALIAS at a
+shared backend when such writers run against a live site.
+
+Lookups are counted in ``journey_response_cache_requests_total`` and in ``stats()``.
+"""
+import functools
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.http import parse_http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics
+from .conditional import SHARED_RESPONSE_ATTR, conditional_response
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'response:',
+}
+
+# Response headers stored with the data
+VALIDATORS = ('ETag', 'Last-Modified')
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'RESPONSE_CACHE', {}))
+    return options
+
+
+def scope(*parts):
+    """Name of an invalidation scope, e.g. ``scope('templates', 'user', 3)``."""
+    return ':'.join(str(part) for part in parts)
+
+
+def _version_key(options, name):
+    return f"{options['KEY_PREFIX']}version:{name}"
+
+
+def _versions(cache, options, scopes):
+    keys = [_version_key(options, name) for name in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # A scope seen for the first time (or evicted) starts from a fresh number, so entries
+        # written under an older version of it can never match again
+        initial = time.time_ns()
+        for key in missing:
+            cache.add(key, initial, None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def _invalidate_now(scopes):
+    options = get_options()
+    cache = caches[options['ALIAS']]
+    for name in scopes:
+        try:
+            cache.incr(_version_key(options, name))
+        except ValueError:
+            pass  # No version yet: nothing has been cached under this scope
+
+
+def invalidate(*scopes):
+    """Makes every cached response depending on one of ``scopes`` miss, once the current
+    transaction commits (immediately outside a transaction)."""
+    if scopes:
+        transaction.on_commit(lambda: _invalidate_now(scopes))
+
+
+def process_local_warning():
+    """A warning for writers running outside the web workers when their invalidations
+    cannot reach them (the cache is local to each process), else None."""
+    options = get_options()
+    if not options['ENABLED'] or not isinstance(caches[options['ALIAS']], LocMemCache):
+        return None
+    return (f"RESPONSE_CACHE['ALIAS'] ({options['ALIAS']!r}) is local to each process: web workers keep "
+            f"serving responses changed here for up to {options['TIMEOUT']} seconds.")
+
+
+def make_key(options, endpoint, user_scope, request, kwargs, versions):
+    payload = json.dumps({
+        'endpoint': endpoint,
+        'user': user_scope,
+        'kwargs': kwargs,
+        # File fields render absolute URLs, so the host is part of the response
+        'origin': request.build_absolute_uri('/'),
+        'media_type': request.accepted_media_type,
+        'params': sorted(request.query_params.lists()),
+        'versions': versions,
+    }, sort_keys=True, default=str)
+    return options['KEY_PREFIX'] + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _record(endpoint, result):
+    metrics.response_cache_requests.labels(endpoint=endpoint, result=result).inc()
+    with _stats_lock:
+        _stats['hits' if result == 'hit' else 'misses'] += 1
+
+
+def stats():
+    """Lookups of this process since start: ``{'hits', 'misses', 'hit_ratio'}``."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / (hits + misses) if hits + misses else 0.0}
+
+
+def cached_response(scopes, per_user=True):
+    """Caches the data of a ViewSet/APIView method's 200 GET responses.
+
+    ``scopes(view, request)`` returns the invalidation scopes of the response. With
+    ``per_user=False`` the response is shared by every user allowed to see it.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            options = get_options()
+            if not options['ENABLED'] or request.method not in ('GET', 'HEAD'):
+                return method(self, request, *args, **kwargs)
+
+            endpoint = f"{type(self).__name__}.{method.__name__}"
+            user = request.user
+            user_scope = (user.pk if user.is_authenticated else 'anonymous') if per_user else None
+            names = list(scopes(self, request))
+            cache = caches[options['ALIAS']]
+            key = make_key(options, endpoint, user_scope, request, kwargs, _versions(cache, options, names))
+
+            entry = cache.get(key)
+            if entry is not None:
+                _record(endpoint, 'hit')
+                data, headers = entry
+                if 'ETag' in headers:
+                    last_modified = headers.get('Last-Modified')
+                    if last_modified is not None:
+                        last_modified = datetime.fromtimestamp(parse_http_date(last_modified), tz=dt_timezone.utc)
+                    not_modified = conditional_response(request, headers['ETag'], last_modified)
+                    if not_modified is not None:
+                        return not_modified
+                return Response(data, headers=headers)
+
+            _record(endpoint, 'miss')
+            if not per_user:
+                setattr(request, SHARED_RESPONSE_ATTR, True)
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                headers = {name: response[name] for name in VALIDATORS if response.has_header(name)}
+                cache.set(key, (response.data, headers), options['TIMEOUT'])
+            return response
+        return wrapper
+    return decorator
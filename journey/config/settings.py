@@ -15,8 +15,6 @@ from datetime import timedelta
 import os
 from dotenv import load_dotenv
 
-from langfuse import Langfuse
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -56,6 +54,7 @@ INSTALLED_APPS = [
     'community', 
     'crew',
     'retrospect', 
+    'sync_manager',
 ]
 
 MIDDLEWARE = [
@@ -107,6 +106,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts so concurrent atomic blocks
+            # (e.g. crew.services) queue up instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -137,6 +142,77 @@ SIMPLE_JWT = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory is per process; point this at a shared backend when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'journey-default',
+    }
+}
+
+# Seconds a user's crew memberships stay cached when the default cache is shared by all processes;
+# with LocMemCache they are only kept for the request (see crew.membership_cache)
+CREW_MEMBERSHIP_CACHE_TIMEOUT = 300
+
+# Cached GET responses of templates, crews, crew members and a user's challenges, dropped by
+# model signals on writes (see config.response_cache). ALIAS is a CACHES entry; it must be shared
+# by all processes for writes from management commands to reach the web workers.
+RESPONSE_CACHE = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Delta sync for offline clients (see sync_manager.changelog; SQLite or PostgreSQL only).
+# Prune with `manage.py prune_change_log`.
+SYNC = {
+    'MAX_CHANGES': 500,
+    'RETENTION_DAYS': 30,
+}
+
+# POST /api/batch/ (see config.batch): sub-requests per batch and threads running them
+BATCH = {
+    'MAX_REQUESTS': 10,
+    'WORKERS': 4,
+}
+
+# Background plan/KPI generation for challenges created with ?async=true (see retrospect.generation)
+CHALLENGE_GENERATION_WORKERS = 2
+CHALLENGE_GENERATION_QUEUE_SIZE = 100
+# Seconds after which a RUNNING generation counts as abandoned (`process_pending_challenges --requeue-stale`)
+CHALLENGE_GENERATION_STALE_SECONDS = 10 * 60
+
+# Serve list endpoints from values() rows instead of model instances (see config.fast_serializers)
+FAST_LIST_SERIALIZATION = True
+
+# Write-behind buffer for feed view counts (see community.view_counter)
+FEED_VIEW_COUNTER = {
+    'ENABLED': True,
+    'FLUSH_INTERVAL': 5.0, # seconds between flushes
+    'MAX_PENDING': 1000, # flush early once this many views are buffered
+}
+
+# Trending feed ranking (see community.trending)
+FEED_TRENDING = {
+    'LIKE_WEIGHT': 3.0,
+    'COMMENT_WEIGHT': 5.0,
+    'VIEW_WEIGHT': 0.1,
+    'DECAY_SECONDS': 12 * 60 * 60, # 10배의 참여가 있어야 12시간 최신 글과 같은 순위
+}
+
+# Content-addressed LLM response cache (see ai_manager.cache).
+# Set PERSISTENT_ALIAS to a CACHES entry (DatabaseCache / FileBasedCache) to share responses across workers.
+LLM_RESPONSE_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 1024,
+    'TTL': 60 * 60 * 24,
+    'PERSISTENT_ALIAS': None,
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -171,11 +247,45 @@ SWAGGER_SETTINGS = {
     }]
 }
 
-langfuse = Langfuse(
-    host=os.getenv("LANGFUSE_HOST"),
-    secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-    public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-)
+# LLM providers (see ai_manager.providers). Clients are created on first use, not at import.
+# Set LLM_PROVIDER=stub to run without network access (local development, load tests).
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "vertex")
+
+LLM_PROVIDERS = {
+    'vertex': {
+        'BACKEND': 'ai_manager.providers.VertexAIProvider',
+        'OPTIONS': {
+            'PROJECT': os.getenv("PROJECT_ID"),
+            'LOCATION': os.getenv("LOCATION", "us-central1"),
+            'STAGING_BUCKET': os.getenv("BUCKET_NAME"),
+            'MODEL': "gemini-2.0-flash-lite-001",
+            'PARAMS': {'max_output_tokens': 1024, 'temperature': 0.7},
+            'LANGFUSE': {
+                'HOST': os.getenv("LANGFUSE_HOST"),
+                'SECRET_KEY': os.getenv("LANGFUSE_SECRET_KEY"),
+                'PUBLIC_KEY': os.getenv("LANGFUSE_PUBLIC_KEY"),
+            },
+        },
+    },
+    'stub': {
+        'BACKEND': 'ai_manager.providers.StubProvider',
+        'OPTIONS': {
+            'LATENCY': float(os.getenv("LLM_STUB_LATENCY", "0")),
+            'TOKEN_LATENCY': float(os.getenv("LLM_STUB_TOKEN_LATENCY", "0")),
+        },
+    },
+}
+
+# Per-process isolation of LLM calls (see ai_manager.resilience)
+LLM_RESILIENCE = {
+    'MAX_CONCURRENCY': 8, # 동시에 provider를 기다릴 수 있는 호출 수
+    'QUEUE_TIMEOUT': 2.0, # 슬롯 대기 최대 시간 (초), 초과 시 즉시 실패
+    'CALL_TIMEOUT': 30.0, # 호출당 최대 시간 (초)
+    'BREAKER_WINDOW': 60.0,
+    'BREAKER_MIN_CALLS': 10,
+    'BREAKER_ERROR_RATE': 0.5,
+    'BREAKER_RESET_TIMEOUT': 30.0,
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
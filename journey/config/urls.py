@@ -21,6 +21,7 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.conf import settings
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
+from config.batch import BatchView
 
 
 schema_view = get_schema_view(
@@ -51,6 +52,8 @@ urlpatterns = [
         path('crew/', include('crew.urls')),
         path('community/', include('community.urls')),
         path('retrospect/', include('retrospect.urls')),
+        path('sync/', include('sync_manager.urls')),
+        path('batch/', BatchView.as_view(), name='batch'),
     ])), 
 ]
 
@@ -0,0 +1,91 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from crew import services
+from crew.models import Crew, CrewMembership, CrewMembershipRole, CrewMembershipStatus
+from user_manager.models import User
+
+
+class Command(BaseCommand):
+    help = ("Hammers join/leave of one crew from many threads through crew.services and checks "
+            "member_count and the single-CREATOR invariant afterwards. Benchmark rows are deleted at the end.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--users', type=int, default=64)
+        parser.add_argument('--operations', type=int, default=50, help="Operations per thread.")
+
+    def handle(self, *args, **options):
+        tag = f"benchcrew{int(time.time())}"
+        User.objects.bulk_create([
+            User(email=f"{tag}-{i}@bench.local", nickname=f"b{i}") for i in range(options['users'])
+        ])
+        users = list(User.objects.filter(email__startswith=f"{tag}-"))
+        crew = Crew.objects.create(crew_name=tag)
+        try:
+            self._run(crew, users, options)
+        finally:
+            CrewMembership.objects.filter(crew=crew).delete()
+            crew.delete()
+            User.objects.filter(email__startswith=f"{tag}-").delete()
+
+    def _run(self, crew, users, options):
+        counters = {'join': 0, 'leave': 0, 'rejected': 0, 'errors': 0}
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(options['operations']):
+                    user = rng.choice(users)
+                    operation = rng.choice(('join', 'leave'))
+                    started = time.perf_counter()
+                    try:
+                        if operation == 'join':
+                            services.join_crew(crew.pk, user)
+                        else:
+                            services.leave_crew(crew.pk, user)
+                        outcome = operation
+                    except services.MembershipError:
+                        outcome = 'rejected'  # already a member / not a member
+                    except Exception as exc:
+                        self.stderr.write(f"{type(exc).__name__}: {exc}")
+                        outcome = 'errors'
+                    with lock:
+                        counters[outcome] += 1
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        crew.refresh_from_db()
+        accepted = CrewMembership.objects.filter(crew=crew, status=CrewMembershipStatus.ACCEPTED)
+        actual = accepted.count()
+        creators = accepted.filter(role=CrewMembershipRole.CREATOR).count()
+        latencies.sort()
+        total = len(latencies)
+
+        self.stdout.write(
+            f"{total} operations in {elapsed:.2f}s ({total / elapsed:.0f} ops/s), "
+            f"p50 {latencies[total // 2] * 1000:.1f}ms, p99 {latencies[int(total * 0.99) - 1] * 1000:.1f}ms"
+        )
+        self.stdout.write(f"joins {counters['join']}, leaves {counters['leave']}, "
+                          f"no-ops {counters['rejected']}, errors {counters['errors']}")
+        consistent = crew.member_count == actual and creators <= 1
+        message = f"member_count {crew.member_count}, accepted {actual}, creators {creators}"
+        if consistent and not counters['errors']:
+            self.stdout.write(self.style.SUCCESS(f"OK: {message}"))
+        else:
+            self.stdout.write(self.style.ERROR(f"INCONSISTENT: {message}"))
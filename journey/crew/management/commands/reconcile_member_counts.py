@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from config import response_cache
+from crew.services import reconcile_member_counts
+
+
+class Command(BaseCommand):
+    help = "Fixes Crew.member_count drift from one GROUP BY over accepted memberships."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drifted crews.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        warning = response_cache.process_local_warning()
+        if warning and not options['dry_run']:
+            self.stderr.write(self.style.WARNING(warning))
+        drifted = reconcile_member_counts(dry_run=options['dry_run'], batch_size=options['batch_size'])
+        for crew_id, stored, actual in drifted:
+            self.stdout.write(f"crew {crew_id}: {stored} -> {actual}")
+        verb = "would be fixed" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{len(drifted)} crews {verb}."))
@@ -0,0 +1,110 @@
+"""
+Crew membership lookups shared by permission classes and querysets.
+
+A user's memberships are loaded with a single query and kept on the user instance
+for the rest of the request. When the default cache is shared by every process
+(Redis, Memcached, database, ...) they are also kept there across requests; a
+per-process cache (LocMemCache) is never used, since an invalidation could not reach
+the other workers and a removed member would keep their access there until expiry.
+Entries are dropped from ``crew.signals`` whenever a CrewMembership is saved or deleted:
+right away, so the writing transaction reads its own changes, and again once it commits,
+since a concurrent request may have cached the previous rows in between. Lookups made
+inside a transaction are not stored in the shared cache, as they may see uncommitted
+(possibly rolled back) rows.
+"""
+import itertools
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+
+from .models import CrewMembership, CrewMembershipStatus
+
+CACHE_KEY = 'crew:memberships:{user_id}'
+# Attribute used to memoize memberships on the user object for the current request
+REQUEST_ATTR = '_crew_memberships'
+
+# Bumped on every invalidation so memos on long-lived user instances are never reused stale
+_generation = itertools.count()
+_current_generation = next(_generation)
+
+
+def _cache_timeout():
+    return getattr(settings, 'CREW_MEMBERSHIP_CACHE_TIMEOUT', 300)
+
+
+def _is_shared():
+    """Whether the default cache is seen by every process (see module docs)."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def _crew_pk(crew):
+    """Accepts a Crew instance or a crew id."""
+    return getattr(crew, 'pk', crew)
+
+
+def get_memberships(user):
+    """Returns {crew_id: (role, status)} for every membership of the user."""
+    if user is None or not user.is_authenticated:
+        return {}
+
+    memo = getattr(user, REQUEST_ATTR, None)
+    if memo is not None and memo[0] == _current_generation:
+        return memo[1]
+
+    shared = _is_shared()
+    key = CACHE_KEY.format(user_id=user.pk)
+    memberships = cache.get(key) if shared else None
+    if memberships is None:
+        memberships = {
+            crew_id: (role, status)
+            for crew_id, role, status in CrewMembership.objects.filter(user_id=user.pk)
+                                                               .values_list('crew_id', 'role', 'status')
+        }
+        if shared and not connection.in_atomic_block:
+            cache.set(key, memberships, _cache_timeout())
+
+    setattr(user, REQUEST_ATTR, (_current_generation, memberships))
+    return memberships
+
+
+def get_accepted_crew_ids(user):
+    """Returns the ids of crews the user is an accepted member of."""
+    return [
+        crew_id for crew_id, (role, status) in get_memberships(user).items()
+        if status == CrewMembershipStatus.ACCEPTED
+    ]
+
+
+def get_accepted_roles(user):
+    """Returns {crew_id: role} for the user's accepted memberships."""
+    return {
+        crew_id: role for crew_id, (role, status) in get_memberships(user).items()
+        if status == CrewMembershipStatus.ACCEPTED
+    }
+
+
+def is_accepted_member(user, crew):
+    """Checks whether the user is an accepted member of the crew (instance or id)."""
+    membership = get_memberships(user).get(_crew_pk(crew))
+    return membership is not None and membership[1] == CrewMembershipStatus.ACCEPTED
+
+
+def get_role(user, crew):
+    """Returns the user's role in the crew regardless of membership status, or None."""
+    membership = get_memberships(user).get(_crew_pk(crew))
+    return membership[0] if membership else None
+
+
+def _invalidate_now(user_id):
+    global _current_generation
+    _current_generation = next(_generation)
+    cache.delete(CACHE_KEY.format(user_id=user_id))
+
+
+def invalidate(user_id):
+    """Drops the cached memberships of a user and every request memo of this process,
+    now and once the current transaction commits."""
+    _invalidate_now(user_id)
+    transaction.on_commit(lambda: _invalidate_now(user_id))
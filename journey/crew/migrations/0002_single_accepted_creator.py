@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:32
+
+from django.db import migrations, models
+
+
+def demote_duplicate_creators(apps, schema_editor):
+    """Keeps the earliest accepted CREATOR of each crew; later ones become PARTICIPANT."""
+    CrewMembership = apps.get_model('crew', 'CrewMembership')
+    seen = set()
+    duplicates = []
+    creators = CrewMembership.objects.filter(role='CREATOR', status='ACCEPTED').order_by('crew_id', 'joined_at', 'id')
+    for pk, crew_id in creators.values_list('pk', 'crew_id'):
+        if crew_id in seen:
+            duplicates.append(pk)
+        seen.add(crew_id)
+    if duplicates:
+        CrewMembership.objects.filter(pk__in=duplicates).update(role='PARTICIPANT')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crew', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(demote_duplicate_creators, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='crewmembership',
+            constraint=models.UniqueConstraint(condition=models.Q(('role', 'CREATOR'), ('status', 'ACCEPTED')), fields=('crew',), name='crew_single_accepted_creator'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crew', '0002_single_accepted_creator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crew',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -14,8 +14,9 @@ class Crew(models.Model):
     """크루 모델"""
     crew_name = models.CharField(max_length=255, unique=True)
     crew_description = models.TextField(blank=True)
-    member_count = models.IntegerField(default=0) # 멤버십 상태 변경 시 업데이트 필요
+    member_count = models.IntegerField(default=0) # 승인된 멤버 수 (crew.services 에서 관리)
     crew_image = models.URLField(max_length=2048, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True) # 조건부 GET(ETag/Last-Modified) 버전, member_count 변경 포함
 
     def __str__(self):
         return self.crew_name
@@ -30,6 +31,14 @@ class CrewMembership(models.Model):
 
     class Meta:
         unique_together = ('user', 'crew') # 사용자는 한 크루에 한 번만 가입 가능
+        constraints = [
+            # 크루당 승인된 CREATOR는 한 명 (crew.services 에서 크루 행 잠금으로 보장, DB 에서 재확인)
+            models.UniqueConstraint(
+                fields=['crew'],
+                condition=models.Q(role='CREATOR', status='ACCEPTED'),
+                name='crew_single_accepted_creator',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.crew} ({self.get_status_display()})"
\ No newline at end of file
@@ -1,5 +1,6 @@
 from rest_framework import permissions
-from .models import CrewMembership, CrewMembershipRole
+from .models import CrewMembershipRole
+from . import membership_cache
 
 class IsCrewCreatorOrReadOnly(permissions.BasePermission):
     """
@@ -17,9 +18,5 @@ class IsCrewCreatorOrReadOnly(permissions.BasePermission):
         # Write permissions are only allowed to the creator of the crew.
         # Check if a membership exists for the requesting user and this crew,
         # and if that membership role is CREATOR.
-        try:
-            membership = CrewMembership.objects.get(crew=obj, user=request.user)
-            return membership.role == CrewMembershipRole.CREATOR
-        except CrewMembership.DoesNotExist:
-            # If the user is not a member at all, they certainly aren't the creator.
-            return False 
\ No newline at end of file
+        # If the user is not a member at all, get_role returns None.
+        return membership_cache.get_role(request.user, obj) == CrewMembershipRole.CREATOR
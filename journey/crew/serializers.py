@@ -1,15 +1,16 @@
 from rest_framework import serializers
+from config.fieldsets import SparseFieldsetMixin
 from .models import Crew, CrewMembership
-from user_manager.serializer import UserSerializer
+from user_manager.serializer import PublicUserSerializer
 
-class CrewSerializer(serializers.ModelSerializer):
+class CrewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Crew
         fields = ['id', 'crew_name', 'crew_description', 'member_count', 'crew_image']
         read_only_fields = ['id', 'member_count'] # member_count is likely managed internally
 
-class CrewMembershipSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class CrewMembershipSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    user = PublicUserSerializer(read_only=True)
     crew = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
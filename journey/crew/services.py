@@ -0,0 +1,131 @@
+"""
+Crew membership transitions.
+
+Every transition that changes the set of ACCEPTED members runs in one transaction that
+locks the crew row first (``select_for_update``), so concurrent joins/leaves of the same
+crew are serialized: the "first accepted member becomes CREATOR" decision is made by
+exactly one of them and ``member_count`` moves by ``F('member_count') ± 1`` instead of a
+full COUNT. The partial unique constraint ``crew_single_accepted_creator`` backs this up
+at the database level. Drift from older code paths is repaired by
+``reconcile_member_counts``.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from config import response_cache
+from config.response_cache import scope
+from retrospect.visibility import PUBLIC_SCOPE
+from sync_manager import changelog
+from sync_manager.models import ChangeKind
+from .models import Crew, CrewMembership, CrewMembershipRole, CrewMembershipStatus
+
+
+class MembershipError(Exception):
+    """A transition that is not allowed from the current membership state."""
+
+    def __init__(self, detail, status_code=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def _lock_crew(crew_id):
+    return Crew.objects.select_for_update().get(pk=crew_id)
+
+
+def _has_accepted_members(crew):
+    return CrewMembership.objects.filter(crew=crew, status=CrewMembershipStatus.ACCEPTED).exists()
+
+
+def join_crew(crew_id, user):
+    """Accepts the user into the crew. Returns ``(membership, created)``.
+
+    A PENDING request is accepted, otherwise a new ACCEPTED membership is created.
+    The first accepted member becomes the CREATOR.
+    """
+    with transaction.atomic():
+        crew = _lock_crew(crew_id)
+        membership = CrewMembership.objects.select_for_update().filter(user=user, crew=crew).first()
+
+        if membership is not None:
+            if membership.status == CrewMembershipStatus.ACCEPTED:
+                raise MembershipError('User is already a member of this crew.')
+            if membership.status == CrewMembershipStatus.REJECTED:
+                raise MembershipError('Your previous join request was rejected. Please contact the crew admin.')
+            if membership.status != CrewMembershipStatus.PENDING:
+                raise MembershipError('Cannot process join request due to existing membership status.')
+
+        # Safe to decide here: no other transition of this crew can run until we commit
+        role = CrewMembershipRole.PARTICIPANT if _has_accepted_members(crew) else CrewMembershipRole.CREATOR
+
+        created = membership is None
+        if created:
+            membership = CrewMembership.objects.create(
+                user=user, crew=crew, role=role, status=CrewMembershipStatus.ACCEPTED
+            )
+        else:
+            membership.status = CrewMembershipStatus.ACCEPTED
+            membership.role = role
+            membership.save(update_fields=['status', 'role'])
+
+        Crew.objects.filter(pk=crew.pk).update(member_count=F('member_count') + 1, updated_at=timezone.now())
+        changelog.record_ids(ChangeKind.CREW, [crew.pk], PUBLIC_SCOPE)
+    return membership, created
+
+
+def leave_crew(crew_id, user):
+    """Removes the user's membership (any status) from the crew."""
+    with transaction.atomic():
+        crew = _lock_crew(crew_id)
+        membership = CrewMembership.objects.select_for_update().filter(user=user, crew=crew).first()
+        if membership is None:
+            raise MembershipError('You are not a member of this crew.', status_code=404)
+
+        was_accepted = membership.status == CrewMembershipStatus.ACCEPTED
+        membership.delete()
+        if was_accepted:
+            Crew.objects.filter(pk=crew.pk).update(member_count=F('member_count') - 1, updated_at=timezone.now())
+            changelog.record_ids(ChangeKind.CREW, [crew.pk], PUBLIC_SCOPE)
+
+
+def _accepted_counts(crew_ids=None):
+    """{crew_id: accepted member count} from a single GROUP BY."""
+    memberships = CrewMembership.objects.filter(status=CrewMembershipStatus.ACCEPTED)
+    if crew_ids is not None:
+        memberships = memberships.filter(crew_id__in=crew_ids)
+    return dict(memberships.values('crew_id').annotate(count=Count('id')).order_by()
+                .values_list('crew_id', 'count'))
+
+
+def reconcile_member_counts(dry_run=False, batch_size=500):
+    """Recomputes member_count of every crew from one GROUP BY over accepted memberships.
+
+    Drifted crews are then locked and recounted before writing, so joins/leaves running
+    meanwhile are not overwritten. Returns ``(crew_id, stored, actual)`` for each of them.
+    """
+    actual_counts = _accepted_counts()
+    drifted_ids = [
+        crew_id for crew_id, stored in Crew.objects.values_list('id', 'member_count').iterator()
+        if stored != actual_counts.get(crew_id, 0)
+    ]
+    if not drifted_ids:
+        return []
+    if dry_run:
+        stored = dict(Crew.objects.filter(pk__in=drifted_ids).values_list('id', 'member_count'))
+        return [(crew_id, stored[crew_id], actual_counts.get(crew_id, 0)) for crew_id in drifted_ids]
+
+    with transaction.atomic():
+        crews = list(Crew.objects.select_for_update().filter(pk__in=drifted_ids).order_by('pk'))
+        actual_counts = _accepted_counts(drifted_ids)
+        drifted = [(crew.pk, crew.member_count, actual_counts.get(crew.pk, 0)) for crew in crews
+                   if crew.member_count != actual_counts.get(crew.pk, 0)]
+        now = timezone.now()
+        Crew.objects.bulk_update(
+            [Crew(pk=crew_id, member_count=actual, updated_at=now) for crew_id, _, actual in drifted],
+            ['member_count', 'updated_at'], batch_size=batch_size,
+        )
+        # bulk_update sends no signals
+        response_cache.invalidate(*(scope('crew', crew_id) for crew_id, _, _ in drifted))
+        changelog.record_ids(ChangeKind.CREW, [crew_id for crew_id, _, _ in drifted], PUBLIC_SCOPE)
+    return drifted
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from config import response_cache
+from config.response_cache import scope
+from .models import Crew, CrewMembership, CrewMembershipStatus
+from . import membership_cache
+
+
+@receiver([post_save, post_delete], sender=CrewMembership)
+def invalidate_membership_cache(sender, instance, **kwargs):
+    """Keep the membership cache in sync with CrewMembership writes."""
+    membership_cache.invalidate(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=CrewMembership)
+def invalidate_membership_responses(sender, instance, raw=False, **kwargs):
+    """Member lists, member counts and what the member can see through the crew."""
+    if raw:
+        return
+    response_cache.invalidate(
+        scope('crew', instance.crew_id),
+        scope('crew', instance.crew_id, 'members'),
+        scope('memberships', instance.user_id),
+    )
+
+
+@receiver([post_save, post_delete], sender=Crew)
+def invalidate_crew_responses(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    response_cache.invalidate(scope('crew', instance.pk), scope('crew', instance.pk, 'members'))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_member_profiles(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Member lists embed the members' public profiles."""
+    if raw or created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    response_cache.invalidate(*(
+        scope('crew', crew_id, 'members')
+        for crew_id, (role, status) in membership_cache.get_memberships(instance).items()
+        if status == CrewMembershipStatus.ACCEPTED
+    ))
@@ -1,3 +1,254 @@
-from django.test import TestCase
+import shutil
+import tempfile
 
-# Create your tests here.
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from config import response_cache
+from config.fast_serializers import ValuesSerializer
+from user_manager.models import User
+
+from . import membership_cache, services
+from .models import Crew, CrewMembership, CrewMembershipRole, CrewMembershipStatus
+from .serializers import CrewSerializer
+
+
+class ValuesSerializerParityTests(TestCase):
+    """config.fast_serializers must produce exactly what CrewSerializer produces."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='member@example.com', nickname='member')
+        Crew.objects.create(crew_name='runners', crew_description='morning runs', member_count=3,
+                            crew_image='https://example.com/crew.png')
+        Crew.objects.create(crew_name='readers')
+
+    def test_crew_serializer(self):
+        queryset = Crew.objects.order_by('id')
+        values_serializer = ValuesSerializer(CrewSerializer)
+        actual = values_serializer.serialize(values_serializer.project(queryset))
+        self.assertEqual(actual, [dict(item) for item in CrewSerializer(queryset, many=True).data])
+
+    def test_list_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = client.get('/api/crew/').json()
+        with override_settings(FAST_LIST_SERIALIZATION=True):
+            actual = client.get('/api/crew/').json()
+        self.assertEqual(actual, expected)
+        self.assertEqual(len(actual['results']), 2)
+
+
+class MembershipTransitionTests(TestCase):
+    """Joins and leaves keep member_count and the single CREATOR in step with the memberships."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(email=f'crew{index}@example.com', nickname=f'crew{index}')
+                     for index in range(3)]
+        cls.crew = Crew.objects.create(crew_name='transitions')
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    def url(self, action=''):
+        return f'/api/crew/{self.crew.pk}/{action}'
+
+    def state(self):
+        self.crew.refresh_from_db()
+        roles = dict(CrewMembership.objects.filter(crew=self.crew, status=CrewMembershipStatus.ACCEPTED)
+                     .values_list('user__nickname', 'role'))
+        return self.crew.member_count, roles
+
+    def test_join_leave(self):
+        first, second, third = self.users
+        response = self.client_for(first).post(self.url('join/'))
+        self.assertEqual((response.status_code, response.json()['role']), (201, CrewMembershipRole.CREATOR))
+        self.assertEqual(self.client_for(second).post(self.url('join/')).status_code, 201)
+        self.assertEqual(self.client_for(second).post(self.url('join/')).status_code, 400)
+        self.assertEqual(self.state(), (2, {'crew0': 'CREATOR', 'crew1': 'PARTICIPANT'}))
+
+        # A pending request is accepted by join
+        self.assertEqual(self.client_for(third).post(self.url('request-join/')).status_code, 201)
+        self.assertEqual(self.state()[0], 2)
+        self.assertEqual(self.client_for(third).post(self.url('join/')).status_code, 200)
+        self.assertEqual(self.state(), (3, {'crew0': 'CREATOR', 'crew1': 'PARTICIPANT', 'crew2': 'PARTICIPANT'}))
+
+        self.assertEqual(self.client_for(second).delete(self.url('leave/')).status_code, 204)
+        self.assertEqual(self.client_for(second).delete(self.url('leave/')).status_code, 404)
+        self.assertEqual(self.state(), (2, {'crew0': 'CREATOR', 'crew2': 'PARTICIPANT'}))
+
+    def test_leave_pending(self):
+        services.join_crew(self.crew.pk, self.users[0])
+        self.client_for(self.users[1]).post(self.url('request-join/'))
+        services.leave_crew(self.crew.pk, self.users[1])
+        self.assertEqual(self.state(), (1, {'crew0': 'CREATOR'}))
+
+    def test_last_creator_leaves(self):
+        services.join_crew(self.crew.pk, self.users[0])
+        services.leave_crew(self.crew.pk, self.users[0])
+        self.assertEqual(self.state(), (0, {}))
+        # An emptied crew is founded again by its next member
+        membership, created = services.join_crew(self.crew.pk, self.users[1])
+        self.assertEqual((created, membership.role), (True, CrewMembershipRole.CREATOR))
+        self.assertEqual(self.state(), (1, {'crew1': 'CREATOR'}))
+
+    def test_single_creator_constraint(self):
+        services.join_crew(self.crew.pk, self.users[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CrewMembership.objects.create(user=self.users[1], crew=self.crew, role=CrewMembershipRole.CREATOR,
+                                          status=CrewMembershipStatus.ACCEPTED)
+
+    def test_reconcile(self):
+        services.join_crew(self.crew.pk, self.users[0])
+        services.join_crew(self.crew.pk, self.users[1])
+        other = Crew.objects.create(crew_name='drifted', member_count=4)
+        Crew.objects.filter(pk=self.crew.pk).update(member_count=7)
+
+        out = StringIO()
+        call_command('reconcile_member_counts', '--dry-run', stdout=out)
+        self.assertIn(f'crew {self.crew.pk}: 7 -> 2', out.getvalue())
+        self.assertEqual(self.state()[0], 7)
+        self.assertEqual(sorted(services.reconcile_member_counts()),
+                         sorted([(self.crew.pk, 7, 2), (other.pk, 4, 0)]))
+        self.assertEqual(self.state()[0], 2)
+        self.assertEqual(services.reconcile_member_counts(), [])
+
+    def test_permissions(self):
+        anonymous = self.client_for()
+        for method, action in (('post', 'join/'), ('delete', 'leave/'), ('post', 'request-join/'), ('get', '')):
+            self.assertEqual(getattr(anonymous, method)(self.url(action)).status_code, 401, action)
+
+        creator, member = self.users[:2]
+        services.join_crew(self.crew.pk, creator)
+        services.join_crew(self.crew.pk, member)
+        self.client_for(self.users[2]).post(self.url('request-join/'))
+        reject = self.url(f'reject_member/{self.users[2].pk}/')
+        self.assertEqual(self.client_for(member).patch(self.url(), {'crew_name': 'mine'}).status_code, 403)
+        self.assertEqual(self.client_for(member).post(reject).status_code, 403)
+        self.assertEqual(self.client_for(creator).patch(self.url(), {'crew_name': 'ours'}).status_code, 200)
+        self.assertEqual(self.client_for(creator).post(reject).json()['status'], CrewMembershipStatus.REJECTED)
+
+
+class MembershipCacheTests(TestCase):
+    """A membership change must not leave the previous memberships cached after commit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='kicked@example.com', nickname='kicked')
+        cls.crew = Crew.objects.create(crew_name='strict crew')
+        cls.membership = CrewMembership.objects.create(user=cls.user, crew=cls.crew,
+                                                       status=CrewMembershipStatus.ACCEPTED)
+
+    def setUp(self):
+        self.key = membership_cache.CACHE_KEY.format(user_id=self.user.pk)
+
+    def shared_cache(self):
+        """A file cache stands in for a backend shared by every worker."""
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        return override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }})
+
+    def test_invalidated_on_commit(self):
+        stale = {self.crew.pk: (self.membership.role, CrewMembershipStatus.ACCEPTED)}
+        with self.shared_cache():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.membership.delete()
+                # A concurrent request reading the still committed rows caches them meanwhile
+                cache.set(self.key, stale)
+            self.assertIsNone(cache.get(self.key))
+            self.assertFalse(membership_cache.is_accepted_member(User.objects.get(pk=self.user.pk), self.crew))
+
+    def test_not_shared_inside_transaction(self):
+        with self.shared_cache():
+            # TestCase runs inside a transaction
+            self.assertTrue(membership_cache.is_accepted_member(self.user, self.crew))
+            self.assertIsNone(cache.get(self.key))
+
+    def test_process_local_cache_unused(self):
+        # Another worker's removal could not reach this process's copy
+        cache.set(self.key, {})
+        self.assertTrue(membership_cache.is_accepted_member(User.objects.get(pk=self.user.pk), self.crew))
+        cache.delete(self.key)
+
+    def test_memo_per_request(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(membership_cache.is_accepted_member(user, self.crew))
+            self.assertEqual(membership_cache.get_accepted_crew_ids(user), [self.crew.pk])
+        self.membership.delete()
+        self.assertFalse(membership_cache.is_accepted_member(user, self.crew))
+
+
+class CrewResponseCacheTests(TestCase):
+    """Cached crew details and member lists are dropped when their rows change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='cached@example.com', nickname='cached')
+        cls.crew = Crew.objects.create(crew_name='cached crew')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        hits = response_cache.stats()['hits']
+        data = self.client.get(url).json()
+        return data, response_cache.stats()['hits'] - hits
+
+    def test_crew_detail(self):
+        url = f'/api/crew/{self.crew.pk}/'
+        self.assertEqual(self.get(url)[1], 0)
+        data, hits = self.get(url)
+        self.assertEqual((data['crew_name'], hits), ('cached crew', 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crew.crew_name = 'renamed'
+            self.crew.save()
+        data, hits = self.get(url)
+        self.assertEqual((data['crew_name'], hits), ('renamed', 0))
+
+    def test_member_list(self):
+        url = f'/api/crew/{self.crew.pk}/members/'
+        self.assertEqual(self.get(url), ([], 0))
+        self.assertEqual(self.get(url), ([], 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            CrewMembership.objects.create(user=self.user, crew=self.crew, status=CrewMembershipStatus.ACCEPTED)
+        data, hits = self.get(url)
+        self.assertEqual(([member['user']['nickname'] for member in data], hits), (['cached'], 0))
+
+    def test_member_profile_change(self):
+        CrewMembership.objects.create(user=self.user, crew=self.crew, status=CrewMembershipStatus.ACCEPTED)
+        url = f'/api/crew/{self.crew.pk}/members/'
+        self.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.nickname = 'renamed'
+            self.user.save()
+        data, hits = self.get(url)
+        self.assertEqual(([member['user']['nickname'] for member in data], hits), (['renamed'], 0))
+
+    def test_shared_validators(self):
+        # Whoever fills the shared entry, every user gets the same validator and can revalidate with it
+        url = f'/api/crew/{self.crew.pk}/'
+        other = User.objects.create(email='other@example.com', nickname='other')
+        CrewMembership.objects.create(user=other, crew=self.crew, status=CrewMembershipStatus.ACCEPTED)
+        filled = self.client.get(url)['ETag']
+        client = APIClient()
+        client.force_authenticate(other)
+        response = client.get(url)
+        self.assertEqual(response['ETag'], filled)
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=filled).status_code, 304)
+        cache.clear()
+        self.assertEqual(client.get(url)['ETag'], filled)
@@ -5,11 +5,16 @@ from rest_framework.response import Response
 from .models import Crew, CrewMembership, CrewMembershipStatus, CrewMembershipRole
 from .serializers import CrewSerializer, CrewMembershipSerializer
 from .permissions import IsCrewCreatorOrReadOnly # Import the custom permission
+from . import membership_cache, services
 from retrospect.models import Template, Retrospect, Challenge, ChallengeStatus
 from retrospect.serializers import TemplateSerializer, RetrospectSerializer, ChallengeSerializer
+from config.conditional import ConditionalGetMixin
+from config.fast_serializers import ValuesListMixin
+from config.fieldsets import SparseFieldsetViewMixin
+from config.response_cache import cached_response, scope
 # Create your views here.
 
-class CrewViewSet(viewsets.ModelViewSet):
+class CrewViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows crews to be viewed or edited.
     Also handles joining a crew.
@@ -19,119 +24,68 @@ class CrewViewSet(viewsets.ModelViewSet):
     # Require authentication for all crew actions
     permission_classes = [permissions.IsAuthenticated, IsCrewCreatorOrReadOnly]
 
+    # Crew details and member lists look the same to every user, so the cached responses are shared
+    @cached_response(lambda view, request: [scope('crew', view.kwargs['pk'])], per_user=False)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'], url_path='my-crews')
     def my_crews(self, request):
         """Returns a list of crews the current user is a member of."""
         user = request.user
-        # Find memberships where the user is accepted
-        memberships = CrewMembership.objects.filter(user=user, status=CrewMembershipStatus.ACCEPTED)
-        # Get the crew objects from these memberships
-        crews = [membership.crew for membership in memberships]
+        # Crews where the user is accepted (ids come from the membership cache)
+        crews = Crew.objects.filter(pk__in=membership_cache.get_accepted_crew_ids(user))
         # Serialize the crew data
         serializer = CrewSerializer(crews, many=True, context={'request': request}) # Pass request context for potential hyperlinked fields
         return Response(serializer.data)
 
-    @action(detail=True, methods=['post'], url_path='join')
+    @action(detail=True, methods=['post'], url_path='join', permission_classes=[permissions.IsAuthenticated])
     def join_crew(self, request, pk=None):
         """Allows an authenticated user to join a specific crew.
         If the user has a PENDING request, it accepts it.
         If the user has no request, it creates an ACCEPTED membership.
         The first user to be ACCEPTED becomes the CREATOR.
+        The transition and member_count update run atomically in crew.services.
         """
         crew = self.get_object()
-        user = request.user
-
         try:
-            membership = CrewMembership.objects.get(user=user, crew=crew)
-            # Membership exists, handle based on status
-            if membership.status == CrewMembershipStatus.ACCEPTED:
-                return Response({'detail': 'User is already a member of this crew.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            elif membership.status == CrewMembershipStatus.PENDING:
-                # Accept the pending request
-                membership.status = CrewMembershipStatus.ACCEPTED
-                # Check if this user is now the first accepted member
-                is_first_accepted = not CrewMembership.objects.filter(
-                    crew=crew, 
-                    status=CrewMembershipStatus.ACCEPTED
-                ).exclude(pk=membership.pk).exists() # Exclude self if checking before save
-                
-                if is_first_accepted:
-                    membership.role = CrewMembershipRole.CREATOR
-                else:
-                    # Ensure role is participant if not the first (might have been wrongly assigned CREATOR on request)
-                    membership.role = CrewMembershipRole.PARTICIPANT
-                
-                membership.save()
-                
-                # Update member count
-                crew.member_count = CrewMembership.objects.filter(crew=crew, status=CrewMembershipStatus.ACCEPTED).count()
-                crew.save(update_fields=['member_count'])
-                
-                serializer = CrewMembershipSerializer(membership)
-                return Response(serializer.data, status=status.HTTP_200_OK) # OK, as we updated existing
+            membership, created = services.join_crew(crew.pk, request.user)
+        except services.MembershipError as e:
+            return Response({'detail': e.detail}, status=e.status_code)
 
-            elif membership.status == CrewMembershipStatus.REJECTED:
-                 return Response({'detail': 'Your previous join request was rejected. Please contact the crew admin.'}, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                 return Response({'detail': 'Cannot process join request due to existing membership status.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = CrewMembershipSerializer(membership)
+        # CREATED for a new membership, OK when an existing request was accepted
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
-        except CrewMembership.DoesNotExist:
-            # No existing membership, create a new ACCEPTED one
-            # Determine role based on whether the crew has accepted members *before* creating
-            is_first_member = not CrewMembership.objects.filter(crew=crew, status=CrewMembershipStatus.ACCEPTED).exists()
-            default_role = CrewMembershipRole.CREATOR if is_first_member else CrewMembershipRole.PARTICIPANT
-
-            membership = CrewMembership.objects.create(
-                user=user,
-                crew=crew,
-                role=default_role,
-                status=CrewMembershipStatus.ACCEPTED
-            )
-
-            # Update member_count
-            crew.member_count = CrewMembership.objects.filter(crew=crew, status=CrewMembershipStatus.ACCEPTED).count()
-            crew.save(update_fields=['member_count'])
-
-            serializer = CrewMembershipSerializer(membership)
-            return Response(serializer.data, status=status.HTTP_201_CREATED) # CREATED, as it's new
-
-    @action(detail=True, methods=['delete'], url_path='leave')
+    @action(detail=True, methods=['delete'], url_path='leave', permission_classes=[permissions.IsAuthenticated])
     def leave_crew(self, request, pk=None):
         """Allows an authenticated user to leave a specific crew."""
         crew = self.get_object() # Gets the crew instance based on pk
-        user = request.user
-
-        try:
-            membership = CrewMembership.objects.get(user=user, crew=crew)
-        except CrewMembership.DoesNotExist:
-            return Response({'detail': 'You are not a member of this crew.'}, status=status.HTTP_404_NOT_FOUND)
 
         # Optional: Prevent creator from leaving?
         # if membership.role == CrewMembershipRole.CREATOR:
         #     return Response({'detail': 'Crew creator cannot leave the crew. You may need to delete the crew or transfer ownership first.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Delete the membership
-        membership.delete()
-
-        # Optional: Update member_count. Consider using signals for robustness.
-        crew.member_count = CrewMembership.objects.filter(crew=crew, status=CrewMembershipStatus.ACCEPTED).count() # Recalculate or decrement
-        crew.save(update_fields=['member_count'])
+        try:
+            services.leave_crew(crew.pk, request.user)
+        except services.MembershipError as e:
+            return Response({'detail': e.detail}, status=e.status_code)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['get'], url_path='members')
+    @cached_response(lambda view, request: [scope('crew', view.kwargs['pk'], 'members')], per_user=False)
     def list_members(self, request, pk=None):
         """Returns a list of accepted members for a specific crew."""
         crew = self.get_object() # Gets the crew instance based on pk
         # Find accepted memberships for this crew
-        memberships = CrewMembership.objects.filter(crew=crew, status=CrewMembershipStatus.ACCEPTED)
+        memberships = CrewMembership.objects.filter(crew=crew, status=CrewMembershipStatus.ACCEPTED).select_related('user')
         # Serialize the membership data (which includes user details)
         # Use CrewMembershipSerializer as it's designed to show membership details including the user
         serializer = CrewMembershipSerializer(memberships, many=True, context={'request': request})
         return Response(serializer.data)
 
-    @action(detail=True, methods=['post'], url_path='request-join')
+    @action(detail=True, methods=['post'], url_path='request-join', permission_classes=[permissions.IsAuthenticated])
     def request_join(self, request, pk=None):
         """Allows an authenticated user to request joining a specific crew.
         Creates a membership record with PENDING status.
@@ -180,7 +134,7 @@ class CrewViewSet(viewsets.ModelViewSet):
         # Permission check (IsCrewCreatorOrReadOnly) is handled automatically by the viewset
 
         try:
-            membership = CrewMembership.objects.get(crew=crew, user_id=user_pk)
+            membership = CrewMembership.objects.select_related('user').get(crew=crew, user_id=user_pk)
         except CrewMembership.DoesNotExist:
             return Response({'detail': 'Membership request not found for this user in this crew.'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -223,7 +177,7 @@ class CrewViewSet(viewsets.ModelViewSet):
         user = request.user
 
         # Check if user is an accepted member of the crew
-        if not CrewMembership.objects.filter(crew=crew, user=user, status=CrewMembershipStatus.ACCEPTED).exists():
+        if not membership_cache.is_accepted_member(user, crew):
             # Optionally, allow public viewing or creator override depending on deeper permission logic
             return Response({'detail': 'You must be a member of this crew to view its challenges.'}, 
                             status=status.HTTP_403_FORBIDDEN)
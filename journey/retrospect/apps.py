@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RetrospectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'retrospect'
+
+    def ready(self):
+        from . import signals  # noqa: F401
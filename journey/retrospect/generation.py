@@ -0,0 +1,194 @@
+"""
+Plan / KPI generation for challenges, synchronously or in the background.
+
+Asynchronous creation stores the challenge with ``generation_status=PENDING`` and
+enqueues it here once the transaction commits. A small thread pool claims the row
+(PENDING -> RUNNING), calls the generators, writes the Plan and KPI fields and notifies
+the owner(s). Concurrency is capped by ``CHALLENGE_GENERATION_WORKERS`` and the number
+of queued jobs by ``CHALLENGE_GENERATION_QUEUE_SIZE``; jobs that do not fit simply stay
+PENDING in the database and are picked up by ``process_pending_challenges``.
+
+The queue lives in memory, so a claim records ``generation_claimed_at``: a row left
+RUNNING by a process that died is older than ``CHALLENGE_GENERATION_STALE_SECONDS`` and
+``process_pending_challenges --requeue-stale`` puts it back to PENDING. Results are only
+written under the claim that produced them, so a worker that was merely slow cannot
+overwrite the retry.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ai_manager.cache import cached_completion
+from config import response_cache
+from crew.models import CrewMembership, CrewMembershipStatus
+from sync_manager import changelog
+from sync_manager.models import ChangeKind
+from user_manager.models import Notification, NotificationType
+
+from .models import Challenge, ChallengeGenerationStatus, ChallengeOwnerType, Plan
+from .signals import challenge_scope
+
+logger = logging.getLogger(__name__)
+
+
+# --- Placeholder LLM functions --- #
+# Cached on their arguments (ai_manager.cache): repeated goals such as "run 5km" cost one call
+@cached_completion('placeholder', task='plan')
+def generate_plan_from_description(description: str) -> dict:
+    print(f"[LLM Placeholder] Generating plan for: {description}")
+    plan_steps = [f"Step 1 based on '{description}'", f"Step 2 based on '{description}'", "Step 3 generic"]
+    return {"plan_list": plan_steps}
+
+@cached_completion('placeholder', task='kpi')
+def generate_kpi_from_challenge(challenge_name: str, plan_list: list) -> tuple[str, dict]:
+    print(f"[LLM Placeholder] Generating KPI for: {challenge_name} with plan: {plan_list}")
+    kpi_desc = f"KPI description generated for {challenge_name}."
+    kpi_metrics = {"completion_rate": 0, "step_1_focus": 0, "consistency": 0}
+    return kpi_desc, kpi_metrics
+# --- End Placeholder --- #
+
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = getattr(settings, 'CHALLENGE_GENERATION_WORKERS', 2)
+            queue_size = getattr(settings, 'CHALLENGE_GENERATION_QUEUE_SIZE', 100)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='challenge-generation')
+            _slots = threading.BoundedSemaphore(workers + queue_size)
+    return _executor
+
+
+def enqueue(challenge_id):
+    """Schedules generation of a PENDING challenge. Returns False if the queue is full
+    (the challenge then stays PENDING for process_pending_challenges)."""
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        logger.warning("Challenge generation queue is full; challenge %s left pending", challenge_id)
+        return False
+    executor.submit(_run_job, challenge_id)
+    return True
+
+
+def enqueue_on_commit(challenge_id):
+    transaction.on_commit(lambda: enqueue(challenge_id))
+
+
+def _run_job(challenge_id):
+    try:
+        process_challenge(challenge_id)
+    except Exception:
+        logger.exception("Challenge generation crashed for challenge %s", challenge_id)
+    finally:
+        _slots.release()
+        # Worker threads hold their own connection; do not leak it between jobs
+        close_old_connections()
+
+
+def process_challenge(challenge_id):
+    """Generates the Plan and KPI of one PENDING challenge. Returns True when it was generated."""
+    claimed_at = timezone.now()
+    claimed = Challenge.objects.filter(
+        pk=challenge_id, generation_status=ChallengeGenerationStatus.PENDING
+    ).update(generation_status=ChallengeGenerationStatus.RUNNING, generation_claimed_at=claimed_at,
+             updated_at=claimed_at)
+    if not claimed:
+        return False  # Already taken by another worker, or not pending anymore
+
+    challenge = Challenge.objects.select_related('plan').get(pk=challenge_id)
+    _challenge_updated(challenge)
+    # Still ours: not requeued as stale meanwhile
+    ours = Challenge.objects.filter(pk=challenge_id, generation_status=ChallengeGenerationStatus.RUNNING,
+                                    generation_claimed_at=claimed_at)
+    try:
+        # The model calls run outside any transaction so no locks are held while waiting
+        plan_data = None
+        plan_list = challenge.plan.plan_list if challenge.plan else []
+        if challenge.plan is None and challenge.plan_description:
+            plan_data = generate_plan_from_description(challenge.plan_description)
+            plan_list = plan_data['plan_list']
+        kpi_description, kpi_metrics = generate_kpi_from_challenge(challenge.challenge_name, plan_list)
+    except Exception:
+        logger.exception("Plan/KPI generation failed for challenge %s", challenge_id)
+        with transaction.atomic():
+            if ours.update(generation_status=ChallengeGenerationStatus.FAILED, updated_at=timezone.now()):
+                _challenge_updated(challenge)
+                notify(challenge, NotificationType.CHALLENGE_FAILED,
+                       f"'{challenge.challenge_name}' 챌린지 계획 생성에 실패했습니다.")
+        return False
+
+    with transaction.atomic():
+        plan = Plan.objects.create(**plan_data) if plan_data else challenge.plan
+        updated = ours.update(
+            plan=plan,
+            kpi_description=kpi_description,
+            kpi_metrics=kpi_metrics,
+            generation_status=ChallengeGenerationStatus.DONE,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            logger.warning("Challenge %s was requeued while generating; result dropped", challenge_id)
+            transaction.set_rollback(True)
+            return False
+        _challenge_updated(challenge)
+        notify(challenge, NotificationType.CHALLENGE_READY,
+               f"'{challenge.challenge_name}' 챌린지 계획이 준비되었습니다.")
+    return True
+
+
+def requeue(queryset):
+    """Puts challenges back to PENDING (e.g. FAILED ones, or RUNNING ones whose worker died)."""
+    with transaction.atomic():
+        challenges = list(queryset.select_for_update().only('id', 'owner_type', 'user_id', 'crew_id'))
+        Challenge.objects.filter(pk__in=[challenge.pk for challenge in challenges]).update(
+            generation_status=ChallengeGenerationStatus.PENDING, generation_claimed_at=None,
+            updated_at=timezone.now(),
+        )
+        for challenge in challenges:
+            _challenge_updated(challenge)
+    return len(challenges)
+
+
+def stale_running(stale_seconds=None):
+    """RUNNING challenges claimed longer than ``stale_seconds`` ago (or before claims were recorded)."""
+    if stale_seconds is None:
+        stale_seconds = getattr(settings, 'CHALLENGE_GENERATION_STALE_SECONDS', 10 * 60)
+    cutoff = timezone.now() - timedelta(seconds=stale_seconds)
+    return Challenge.objects.filter(generation_status=ChallengeGenerationStatus.RUNNING).filter(
+        Q(generation_claimed_at__lt=cutoff) | Q(generation_claimed_at__isnull=True)
+    )
+
+
+def _challenge_updated(challenge):
+    """Status changes here go through QuerySet.update(), which sends no model signals."""
+    response_cache.invalidate(challenge_scope(challenge.user_id, challenge.crew_id))
+    changelog.record(ChangeKind.CHALLENGE, challenge)
+
+
+def notify(challenge, notification_type, content):
+    """Notifies the owner of a USER challenge or the accepted members of a CREW challenge."""
+    if challenge.owner_type == ChallengeOwnerType.CREW:
+        user_ids = list(CrewMembership.objects.filter(
+            crew_id=challenge.crew_id, status=CrewMembershipStatus.ACCEPTED
+        ).values_list('user_id', flat=True))
+    else:
+        user_ids = [challenge.user_id] if challenge.user_id else []
+    content_type = ContentType.objects.get_for_model(Challenge)
+    notifications = Notification.objects.bulk_create([
+        Notification(user_id=user_id, type=notification_type, content=content[:255],
+                     content_type=content_type, object_id=challenge.pk)
+        for user_id in user_ids
+    ])
+    changelog.record_many(ChangeKind.NOTIFICATION, notifications)
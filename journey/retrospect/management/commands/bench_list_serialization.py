@@ -0,0 +1,79 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from community.models import Feed
+from community.serializers import FeedSerializer
+from config.fast_serializers import ValuesSerializer
+from crew.models import Crew
+from crew.serializers import CrewSerializer
+from retrospect.models import Challenge, ChallengeOwnerType, Plan, Retrospect, RetrospectOwnerType
+from retrospect.serializers import ChallengeSerializer, RetrospectSerializer
+from user_manager.models import User
+
+
+class Command(BaseCommand):
+    help = ("Compares the per-row cost of the list serializers (fetch + serialize) with the values() path "
+            "of config.fast_serializers. Synthetic data is created inside a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help="Rows per model and per measured list.")
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._seed(options['rows'])
+            cases = [
+                ('Retrospect', RetrospectSerializer, Retrospect.objects.select_related('user', 'crew', 'challenge', 'template')),
+                ('Challenge', ChallengeSerializer, Challenge.objects.select_related('user', 'crew', 'plan')),
+                ('Crew', CrewSerializer, Crew.objects.all()),
+                ('Feed', FeedSerializer, Feed.objects.select_related('user').defer('unique_viewer_sketch')),
+            ]
+            self.stdout.write(f"{'list':<12}{'serializer':>14}{'values()':>14}{'speedup':>10}")
+            for label, serializer_class, queryset in cases:
+                queryset = queryset.order_by('-id')[:options['rows']]
+                regular = self._measure(lambda: serializer_class(list(queryset), many=True).data, options)
+                values_serializer = ValuesSerializer(serializer_class)
+                fast = self._measure(lambda: values_serializer.serialize(values_serializer.project(queryset)), options)
+                self.stdout.write(f"{label:<12}{regular:>11.1f} us{fast:>11.1f} us{regular / fast:>9.1f}x")
+            transaction.set_rollback(True)
+
+    def _measure(self, run, options):
+        """Best-of-N microseconds per row."""
+        best = float('inf')
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            rows = run()
+            best = min(best, time.perf_counter() - started)
+        return best / max(len(rows), 1) * 1_000_000
+
+    def _seed(self, rows):
+        tag = f"benchlist{int(time.time())}"
+        User.objects.bulk_create([User(email=f"{tag}-{i}@bench.local", nickname=f"b{i}") for i in range(20)])
+        users = list(User.objects.filter(email__startswith=f"{tag}-"))
+        Crew.objects.bulk_create([
+            Crew(crew_name=f"{tag}-crew-{i}", crew_description="benchmark crew " * 5) for i in range(rows)
+        ])
+        crew = Crew.objects.filter(crew_name__startswith=f"{tag}-crew-").first()
+        plan = Plan.objects.create(plan_list=['step 1', 'step 2'])
+        deadline = timezone.now() + timedelta(days=30)
+        Challenge.objects.bulk_create([
+            Challenge(plan=plan, user=users[i % len(users)], challenge_name=f"{tag} {i}", deadline=deadline,
+                      kpi_description="kpi", kpi_metrics={'completion_rate': i % 100, 'consistency': 0},
+                      owner_type=ChallengeOwnerType.USER)
+            for i in range(rows)
+        ])
+        challenge = Challenge.objects.filter(challenge_name__startswith=tag).first()
+        Retrospect.objects.bulk_create([
+            Retrospect(challenge=challenge, user=users[i % len(users)], crew=crew if i % 3 == 0 else None,
+                       content="retrospect body " * 20, kpi_result=i / rows,
+                       owner_type=RetrospectOwnerType.CREW if i % 3 == 0 else RetrospectOwnerType.USER)
+            for i in range(rows)
+        ])
+        Feed.objects.bulk_create([
+            Feed(user=users[i % len(users)], content="feed body " * 10, view_count=i, like_count=i % 7)
+            for i in range(rows)
+        ])
@@ -0,0 +1,101 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from crew import membership_cache
+from crew.models import Crew, CrewMembership, CrewMembershipStatus
+from retrospect import visibility
+from retrospect.models import (Challenge, Plan, Retrospect, RetrospectOwnerType,
+                               RetrospectVisibility, ChallengeOwnerType)
+from user_manager.models import User
+
+
+def legacy_queryset(user):
+    """The OR + DISTINCT query RetrospectViewSet.get_queryset used before the index."""
+    user_crew_ids = CrewMembership.objects.filter(
+        user=user, status=CrewMembershipStatus.ACCEPTED
+    ).values_list('crew_id', flat=True)
+    return Retrospect.objects.filter(
+        Q(owner_type=RetrospectOwnerType.USER, user=user) |
+        (Q(owner_type=RetrospectOwnerType.CREW, crew_id__in=user_crew_ids) &
+         Q(visibility__in=[RetrospectVisibility.CREW, RetrospectVisibility.PUBLIC])) |
+        Q(visibility=RetrospectVisibility.PUBLIC)
+    ).distinct().order_by('-created_at')
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks the retrospect list query with and without the visibility index. "
+            "Synthetic data is created inside a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retrospects', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--crews', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            viewer = self._seed(options)
+            self._run('legacy OR + DISTINCT', lambda: legacy_queryset(viewer), options)
+            self._run('visibility index', lambda: visibility.visible_retrospects(viewer), options)
+            transaction.set_rollback(True)
+
+    def _seed(self, options):
+        rng = random.Random(0)
+        tag = f"bench{int(time.time())}"
+        users = User.objects.bulk_create([
+            User(email=f"{tag}-{i}@bench.local", nickname=f"b{i}") for i in range(options['users'])
+        ])
+        users = list(User.objects.filter(email__startswith=f"{tag}-"))
+        crews = Crew.objects.bulk_create([Crew(crew_name=f"{tag}-crew-{i}") for i in range(options['crews'])])
+        crews = list(Crew.objects.filter(crew_name__startswith=f"{tag}-crew-"))
+        viewer = users[0]
+        CrewMembership.objects.bulk_create([
+            CrewMembership(user=viewer, crew=crew, status=CrewMembershipStatus.ACCEPTED)
+            for crew in crews[:3]
+        ])
+        membership_cache.invalidate(viewer.pk)
+
+        plan = Plan.objects.create(plan_list=[])
+        challenge = Challenge.objects.create(
+            plan=plan, user=viewer, challenge_name=tag, owner_type=ChallengeOwnerType.USER,
+            deadline=timezone.now() + timedelta(days=30),
+        )
+        visibilities = [RetrospectVisibility.PRIVATE, RetrospectVisibility.CREW, RetrospectVisibility.PUBLIC]
+        batch = []
+        for i in range(options['retrospects']):
+            if rng.random() < 0.3:
+                owner_type, crew = RetrospectOwnerType.CREW, rng.choice(crews)
+                vis = rng.choice(visibilities[1:])
+            else:
+                owner_type, crew = RetrospectOwnerType.USER, None
+                vis = rng.choice(visibilities)
+            batch.append(Retrospect(
+                challenge=challenge, user=rng.choice(users), crew=crew, content=f"retrospect {i}",
+                visibility=vis, owner_type=owner_type,
+            ))
+        Retrospect.objects.bulk_create(batch, batch_size=1000)
+        indexed = visibility.rebuild_index()
+        self.stdout.write(f"Seeded {len(batch)} retrospects ({indexed} indexed).")
+        return viewer
+
+    def _run(self, label, build_queryset, options):
+        page_size = options['page_size']
+        ids = list(build_queryset().values_list('id', flat=True)[:page_size])
+        start = time.perf_counter()
+        for _ in range(options['repeat']):
+            list(build_queryset().values_list('id', flat=True)[:page_size])
+        elapsed = (time.perf_counter() - start) / options['repeat'] * 1000
+        self.stdout.write(f"{label:<24} {elapsed:8.2f} ms/page  first ids={ids[:5]}")
+        with connection.cursor() as cursor:
+            sql, params = build_queryset().values_list('id', flat=True)[:page_size].query.sql_with_params()
+            explain = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+            cursor.execute(explain + sql, params)
+            for row in cursor.fetchall():
+                self.stdout.write(f"    {row[-1]}")
@@ -0,0 +1,35 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from retrospect.weekly import generate_weekly_analyses
+
+
+class Command(BaseCommand):
+    help = ("Generates weekly retrospect analyses for every user and crew. "
+            "Incremental: only weeks whose retrospects changed since the last run are reprocessed.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Size of the process pool (1 runs inline).")
+        parser.add_argument('--full', action='store_true', help="Regenerate every week, ignoring previous runs.")
+        parser.add_argument('--owners-per-batch', type=int, default=200)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = generate_weekly_analyses(
+            workers=options['workers'],
+            full=options['full'],
+            owners_per_batch=options['owners_per_batch'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['weeks']} stale weeks, {stats['owners']} owners: "
+            f"{stats['created']} analyses written ({stats['replaced']} replaced, {stats['removed']} removed) "
+            f"in {elapsed:.1f}s."
+        ))
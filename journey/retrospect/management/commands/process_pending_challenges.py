@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from config import response_cache
+from retrospect.generation import process_challenge, requeue, stale_running
+from retrospect.models import Challenge, ChallengeGenerationStatus
+
+
+class Command(BaseCommand):
+    help = ("Generates plan/KPI for challenges left PENDING (queue overflow, restarts). "
+            "Use --retry-failed to requeue FAILED ones first, and --requeue-stale for RUNNING ones "
+            "whose worker died.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--retry-failed', action='store_true')
+        parser.add_argument('--requeue-stale', action='store_true',
+                            help="Requeue RUNNING challenges claimed more than --stale-seconds ago.")
+        parser.add_argument('--stale-seconds', type=int, default=None,
+                            help="Defaults to settings.CHALLENGE_GENERATION_STALE_SECONDS.")
+
+    def handle(self, *args, **options):
+        warning = response_cache.process_local_warning()
+        if warning:
+            self.stderr.write(self.style.WARNING(warning))
+        if options['retry_failed']:
+            requeue(Challenge.objects.filter(generation_status=ChallengeGenerationStatus.FAILED))
+        if options['requeue_stale']:
+            stale = requeue(stale_running(options['stale_seconds']))
+            self.stdout.write(f"Requeued {stale} stale challenges.")
+        pending = Challenge.objects.filter(
+            generation_status=ChallengeGenerationStatus.PENDING
+        ).order_by('created_at').values_list('pk', flat=True)
+        if options['limit']:
+            pending = pending[:options['limit']]
+
+        done = sum(1 for challenge_id in list(pending) if process_challenge(challenge_id))
+        self.stdout.write(self.style.SUCCESS(f"Generated {done} challenges."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from retrospect.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Refills the SQLite FTS5 table used by the retrospect search endpoint."
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write("Nothing to do: PostgreSQL maintains the tsvector GIN index itself.")
+            return
+        with transaction.atomic():
+            rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Retrospect search index rebuilt."))
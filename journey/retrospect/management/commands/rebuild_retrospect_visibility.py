@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from retrospect.visibility import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the retrospect visibility index from the Retrospect table (backfill / repair)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {written} retrospects."))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_visibility_index(apps, schema_editor):
+    """Same rules as retrospect.visibility.scope_for, on historical models."""
+    Retrospect = apps.get_model('retrospect', 'Retrospect')
+    RetrospectVisibilityIndex = apps.get_model('retrospect', 'RetrospectVisibilityIndex')
+
+    rows = []
+    for retrospect in Retrospect.objects.order_by('pk').iterator(chunk_size=1000):
+        if retrospect.visibility == 'PUBLIC':
+            scope = 'PUBLIC'
+        elif retrospect.owner_type == 'USER':
+            scope = f'USER:{retrospect.user_id}'
+        elif retrospect.owner_type == 'CREW' and retrospect.crew_id is not None and retrospect.visibility == 'CREW':
+            scope = f'CREW:{retrospect.crew_id}'
+        else:
+            continue
+        rows.append(RetrospectVisibilityIndex(retrospect_id=retrospect.pk, scope=scope, created_at=retrospect.created_at))
+    RetrospectVisibilityIndex.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retrospect', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='challenge',
+            name='plan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='challenges', to='retrospect.plan'),
+        ),
+        migrations.CreateModel(
+            name='RetrospectVisibilityIndex',
+            fields=[
+                ('retrospect', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='visibility_index', serialize=False, to='retrospect.retrospect')),
+                ('scope', models.CharField(max_length=32)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope', '-created_at', '-retrospect'], name='retrospect_visibility_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_visibility_index, migrations.RunPython.noop),
+    ]
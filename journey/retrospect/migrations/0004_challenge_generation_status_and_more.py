@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retrospect', '0003_retrospect_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='generation_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='DONE', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='challenge',
+            name='plan_description',
+            field=models.TextField(blank=True),
+        ),
+    ]
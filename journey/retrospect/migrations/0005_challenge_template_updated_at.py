@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retrospect', '0004_challenge_generation_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
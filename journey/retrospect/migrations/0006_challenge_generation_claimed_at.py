@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retrospect', '0005_challenge_template_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='generation_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
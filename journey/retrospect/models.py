@@ -21,6 +21,12 @@ class ChallengeStatus(models.TextChoices):
     SUCCESS = 'SUCCESS', 'Success'
     FAIL = 'FAIL', 'Fail'
 
+class ChallengeGenerationStatus(models.TextChoices):
+    PENDING = 'PENDING', 'Pending'
+    RUNNING = 'RUNNING', 'Running'
+    DONE = 'DONE', 'Done'
+    FAILED = 'FAILED', 'Failed'
+
 class RetrospectVisibility(models.TextChoices):
     PRIVATE = 'PRIVATE', 'Private'
     CREW = 'CREW', 'Crew Only'
@@ -49,6 +55,7 @@ class Template(models.Model):
     owner_type = models.CharField(max_length=10, choices=TemplateOwnerType.choices)
     name = models.CharField(max_length=255)
     steps = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True) # 조건부 GET(ETag/Last-Modified) 버전
 
     def __str__(self):
         return self.name
@@ -64,7 +71,11 @@ class Challenge(models.Model):
     kpi_metrics = models.JSONField(null=True, blank=True) # 구조화된 KPI 저장 (예: {"metric1": "...", "metric2": "..."})
     owner_type = models.CharField(max_length=10, choices=ChallengeOwnerType.choices)
     status = models.CharField(max_length=10, choices=ChallengeStatus.choices, default=ChallengeStatus.LIVE)
+    generation_status = models.CharField(max_length=10, choices=ChallengeGenerationStatus.choices, default=ChallengeGenerationStatus.DONE) # 계획/KPI 비동기 생성 상태
+    plan_description = models.TextField(blank=True) # 비동기 생성 시 계획 생성에 사용할 설명
+    generation_claimed_at = models.DateTimeField(null=True, blank=True) # 생성 작업이 RUNNING으로 가져간 시각 (중단된 작업 복구용)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True) # 조건부 GET(ETag/Last-Modified) 버전
 
     def __str__(self):
         return self.challenge_name
@@ -112,3 +123,17 @@ class RetrospectWeeklyAnalysis(models.Model):
     def __str__(self):
         owner = self.user if self.owner_type == RetrospectWeeklyAnalysisOwnerType.USER else self.crew
         return f"Weekly Analysis for {owner} ({self.start_date} - {self.end_date})"
+
+class RetrospectVisibilityIndex(models.Model):
+    """회고 목록 조회용 가시성 인덱스 (retrospect.visibility 에서 관리)"""
+    retrospect = models.OneToOneField(Retrospect, on_delete=models.CASCADE, primary_key=True, related_name='visibility_index')
+    scope = models.CharField(max_length=32) # 'PUBLIC', 'USER:<id>', 'CREW:<id>'
+    created_at = models.DateTimeField() # Retrospect.created_at 복사본 (최신순 정렬용)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['scope', '-created_at', '-retrospect'], name='retrospect_visibility_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} -> Retrospect {self.retrospect_id}"
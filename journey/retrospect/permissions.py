@@ -1,6 +1,7 @@
 from rest_framework import permissions
-from .models import Template, Challenge, RetrospectWeeklyAnalysis, Retrospect, RetrospectVisibility # Import Retrospect, RetrospectVisibility
-from crew.models import CrewMembership, CrewMembershipStatus, CrewMembershipRole # Import CrewMembershipRole (might be useful later)
+from .models import (RetrospectVisibility, TemplateOwnerType, ChallengeOwnerType,
+                     RetrospectOwnerType, RetrospectWeeklyAnalysisOwnerType)
+from crew import membership_cache
 
 # Permission class for Retrospect (assuming it was defined here previously)
 # Renaming or removing this as it's too generic and might conflict
@@ -31,20 +32,13 @@ class IsTemplateOwnerOrCrewMemberOrReadOnly(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        if obj.owner_type == Template.TemplateOwnerType.USER:
-            return obj.user == request.user
-        elif obj.owner_type == Template.TemplateOwnerType.CREW:
-            # Corrected: Check CrewMembership instead of user.crews
-            if obj.crew is None: return False # Should have a crew if CREW type
-            try:
-                return CrewMembership.objects.filter(
-                    crew=obj.crew,
-                    user=request.user,
-                    status=CrewMembershipStatus.ACCEPTED # Only accepted members can edit
-                ).exists()
-            except CrewMembership.DoesNotExist:
-                return False
-        elif obj.owner_type == Template.TemplateOwnerType.COMMON:
+        if obj.owner_type == TemplateOwnerType.USER:
+            return obj.user_id == request.user.pk
+        elif obj.owner_type == TemplateOwnerType.CREW:
+            if obj.crew_id is None: return False # Should have a crew if CREW type
+            # Only accepted members can edit (cached membership lookup)
+            return membership_cache.is_accepted_member(request.user, obj.crew_id)
+        elif obj.owner_type == TemplateOwnerType.COMMON:
             # Optionally allow admins to modify common templates
             # return request.user.is_staff
             return False # No modification for common templates by default
@@ -63,19 +57,12 @@ class IsChallengeOwnerOrCrewMemberOrReadOnly(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        if obj.owner_type == Challenge.ChallengeOwnerType.USER:
-            return obj.user == request.user
-        elif obj.owner_type == Challenge.ChallengeOwnerType.CREW:
-            # Corrected: Check CrewMembership instead of user.crews
-            if obj.crew is None: return False
-            try:
-                 return CrewMembership.objects.filter(
-                    crew=obj.crew,
-                    user=request.user,
-                    status=CrewMembershipStatus.ACCEPTED # Only accepted members can edit
-                ).exists()
-            except CrewMembership.DoesNotExist:
-                return False
+        if obj.owner_type == ChallengeOwnerType.USER:
+            return obj.user_id == request.user.pk
+        elif obj.owner_type == ChallengeOwnerType.CREW:
+            if obj.crew_id is None: return False
+            # Only accepted members can edit (cached membership lookup)
+            return membership_cache.is_accepted_member(request.user, obj.crew_id)
         return False
 
 class IsRetrospectOwnerOrCrewMemberOrReadOnly(permissions.BasePermission):
@@ -94,41 +81,27 @@ class IsRetrospectOwnerOrCrewMemberOrReadOnly(permissions.BasePermission):
                 return True
             if not request.user.is_authenticated:
                 return False # Need to be authenticated for non-public
-            if obj.owner_type == Retrospect.RetrospectOwnerType.USER:
+            if obj.owner_type == RetrospectOwnerType.USER:
                 # Private user retrospects only visible to the owner
-                return obj.user == request.user
-            elif obj.owner_type == Retrospect.RetrospectOwnerType.CREW:
+                return obj.user_id == request.user.pk
+            elif obj.owner_type == RetrospectOwnerType.CREW:
                 # Crew retrospects visible to crew members
-                if obj.crew is None: return False # Should have crew
-                try:
-                    is_member = CrewMembership.objects.filter(
-                        crew=obj.crew,
-                        user=request.user,
-                        status=CrewMembershipStatus.ACCEPTED
-                    ).exists()
-                    # Visible if member and visibility is CREW or PUBLIC
-                    return is_member and obj.visibility in [RetrospectVisibility.CREW, RetrospectVisibility.PUBLIC]
-                except CrewMembership.DoesNotExist:
-                    return False
+                if obj.crew_id is None: return False # Should have crew
+                # Visible if member and visibility is CREW or PUBLIC
+                return (obj.visibility in [RetrospectVisibility.CREW, RetrospectVisibility.PUBLIC] and
+                        membership_cache.is_accepted_member(request.user, obj.crew_id))
             return False # Default deny for safety
 
         # Check write permissions (PUT, PATCH, DELETE)
         if not request.user.is_authenticated:
             return False
 
-        if obj.owner_type == Retrospect.RetrospectOwnerType.USER:
-            return obj.user == request.user
-        elif obj.owner_type == Retrospect.RetrospectOwnerType.CREW:
-            if obj.crew is None: return False
-            try:
-                 # Only accepted members can edit crew retrospects
-                 return CrewMembership.objects.filter(
-                    crew=obj.crew,
-                    user=request.user,
-                    status=CrewMembershipStatus.ACCEPTED
-                ).exists()
-            except CrewMembership.DoesNotExist:
-                return False
+        if obj.owner_type == RetrospectOwnerType.USER:
+            return obj.user_id == request.user.pk
+        elif obj.owner_type == RetrospectOwnerType.CREW:
+            if obj.crew_id is None: return False
+            # Only accepted members can edit crew retrospects
+            return membership_cache.is_accepted_member(request.user, obj.crew_id)
         return False
 
 
@@ -152,23 +125,14 @@ class IsRetrospectWeeklyAnalysisOwnerOrCrewMemberOrReadOnly(permissions.BasePerm
         if not request.user.is_authenticated:
             return False
 
-        if obj.owner_type == RetrospectWeeklyAnalysis.RetrospectWeeklyAnalysisOwnerType.USER:
+        if obj.owner_type == RetrospectWeeklyAnalysisOwnerType.USER:
             # Check if the object has a user and if it matches the request user
-            return obj.user is not None and obj.user == request.user
-        elif obj.owner_type == RetrospectWeeklyAnalysis.RetrospectWeeklyAnalysisOwnerType.CREW:
+            return obj.user_id is not None and obj.user_id == request.user.pk
+        elif obj.owner_type == RetrospectWeeklyAnalysisOwnerType.CREW:
             # Check if the object has a crew
-            if obj.crew is None:
+            if obj.crew_id is None:
                 return False
             # Check if the requesting user is an accepted member of the crew
-            try:
-                return CrewMembership.objects.filter(
-                    crew=obj.crew,
-                    user=request.user,
-                    status=CrewMembershipStatus.ACCEPTED
-                ).exists()
-            # except AttributeError: # Should not happen if CrewMembership is imported
-            #     return False
-            except CrewMembership.DoesNotExist: # Should not happen with .exists()
-                return False
+            return membership_cache.is_accepted_member(request.user, obj.crew_id)
 
         return False
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+Full-text search over Retrospect.content.
+
+- SQLite: an FTS5 table (``retrospect_retrospect_fts``) keyed by the retrospect id,
+  kept in sync from Retrospect post_save/post_delete (see retrospect.signals).
+- PostgreSQL: a GIN index on ``to_tsvector(config, content)``, maintained by the database.
+
+Matching, ranking (bm25 / ts_rank) and snippets are computed in SQL. The database marks
+matches with control characters; ``highlight`` HTML-escapes the (user-written) snippet
+and only then turns the marks into ``<b>`` tags, so the snippet is safe to render as HTML.
+Every query term is a prefix match so Korean words still match with particles attached
+(e.g. "운동" matches "운동을").
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+
+FTS_TABLE = 'retrospect_retrospect_fts'
+POSTGRES_CONFIG = 'simple'
+MATCH_START = '\x02'
+MATCH_STOP = '\x03'
+HIGHLIGHT_START = '<b>'
+HIGHLIGHT_STOP = '</b>'
+SNIPPET_TOKENS = 16
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+_MARK_RE = re.compile(f'({MATCH_START}|{MATCH_STOP})')
+
+
+def parse_terms(text):
+    """Splits user input into plain word terms (no query syntax is passed through)."""
+    return _TERM_RE.findall(text or '')
+
+
+def search_retrospects(queryset, text):
+    """Returns the queryset filtered by ``text``, annotated with ``search_rank`` and
+    ``search_snippet`` and ordered by relevance (best first)."""
+    terms = parse_terms(text)
+    if not terms:
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        return _search_postgres(queryset, terms)
+    return _search_sqlite(queryset, terms)
+
+
+def _search_sqlite(queryset, terms):
+    match = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        select={
+            # bm25() is lower for better matches
+            'search_rank': f'-bm25({FTS_TABLE})',
+            'search_snippet': f"snippet({FTS_TABLE}, 0, %s, %s, '…', %s)",
+        },
+        select_params=(MATCH_START, MATCH_STOP, SNIPPET_TOKENS),
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    ).order_by('-search_rank', '-id')
+
+
+def _search_postgres(queryset, terms):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+
+    raw_query = ' & '.join("'{}':*".format(term.replace("'", "''")) for term in terms)
+    query = SearchQuery(raw_query, config=POSTGRES_CONFIG, search_type='raw')
+    vector = SearchVector('content', config=POSTGRES_CONFIG)
+    return queryset.annotate(
+        search_vector=vector,
+        search_rank=SearchRank(vector, query),
+        search_snippet=SearchHeadline(
+            'content', query, config=POSTGRES_CONFIG,
+            start_sel=MATCH_START, stop_sel=MATCH_STOP, max_words=SNIPPET_TOKENS,
+        ),
+    ).filter(search_vector=query).order_by('-search_rank', '-id')
+
+
+def highlight(snippet):
+    """HTML-escapes a ``search_snippet`` and wraps its marked matches in highlight tags.
+    Tags always come out balanced, even if the content itself contains the marks."""
+    if snippet is None:
+        return None
+    parts = []
+    in_match = False
+    for part in _MARK_RE.split(snippet):
+        if part == MATCH_START:
+            if not in_match:
+                parts.append(HIGHLIGHT_START)
+                in_match = True
+        elif part == MATCH_STOP:
+            if in_match:
+                parts.append(HIGHLIGHT_STOP)
+                in_match = False
+        else:
+            parts.append(escape(part))
+    if in_match:
+        parts.append(HIGHLIGHT_STOP)
+    return ''.join(parts)
+
+
+def index_retrospect(retrospect):
+    """Writes the FTS row of a retrospect (SQLite only; PostgreSQL indexes the column itself)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [retrospect.pk])
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, content) VALUES (%s, %s)',
+                       [retrospect.pk, retrospect.content])
+
+
+def unindex_retrospect(retrospect_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [retrospect_id])
+
+
+def rebuild_index():
+    """Refills the SQLite FTS table from retrospect_retrospect."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, content) SELECT id, content FROM retrospect_retrospect')
@@ -1,9 +1,11 @@
 from rest_framework import serializers
-from .models import Retrospect, Challenge, Template, Plan, RetrospectWeeklyAnalysis
+from config.fieldsets import SparseFieldsetMixin
+from .models import Retrospect, Challenge, Template, Plan, RetrospectWeeklyAnalysis, ChallengeOwnerType
+from . import search
 from user_manager.models import User
 from crew.models import Crew
 
-class RetrospectSerializer(serializers.ModelSerializer):
+class RetrospectSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for the Retrospect model."""
     # Use PrimaryKeyRelatedField for related objects initially for simplicity
     # Consider using nested serializers or StringRelatedField later if needed
@@ -52,7 +54,20 @@ class RetrospectSerializer(serializers.ModelSerializer):
 
         return data 
 
-class TemplateSerializer(serializers.ModelSerializer):
+class RetrospectSearchResultSerializer(RetrospectSerializer):
+    """Retrospect with the relevance score and highlighted snippet computed by the database."""
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+    snippet = serializers.SerializerMethodField()
+
+    class Meta(RetrospectSerializer.Meta):
+        fields = RetrospectSerializer.Meta.fields + ['rank', 'snippet']
+
+    def get_snippet(self, obj):
+        # HTML-safe: the content is escaped before matches are wrapped in <b>
+        return search.highlight(obj.search_snippet)
+
+
+class TemplateSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for the Template model."""
     # Decide if user/crew should be read_only or set based on context
     # If a template is created in a user context, user is set.
@@ -104,16 +119,16 @@ class TemplateSerializer(serializers.ModelSerializer):
         return data 
 
 # Serializer for Plan (if needed independently, otherwise might be nested)
-class PlanSerializer(serializers.ModelSerializer):
+class PlanSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Plan
         fields = ['id', 'plan_list']
         # Consider making plan_list writable here if Plan is created/updated separately
 
-class ChallengeSerializer(serializers.ModelSerializer):
+class ChallengeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for the Challenge model."""
     # plan = PlanSerializer() # Option 1: Nested serializer (read-only by default)
-    plan = serializers.PrimaryKeyRelatedField(queryset=Plan.objects.all()) # Option 2: Use ID
+    plan = serializers.PrimaryKeyRelatedField(queryset=Plan.objects.all(), allow_null=True, required=False) # Option 2: Use ID (null while generation is pending)
     user = serializers.PrimaryKeyRelatedField(read_only=True) # Set in perform_create for USER type
     crew = serializers.PrimaryKeyRelatedField(queryset=Crew.objects.all(), allow_null=True, required=False)
     # kpi_description & kpi_metrics are likely generated by LLM, maybe read_only or set server-side?
@@ -135,6 +150,7 @@ class ChallengeSerializer(serializers.ModelSerializer):
             'kpi_metrics',
             'owner_type',
             'status',
+            'generation_status', # PENDING/RUNNING until the async plan/KPI generation is DONE
             'created_at',
             'initial_plan_description', # Only for creation input
         ]
@@ -143,6 +159,7 @@ class ChallengeSerializer(serializers.ModelSerializer):
             'user', # Set based on owner_type in view
             'kpi_description', # Assuming generated by LLM
             'kpi_metrics', # Assuming generated by LLM
+            'generation_status',
             'created_at'
         ]
 
@@ -156,10 +173,10 @@ class ChallengeSerializer(serializers.ModelSerializer):
         crew = data.get('crew')
 
         # Validate owner type consistency
-        if owner_type == Challenge.ChallengeOwnerType.USER:
+        if owner_type == ChallengeOwnerType.USER:
             if crew:
                 raise serializers.ValidationError("Crew must not be provided for USER owner_type challenge.")
-        elif owner_type == Challenge.ChallengeOwnerType.CREW:
+        elif owner_type == ChallengeOwnerType.CREW:
             if not crew:
                 raise serializers.ValidationError("Crew must be provided for CREW owner_type challenge.")
         else:
@@ -179,7 +196,15 @@ class ChallengeSerializer(serializers.ModelSerializer):
         return data 
 
 
-class RetrospectWeeklyAnalysisSerializer(serializers.ModelSerializer):
+class ChallengeProgressSerializer(ChallengeSerializer):
+    """Challenge with the number of retrospects written for it (a ``retrospect_count`` annotation)."""
+    retrospect_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ChallengeSerializer.Meta):
+        fields = ChallengeSerializer.Meta.fields + ['retrospect_count']
+
+
+class RetrospectWeeklyAnalysisSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for the RetrospectWeeklyAnalysis model."""
     # Decide if user/crew should be read_only or set based on context
     # If a template is created in a user context, user is set.
@@ -0,0 +1,80 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from config import response_cache
+from config.response_cache import scope
+from .models import Challenge, Retrospect, Template, TemplateOwnerType
+from . import search, visibility
+
+OWNER_FIELDS = {'owner_type', 'user', 'user_id', 'crew', 'crew_id'}
+
+
+def template_scope(owner_type, user_id, crew_id):
+    """Response cache scope of the template lists a template appears in."""
+    if owner_type == TemplateOwnerType.COMMON:
+        return scope('templates', 'common')
+    return scope('templates', 'crew', crew_id) if crew_id else scope('templates', 'user', user_id)
+
+
+def challenge_scope(user_id, crew_id):
+    """Response cache scope of the challenge lists a challenge appears in."""
+    return scope('challenges', 'crew', crew_id) if crew_id else scope('challenges', 'user', user_id)
+
+
+def _owner_scope(sender, owner_type, user_id, crew_id):
+    if sender is Template:
+        return template_scope(owner_type, user_id, crew_id)
+    return challenge_scope(user_id, crew_id)
+
+
+@receiver(post_save, sender=Retrospect)
+def sync_visibility_index(sender, instance, raw=False, **kwargs):
+    """Keep the visibility index row of a retrospect up to date (deletes cascade)."""
+    if raw:
+        return
+    visibility.sync_index(instance)
+
+
+@receiver(post_save, sender=Retrospect)
+def sync_search_index(sender, instance, raw=False, **kwargs):
+    """Keep the full-text index in sync with the retrospect content."""
+    if raw:
+        return
+    search.index_retrospect(instance)
+
+
+@receiver(post_delete, sender=Retrospect)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.unindex_retrospect(instance.pk)
+
+
+@receiver(pre_save, sender=Template)
+@receiver(pre_save, sender=Challenge)
+def remember_cached_owner(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the owner before the write: moving a row to another owner changes two lists."""
+    if raw or instance.pk is None or (update_fields is not None and not OWNER_FIELDS & set(update_fields)):
+        return
+    instance._cached_owner = (sender.objects.filter(pk=instance.pk)
+                              .values_list('owner_type', 'user_id', 'crew_id').first())
+
+
+@receiver([post_save, post_delete], sender=Template)
+@receiver([post_save, post_delete], sender=Challenge)
+def invalidate_owner_responses(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = {_owner_scope(sender, instance.owner_type, instance.user_id, instance.crew_id)}
+    previous = instance.__dict__.pop('_cached_owner', None)
+    if previous is not None:
+        scopes.add(_owner_scope(sender, *previous))
+    response_cache.invalidate(*scopes)
+
+
+@receiver([post_save, post_delete], sender=Retrospect)
+def invalidate_challenge_responses(sender, instance, raw=False, **kwargs):
+    """A retrospect is progress on its challenge; drop the cached lists of that challenge."""
+    if raw or instance.challenge_id is None:
+        return
+    owner = Challenge.objects.filter(pk=instance.challenge_id).values_list('user_id', 'crew_id').first()
+    if owner is not None:  # Deleted along with its challenge, which was invalidated already
+        response_cache.invalidate(challenge_scope(*owner))
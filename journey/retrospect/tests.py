@@ -1,3 +1,464 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config import response_cache
+from config.fast_serializers import ValuesSerializer
+from crew.models import Crew, CrewMembership, CrewMembershipStatus
+from user_manager.models import Notification, NotificationType, User
+
+from . import generation, search, visibility, weekly
+from .models import Challenge, ChallengeGenerationStatus, ChallengeOwnerType, Plan, Template, TemplateOwnerType, Retrospect, RetrospectOwnerType, RetrospectVisibility, RetrospectVisibilityIndex, RetrospectWeeklyAnalysis
+from .serializers import ChallengeSerializer, RetrospectSerializer
+
+
+class ValuesSerializerParityTests(TestCase):
+    """config.fast_serializers must produce exactly what the ModelSerializers produce."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='owner@example.com', nickname='owner')
+        cls.crew = Crew.objects.create(crew_name='parity crew')
+        CrewMembership.objects.create(user=cls.user, crew=cls.crew, status=CrewMembershipStatus.ACCEPTED)
+        plan = Plan.objects.create(plan_list=['a', 'b'])
+        cls.challenge = Challenge.objects.create(
+            plan=plan, user=cls.user, challenge_name='run', deadline=timezone.now() + timedelta(days=7),
+            kpi_metrics={'completion_rate': 0.5, 'nested': {'x': [1, 2]}}, owner_type=ChallengeOwnerType.USER,
+        )
+        Challenge.objects.create(
+            crew=cls.crew, challenge_name='crew run', deadline=timezone.now(), kpi_metrics=None,
+            owner_type=ChallengeOwnerType.CREW,
+        )
+        Retrospect.objects.create(
+            challenge=cls.challenge, user=cls.user, content='private', kpi_result=0.25,
+            owner_type=RetrospectOwnerType.USER,
+        )
+        Retrospect.objects.create(
+            challenge=cls.challenge, user=cls.user, crew=cls.crew, content='crew', kpi_result=None,
+            owner_type=RetrospectOwnerType.CREW, visibility=RetrospectVisibility.PUBLIC,
+        )
+
+    def assertParity(self, serializer_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        values_serializer = ValuesSerializer(serializer_class)
+        actual = values_serializer.serialize(values_serializer.project(queryset))
+        self.assertEqual(actual, [dict(item) for item in expected])
+
+    def test_retrospect_serializer(self):
+        self.assertParity(RetrospectSerializer, Retrospect.objects.order_by('id'))
+
+    def test_challenge_serializer(self):
+        self.assertParity(ChallengeSerializer, Challenge.objects.order_by('id'))
+
+    def test_list_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for url in ('/api/retrospect/retrospects/', '/api/retrospect/challenges/'):
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                expected = client.get(url).json()
+            with override_settings(FAST_LIST_SERIALIZATION=True):
+                actual = client.get(url).json()
+            self.assertEqual(actual, expected, url)
+            self.assertEqual(len(actual['results']), 2, url)
+
+
+class StaleGenerationTests(TestCase):
+    """Challenges left RUNNING by a dead worker are requeued and finished."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='gen@example.com', nickname='gen')
+
+    def running(self, name, claimed_ago):
+        return Challenge.objects.create(
+            user=self.user, challenge_name=name, deadline=timezone.now() + timedelta(days=7),
+            owner_type=ChallengeOwnerType.USER, plan_description='run every morning',
+            generation_status=ChallengeGenerationStatus.RUNNING,
+            generation_claimed_at=timezone.now() - claimed_ago,
+        )
+
+    def test_requeue_stale(self):
+        stale = self.running('stale', timedelta(hours=1))
+        fresh = self.running('fresh', timedelta(seconds=5))
+        call_command('process_pending_challenges', '--requeue-stale', '--stale-seconds=600',
+                     stdout=StringIO(), stderr=StringIO())
+
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.generation_status, ChallengeGenerationStatus.DONE)
+        self.assertIsNotNone(stale.plan_id)
+        self.assertEqual(fresh.generation_status, ChallengeGenerationStatus.RUNNING)
+        self.assertTrue(Notification.objects.filter(
+            user=self.user, type=NotificationType.CHALLENGE_READY, object_id=stale.pk).exists())
+
+    def test_requeued_claim_wins(self):
+        challenge = self.running('slow', timedelta(hours=1))
+        challenge.generation_status = ChallengeGenerationStatus.PENDING
+        challenge.save()
+
+        original = generation.generate_kpi_from_challenge
+
+        def requeue_meanwhile(*args):
+            # The slow worker's claim goes stale and the challenge is handed to another one
+            generation.requeue(Challenge.objects.filter(pk=challenge.pk))
+            return original(*args)
+
+        with mock.patch.object(generation, 'generate_kpi_from_challenge', requeue_meanwhile), \
+                self.assertLogs('retrospect.generation', 'WARNING'):
+            self.assertFalse(generation.process_challenge(challenge.pk))
+        challenge.refresh_from_db()
+        self.assertEqual(challenge.generation_status, ChallengeGenerationStatus.PENDING)
+        self.assertTrue(generation.process_challenge(challenge.pk))
+
+
+class VisibilityIndexTests(TestCase):
+    """Each retrospect has one index row under the narrowest scope that may list it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(email='indexed@example.com', nickname='indexed')
+        cls.other = User.objects.create(email='new-owner@example.com', nickname='new-owner')
+        cls.crews = [Crew.objects.create(crew_name=f'index crew {index}') for index in range(2)]
+        deadline = timezone.now() + timedelta(days=7)
+        cls.challenge = Challenge.objects.create(user=cls.author, challenge_name='own', deadline=deadline,
+                                                 owner_type=ChallengeOwnerType.USER)
+        cls.crew_challenge = Challenge.objects.create(crew=cls.crews[0], challenge_name='crew', deadline=deadline,
+                                                      owner_type=ChallengeOwnerType.CREW)
+
+    def retrospect(self, visibility, crew=None):
+        if crew is None:
+            return Retrospect.objects.create(challenge=self.challenge, user=self.author, content='own',
+                                             visibility=visibility, owner_type=RetrospectOwnerType.USER)
+        return Retrospect.objects.create(challenge=self.crew_challenge, user=self.author, crew=crew, content='crew',
+                                         visibility=visibility, owner_type=RetrospectOwnerType.CREW)
+
+    def scope(self, retrospect):
+        return RetrospectVisibilityIndex.objects.filter(retrospect=retrospect).values_list('scope', flat=True).first()
+
+    def test_scopes(self):
+        cases = [
+            (self.retrospect(RetrospectVisibility.PUBLIC), 'PUBLIC'),
+            (self.retrospect(RetrospectVisibility.PRIVATE), f'USER:{self.author.pk}'),
+            (self.retrospect(RetrospectVisibility.CREW, self.crews[0]), f'CREW:{self.crews[0].pk}'),
+            (self.retrospect(RetrospectVisibility.PUBLIC, self.crews[0]), 'PUBLIC'),
+            (self.retrospect(RetrospectVisibility.PRIVATE, self.crews[0]), None),
+        ]
+        self.assertEqual([self.scope(retrospect) for retrospect, _ in cases], [scope for _, scope in cases])
+
+    def test_owner_and_crew_changes(self):
+        own = self.retrospect(RetrospectVisibility.PRIVATE)
+        own.user = self.other
+        own.save()
+        self.assertEqual(self.scope(own), f'USER:{self.other.pk}')
+        own.visibility = RetrospectVisibility.PUBLIC
+        own.save()
+        self.assertEqual(self.scope(own), 'PUBLIC')
+
+        shared = self.retrospect(RetrospectVisibility.CREW, self.crews[0])
+        shared.crew = self.crews[1]
+        shared.save()
+        self.assertEqual(self.scope(shared), f'CREW:{self.crews[1].pk}')
+        shared.visibility = RetrospectVisibility.PRIVATE
+        shared.save()
+        self.assertIsNone(self.scope(shared))
+        self.assertEqual(RetrospectVisibilityIndex.objects.count(), 1)
+
+    def test_listing_follows_membership(self):
+        shared = self.retrospect(RetrospectVisibility.CREW, self.crews[0])
+        public = self.retrospect(RetrospectVisibility.PUBLIC)
+        self.retrospect(RetrospectVisibility.PRIVATE)
+
+        def listed():
+            return list(visibility.visible_retrospects(User.objects.get(pk=self.other.pk)).values_list('pk', flat=True))
+
+        self.assertEqual(listed(), [public.pk])
+        CrewMembership.objects.create(user=self.other, crew=self.crews[0], status=CrewMembershipStatus.ACCEPTED)
+        self.assertEqual(listed(), [public.pk, shared.pk])
+
+    def test_rebuild(self):
+        retrospects = [self.retrospect(RetrospectVisibility.PRIVATE),
+                       self.retrospect(RetrospectVisibility.CREW, self.crews[1]),
+                       self.retrospect(RetrospectVisibility.PRIVATE, self.crews[1])]
+        expected = sorted(RetrospectVisibilityIndex.objects.values_list('retrospect_id', 'scope', 'created_at'))
+        # Drift: a lost row, a wrong scope and a row that should not exist
+        RetrospectVisibilityIndex.objects.filter(retrospect=retrospects[0]).delete()
+        RetrospectVisibilityIndex.objects.filter(retrospect=retrospects[1]).update(scope='PUBLIC')
+        RetrospectVisibilityIndex.objects.create(retrospect=retrospects[2], scope='PUBLIC',
+                                                 created_at=retrospects[2].created_at)
+
+        out = StringIO()
+        call_command('rebuild_retrospect_visibility', '--batch-size', '1', stdout=out)
+        self.assertIn('Indexed 2 retrospects.', out.getvalue())
+        self.assertEqual(sorted(RetrospectVisibilityIndex.objects.values_list('retrospect_id', 'scope', 'created_at')),
+                         expected)
+
+
+class WeeklyAnalysisTests(TestCase):
+    """Incremental runs only regenerate weeks whose retrospects changed since the last run."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='weekly@example.com', nickname='weekly')
+        cls.crew = Crew.objects.create(crew_name='weekly crew')
+        deadline = timezone.now() + timedelta(days=30)
+        cls.challenge = Challenge.objects.create(user=cls.user, challenge_name='own', deadline=deadline,
+                                                 owner_type=ChallengeOwnerType.USER)
+        cls.crew_challenge = Challenge.objects.create(crew=cls.crew, challenge_name='crew', deadline=deadline,
+                                                      owner_type=ChallengeOwnerType.CREW)
+
+    def setUp(self):
+        self.retrospects = [self.retrospect(kpi) for kpi in (40, 60)]
+        Retrospect.objects.create(challenge=self.crew_challenge, user=self.user, crew=self.crew, content='crew',
+                                  kpi_result=10, owner_type=RetrospectOwnerType.CREW)
+        # One of them two weeks back
+        Retrospect.objects.filter(pk=self.retrospects[0].pk).update(created_at=timezone.now() - timedelta(weeks=2))
+
+    def retrospect(self, kpi):
+        return Retrospect.objects.create(challenge=self.challenge, user=self.user, content='done', kpi_result=kpi,
+                                         owner_type=RetrospectOwnerType.USER)
+
+    def run_weekly(self, **kwargs):
+        stats = weekly.generate_weekly_analyses(**kwargs)
+        return {key: stats[key] for key in ('weeks', 'created', 'replaced', 'removed')}
+
+    def kpis(self):
+        return sorted(RetrospectWeeklyAnalysis.objects.values_list('owner_type', 'weekly_kpi'))
+
+    def test_incremental(self):
+        self.assertEqual(self.run_weekly(), {'weeks': 3, 'created': 3, 'replaced': 0, 'removed': 0})
+        self.assertEqual(self.kpis(), [('CREW', 10), ('USER', 40), ('USER', 60)])
+        self.assertEqual(self.run_weekly(), {'weeks': 0, 'created': 0, 'replaced': 0, 'removed': 0})
+
+        # An edit and a new retrospect in the current week regenerate that week only
+        edited = self.retrospects[1]
+        edited.kpi_result = 80
+        edited.save()
+        self.assertEqual(self.run_weekly(), {'weeks': 1, 'created': 1, 'replaced': 1, 'removed': 0})
+        self.retrospect(100)
+        self.assertEqual(self.run_weekly(), {'weeks': 1, 'created': 1, 'replaced': 1, 'removed': 0})
+        self.assertEqual(self.kpis(), [('CREW', 10), ('USER', 40), ('USER', 90)])
+
+        Retrospect.objects.filter(crew=self.crew).delete()
+        self.assertEqual(self.run_weekly(), {'weeks': 0, 'created': 0, 'replaced': 0, 'removed': 1})
+        self.assertEqual(self.run_weekly(full=True)['replaced'], 2)
+
+    def test_edit_during_run(self):
+        edited = self.retrospects[1]
+        summarize_owner = weekly.summarize_owner
+
+        def summarize_then_edit(payload):
+            # The retrospect changes after its row was read, before the analysis is written
+            Retrospect.objects.filter(pk=edited.pk).update(kpi_result=0, updated_at=timezone.now())
+            return summarize_owner(payload)
+
+        with mock.patch.object(weekly, 'summarize_owner', summarize_then_edit):
+            self.run_weekly()
+        self.assertEqual(self.kpis(), [('CREW', 10), ('USER', 40), ('USER', 60)])
+        self.assertEqual(self.run_weekly()['weeks'], 1)
+        self.assertEqual(self.kpis(), [('CREW', 10), ('USER', 0), ('USER', 40)])
+
+
+class ResponseCacheInvalidationTests(TestCase):
+    """Cached template and my-challenge lists are dropped when a row in them changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='lists@example.com', nickname='lists')
+        cls.crew = Crew.objects.create(crew_name='list crew')
+        Template.objects.create(owner_type=TemplateOwnerType.CREW, crew=cls.crew, name='crew template', steps=[])
+        cls.crew_challenge = Challenge.objects.create(
+            crew=cls.crew, challenge_name='crew challenge', deadline=timezone.now() + timedelta(days=7),
+            owner_type=ChallengeOwnerType.CREW,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def names(self, url, key):
+        """Names in the list and whether it came from the response cache."""
+        hits = response_cache.stats()['hits']
+        rows = self.client.get(url).json()['results']
+        return sorted(row[key] for row in rows), response_cache.stats()['hits'] > hits
+
+    def test_templates(self):
+        url = '/api/retrospect/templates/'
+        self.assertEqual(self.names(url, 'name'), ([], False))
+        self.assertEqual(self.names(url, 'name'), ([], True))
+        with self.captureOnCommitCallbacks(execute=True):
+            Template.objects.create(owner_type=TemplateOwnerType.USER, user=self.user, name='mine', steps=[])
+        self.assertEqual(self.names(url, 'name'), (['mine'], False))
+        with self.captureOnCommitCallbacks(execute=True):
+            CrewMembership.objects.create(user=self.user, crew=self.crew, status=CrewMembershipStatus.ACCEPTED)
+        self.assertEqual(self.names(url, 'name'), (['crew template', 'mine'], False))
+
+    def test_my_challenges(self):
+        url = '/api/users/my-challenges/'
+        with self.captureOnCommitCallbacks(execute=True):
+            membership = CrewMembership.objects.create(user=self.user, crew=self.crew,
+                                                       status=CrewMembershipStatus.ACCEPTED)
+        self.assertEqual(self.names(url, 'challenge_name'), (['crew challenge'], False))
+        self.assertEqual(self.names(url, 'challenge_name'), (['crew challenge'], True))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crew_challenge.challenge_name = 'renamed'
+            self.crew_challenge.save()
+        self.assertEqual(self.names(url, 'challenge_name'), (['renamed'], False))
+        with self.captureOnCommitCallbacks(execute=True):
+            Challenge.objects.create(user=self.user, challenge_name='mine', deadline=timezone.now(),
+                                     owner_type=ChallengeOwnerType.USER)
+        self.assertEqual(self.names(url, 'challenge_name'), (['mine', 'renamed'], False))
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.delete()
+        self.assertEqual(self.names(url, 'challenge_name'), (['mine'], False))
+
+    def test_process_local_warning(self):
+        self.assertIn('local to each process', response_cache.process_local_warning())
+        with override_settings(RESPONSE_CACHE={'ALIAS': 'default', 'ENABLED': False}):
+            self.assertIsNone(response_cache.process_local_warning())
+
+
+class ConditionalGetTests(TestCase):
+    """List and detail ETags answer 304 until the visible rows change."""
+    url = '/api/retrospect/retrospects/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='etag@example.com', nickname='etag')
+        author = User.objects.create(email='crewmate@example.com', nickname='crewmate')
+        cls.crews = [Crew.objects.create(crew_name=f'etag crew {index}') for index in range(2)]
+        deadline = timezone.now() + timedelta(days=7)
+        for crew in cls.crews:
+            CrewMembership.objects.create(user=author, crew=crew, status=CrewMembershipStatus.ACCEPTED)
+            challenge = Challenge.objects.create(crew=crew, challenge_name='crew', deadline=deadline,
+                                                 owner_type=ChallengeOwnerType.CREW)
+            Retrospect.objects.create(challenge=challenge, user=author, crew=crew, content='crew',
+                                      visibility=RetrospectVisibility.CREW, owner_type=RetrospectOwnerType.CREW)
+        cls.membership = CrewMembership.objects.create(user=cls.user, crew=cls.crews[0],
+                                                       status=CrewMembershipStatus.ACCEPTED)
+        own = Challenge.objects.create(user=cls.user, challenge_name='own', deadline=deadline,
+                                       owner_type=ChallengeOwnerType.USER)
+        cls.retrospect = Retrospect.objects.create(challenge=own, user=cls.user, content='mine',
+                                                   owner_type=RetrospectOwnerType.USER)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def etag(self, url=url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_not_modified(self):
+        etag = self.etag()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        detail = f'{self.url}{self.retrospect.pk}/'
+        etag = self.etag(detail)
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_update(self):
+        etag = self.etag()
+        self.retrospect.content = 'edited'
+        self.retrospect.save()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_delete(self):
+        etag = self.etag()
+        self.retrospect.delete()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_membership_swap(self):
+        # Leaving one crew and joining another with as many (and older) retrospects keeps
+        # the count and the newest updated_at
+        etag = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.membership.delete()
+            CrewMembership.objects.create(user=self.user, crew=self.crews[1], status=CrewMembershipStatus.ACCEPTED)
+        self.assertNotEqual(self.etag(), etag)
+
+
+class SearchSnippetTests(TestCase):
+    """Search snippets are HTML-escaped around the highlighted matches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='search@example.com', nickname='search')
+        challenge = Challenge.objects.create(user=cls.user, challenge_name='run', deadline=timezone.now(),
+                                             owner_type=ChallengeOwnerType.USER)
+        Retrospect.objects.create(challenge=challenge, user=cls.user, owner_type=RetrospectOwnerType.USER,
+                                  content='<img src=x onerror=alert(1)> 오늘 운동을 했다')
+
+    def test_snippet_is_escaped(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        results = client.get('/api/retrospect/retrospects/search/', {'q': '운동'}).json()['results']
+        self.assertEqual(len(results), 1)
+        snippet = results[0]['snippet']
+        self.assertIn('&lt;img src=x onerror=alert(1)&gt;', snippet)
+        self.assertIn('<b>운동을</b>', snippet)
+        self.assertNotIn('<img', snippet)
+
+    def test_marks_in_content_stay_balanced(self):
+        start, stop = search.MATCH_START, search.MATCH_STOP
+        self.assertEqual(search.highlight(f'{stop}a {start}b{start} c{stop}{stop} {start}d'),
+                         'a <b>b c</b> <b>d</b>')
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= / ?exclude= on retrospect lists, details and cursor pages."""
+    url = '/api/retrospect/retrospects/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='sparse@example.com', nickname='sparse')
+        challenge = Challenge.objects.create(user=cls.user, challenge_name='sparse', deadline=timezone.now(),
+                                             owner_type=ChallengeOwnerType.USER)
+        cls.retrospects = [
+            Retrospect.objects.create(challenge=challenge, user=cls.user, content=f'day {index}',
+                                      owner_type=RetrospectOwnerType.USER)
+            for index in range(5)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list(self):
+        for fast in (True, False):
+            with self.subTest(fast=fast), override_settings(FAST_LIST_SERIALIZATION=fast):
+                rows = self.get(self.url, {'fields': 'id,content,unknown'})['results']
+                self.assertEqual(rows[0], {'id': self.retrospects[-1].pk, 'content': 'day 4'})
+                rows = self.get(self.url, {'exclude': 'content'})['results']
+                self.assertNotIn('content', rows[0])
+                self.assertIn('visibility', rows[0])
+
+    def test_detail(self):
+        retrospect = self.retrospects[0]
+        self.assertEqual(self.get(f'{self.url}{retrospect.pk}/', {'fields': 'id,visibility'}),
+                         {'id': retrospect.pk, 'visibility': retrospect.visibility})
+
+    def test_cursor_pages(self):
+        expected = [retrospect.pk for retrospect in reversed(self.retrospects)]
+        for fast in (True, False):
+            with self.subTest(fast=fast), override_settings(FAST_LIST_SERIALIZATION=fast):
+                ids = []
+                page = self.get(self.url, {'fields': 'id', 'limit': 2})
+                while True:
+                    self.assertTrue(all(row.keys() == {'id'} for row in page['results']))
+                    ids.extend(row['id'] for row in page['results'])
+                    if not page['next']:
+                        break
+                    page = self.get(page['next'])
+                self.assertEqual(ids, expected)
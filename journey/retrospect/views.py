@@ -3,12 +3,23 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.db import transaction
 from django.db.models import Q
-from .models import (Retrospect, Template, Challenge, Plan, ChallengeStatus, 
+from .models import (Retrospect, Template, Challenge, Plan, ChallengeStatus, ChallengeGenerationStatus,
                  RetrospectWeeklyAnalysis, RetrospectVisibility, TemplateOwnerType, 
                  ChallengeOwnerType, RetrospectOwnerType, RetrospectWeeklyAnalysisOwnerType)
-from .serializers import RetrospectSerializer, TemplateSerializer, ChallengeSerializer, PlanSerializer, RetrospectWeeklyAnalysisSerializer
-from crew.models import Crew, CrewMembership, CrewMembershipStatus # Import CrewMembership models
+from .serializers import (RetrospectSerializer, RetrospectSearchResultSerializer, TemplateSerializer,
+                          ChallengeSerializer, PlanSerializer, RetrospectWeeklyAnalysisSerializer)
+from crew.models import Crew
+from config.conditional import ConditionalGetMixin
+from config.fast_serializers import ValuesListMixin
+from config.fieldsets import SparseFieldsetViewMixin
+from config.pagination import KeysetPagination
+from config.response_cache import cached_response, scope
+from rest_framework.pagination import LimitOffsetPagination
+from crew import membership_cache
+from . import generation, search, visibility
+from .generation import generate_plan_from_description, generate_kpi_from_challenge
 from .permissions import (IsRetrospectOwnerOrCrewMemberOrReadOnly, # Use the new permission class
                           IsTemplateOwnerOrCrewMemberOrReadOnly, 
                           IsChallengeOwnerOrCrewMemberOrReadOnly, 
@@ -16,48 +27,32 @@ from .permissions import (IsRetrospectOwnerOrCrewMemberOrReadOnly, # Use the new
 # Create your views here.
 
 
-class RetrospectViewSet(viewsets.ModelViewSet):
+class RetrospectViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """ViewSet for the Retrospect model."""
     serializer_class = RetrospectSerializer
     # Updated permission class
     permission_classes = [IsAuthenticatedOrReadOnly, IsRetrospectOwnerOrCrewMemberOrReadOnly]
+    pagination_class = KeysetPagination
+    # Seek on the visibility index; its created_at is a copy of Retrospect.created_at
+    keyset_ordering = ('-visibility_index__created_at', '-id')
 
     def get_queryset(self):
         """
         Filter retrospects based on user authentication, ownership, crew membership,
         and visibility settings.
+
+        Unauthenticated users only see PUBLIC retrospects. Authenticated users see:
+        1. Their own USER retrospects (regardless of visibility)
+        2. CREW retrospects of crews they are members of (if visibility is CREW or PUBLIC)
+        3. All PUBLIC retrospects
+
+        The rules are precomputed into RetrospectVisibilityIndex (see retrospect.visibility),
+        so this is a single indexed scan ordered by recency.
         """
-        user = self.request.user
         base_queryset = Retrospect.objects.select_related(
             'user', 'crew', 'challenge', 'template'
         ).all()
-
-        if not user.is_authenticated:
-            # Unauthenticated users only see PUBLIC retrospects
-            return base_queryset.filter(visibility=RetrospectVisibility.PUBLIC)
-        
-        # Authenticated users see:
-        # 1. Their own USER retrospects (regardless of visibility)
-        # 2. CREW retrospects of crews they are members of (if visibility is CREW or PUBLIC)
-        # 3. All PUBLIC retrospects (covered by the first filter if owner or the second if member, or separate Q)
-
-        # Get IDs of crews the user is an accepted member of
-        user_crew_ids = CrewMembership.objects.filter(
-            user=user, 
-            status=CrewMembershipStatus.ACCEPTED
-        ).values_list('crew_id', flat=True)
-
-        queryset = base_queryset.filter(
-            # Own USER retrospects (any visibility)
-            Q(owner_type=RetrospectOwnerType.USER, user=user) |
-            # CREW retrospects for their crews (CREW or PUBLIC visibility)
-            (Q(owner_type=RetrospectOwnerType.CREW, crew_id__in=user_crew_ids) & 
-             Q(visibility__in=[RetrospectVisibility.CREW, RetrospectVisibility.PUBLIC])) |
-            # Other PUBLIC retrospects (might overlap, but ensures all public are included)
-            Q(visibility=RetrospectVisibility.PUBLIC)
-        ).distinct() # Use distinct to avoid duplicates if a user owns a public retrospect
-        
-        return queryset
+        return visibility.visible_retrospects(self.request.user, base_queryset)
 
     def perform_create(self, serializer):
         """Set the user field automatically when creating a retrospect.
@@ -67,6 +62,22 @@ class RetrospectViewSet(viewsets.ModelViewSet):
         # Ensure the user is always set as the creator
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """Full-text search over visible retrospects: ?q=<words>.
+        Results are ordered by relevance and include `rank` and a highlighted `snippet`.
+        """
+        query_text = request.query_params.get('q', '').strip()
+        if not search.parse_terms(query_text):
+            return Response({'detail': "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = search.search_retrospects(self.get_queryset(), query_text)
+        # Relevance ordering, so offset paging instead of the (created_at, id) keyset
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = RetrospectSearchResultSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
     # Add specific actions if needed, e.g., linking to crew, etc.
     # Example: List retrospects for a specific challenge or user might be useful
     # @action(detail=False, methods=['get'], url_path='by-challenge/(?P<challenge_id>\\d+)')
@@ -77,11 +88,30 @@ class RetrospectViewSet(viewsets.ModelViewSet):
     # def my_retrospects(self, request):
     #    ...
 
-class TemplateViewSet(viewsets.ModelViewSet):
+def template_cache_scopes(view, request):
+    """Response cache scopes of the templates a user can see (see get_queryset)."""
+    scopes = [scope('templates', 'common')]
+    user = request.user
+    if user.is_authenticated:
+        scopes.append(scope('templates', 'user', user.pk))
+        scopes.append(scope('memberships', user.pk))
+        scopes.extend(scope('templates', 'crew', crew_id) for crew_id in membership_cache.get_accepted_crew_ids(user))
+    return scopes
+
+
+class TemplateViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for the Template model."""
     serializer_class = TemplateSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsTemplateOwnerOrCrewMemberOrReadOnly]
 
+    @cached_response(template_cache_scopes)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response(template_cache_scopes)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_queryset(self):
         """Filter templates:
         - Authenticated users see COMMON templates, their own USER templates,
@@ -92,11 +122,7 @@ class TemplateViewSet(viewsets.ModelViewSet):
         base_queryset = Template.objects.select_related('user', 'crew').all()
 
         if user.is_authenticated:
-            # Corrected: Get crew IDs via CrewMembership
-            user_crew_ids = CrewMembership.objects.filter(
-                user=user,
-                status=CrewMembershipStatus.ACCEPTED
-            ).values_list('crew_id', flat=True)
+            user_crew_ids = membership_cache.get_accepted_crew_ids(user)
 
             return base_queryset.filter(
                 Q(owner_type=TemplateOwnerType.COMMON) |
@@ -118,12 +144,7 @@ class TemplateViewSet(viewsets.ModelViewSet):
             serializer.save(user=user, crew=None)
         elif owner_type == TemplateOwnerType.CREW:
             crew = serializer.validated_data.get('crew')
-            # Corrected: Check membership using CrewMembership
-            if not CrewMembership.objects.filter(
-                crew=crew, 
-                user=user, 
-                status=CrewMembershipStatus.ACCEPTED
-            ).exists():
+            if not membership_cache.is_accepted_member(user, crew):
                  raise permissions.PermissionDenied("You do not have permission to create a template for this crew.")
             serializer.save(user=None, crew=crew)
         elif owner_type == TemplateOwnerType.COMMON:
@@ -132,7 +153,7 @@ class TemplateViewSet(viewsets.ModelViewSet):
         else:
             super().perform_create(serializer)
 
-class ChallengeViewSet(viewsets.ModelViewSet):
+class ChallengeViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """ViewSet for the Challenge model."""
     serializer_class = ChallengeSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsChallengeOwnerOrCrewMemberOrReadOnly]
@@ -147,17 +168,9 @@ class ChallengeViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return Challenge.objects.none()
 
-        queryset = Challenge.objects.select_related('user', 'crew', 'plan').all()
-
-        # Corrected: Get crew IDs via CrewMembership
-        user_crew_ids = CrewMembership.objects.filter(
-            user=user,
-            status=CrewMembershipStatus.ACCEPTED
-        ).values_list('crew_id', flat=True)
-
-        queryset = queryset.filter(
-            Q(owner_type=ChallengeOwnerType.USER, user=user) |
-            Q(owner_type=ChallengeOwnerType.CREW, crew_id__in=user_crew_ids)
+        # The user's own challenges and those of crews they are an accepted member of
+        queryset = visibility.visible_challenges(
+            user, Challenge.objects.select_related('user', 'crew', 'plan')
         ).distinct()
 
         # Filter by status query parameter
@@ -171,12 +184,37 @@ class ChallengeViewSet(viewsets.ModelViewSet):
 
         return queryset
 
-    def perform_create(self, serializer):
+    def wants_async_generation(self, request):
+        """Async creation is requested with ?async=true or `Prefer: respond-async`."""
+        if request.query_params.get('async', '').lower() in ('1', 'true', 'yes'):
+            return True
+        return 'respond-async' in request.headers.get('Prefer', '')
+
+    def create(self, request, *args, **kwargs):
+        """Creates a challenge.
+
+        In async mode the challenge is stored with generation_status=PENDING and 202 is
+        returned right away; a background worker fills in the Plan and KPI, after which the
+        owner gets a CHALLENGE_READY notification. Clients may also poll the challenge.
+        """
+        if not self.wants_async_generation(request):
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            self.perform_create(serializer, defer_generation=True)
+            generation.enqueue_on_commit(serializer.instance.pk)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED, headers=headers)
+
+    def perform_create(self, serializer, defer_generation=False):
         """Handle Challenge creation:
         - Set user or crew based on owner_type.
         - Generate Plan via LLM if initial_plan_description is provided.
         - Generate KPI via LLM.
         - Assign Plan and KPI results to the challenge instance.
+        With defer_generation the LLM steps are left to retrospect.generation.
         """
         owner_type = serializer.validated_data.get('owner_type')
         user = self.request.user
@@ -195,14 +233,21 @@ class ChallengeViewSet(viewsets.ModelViewSet):
             challenge_owner_crew = crew
             if not crew:
                  raise permissions.PermissionDenied("Crew is required for CREW challenge.")
-            # Corrected: Check membership using CrewMembership
-            if not CrewMembership.objects.filter(
-                crew=crew,
-                user=user,
-                status=CrewMembershipStatus.ACCEPTED
-            ).exists():
+            if not membership_cache.is_accepted_member(user, crew):
                  raise permissions.PermissionDenied("You are not a member of this crew.")
 
+        if defer_generation:
+            serializer.validated_data.pop('plan', None)
+            serializer.save(
+                user=challenge_owner_user,
+                crew=challenge_owner_crew,
+                plan=None if initial_plan_description else plan_instance,
+                plan_description=initial_plan_description or '',
+                status=ChallengeStatus.LIVE,
+                generation_status=ChallengeGenerationStatus.PENDING,
+            )
+            return
+
         if initial_plan_description:
             plan_data = generate_plan_from_description(initial_plan_description)
             plan_instance = Plan.objects.create(**plan_data)
@@ -234,26 +279,14 @@ class ChallengeViewSet(viewsets.ModelViewSet):
             return Response({'detail': f'Invalid status. Must be one of {valid_statuses}.'}, status=status.HTTP_400_BAD_REQUEST)
 
         challenge.status = new_status
-        challenge.save(update_fields=['status'])
+        challenge.save(update_fields=['status', 'updated_at'])
 
         serializer = self.get_serializer(challenge)
         return Response(serializer.data)
 
-# --- Placeholder LLM functions --- #
-def generate_plan_from_description(description: str) -> dict:
-    print(f"[LLM Placeholder] Generating plan for: {description}")
-    plan_steps = [f"Step 1 based on '{description}'", f"Step 2 based on '{description}'", "Step 3 generic"]
-    return {"plan_list": plan_steps}
-
-def generate_kpi_from_challenge(challenge_name: str, plan_list: list) -> tuple[str, dict]:
-    print(f"[LLM Placeholder] Generating KPI for: {challenge_name} with plan: {plan_list}")
-    kpi_desc = f"KPI description generated for {challenge_name}."
-    kpi_metrics = {"completion_rate": 0, "step_1_focus": 0, "consistency": 0}
-    return kpi_desc, kpi_metrics
-# --- End Placeholder --- #
 
 
-class RetrospectWeeklyAnalysisViewSet(viewsets.ModelViewSet):
+class RetrospectWeeklyAnalysisViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for the RetrospectWeeklyAnalysis model."""
     serializer_class = RetrospectWeeklyAnalysisSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsRetrospectWeeklyAnalysisOwnerOrCrewMemberOrReadOnly]
@@ -271,10 +304,7 @@ class RetrospectWeeklyAnalysisViewSet(viewsets.ModelViewSet):
         base_queryset = RetrospectWeeklyAnalysis.objects.select_related('user', 'crew').all()
 
         # Get IDs of crews the user is an accepted member of
-        user_crew_ids = CrewMembership.objects.filter(
-            user=user,
-            status=CrewMembershipStatus.ACCEPTED
-        ).values_list('crew_id', flat=True)
+        user_crew_ids = membership_cache.get_accepted_crew_ids(user)
 
         queryset = base_queryset.filter(
             Q(owner_type=RetrospectWeeklyAnalysisOwnerType.USER, user=user) |
@@ -306,11 +336,7 @@ class RetrospectWeeklyAnalysisViewSet(viewsets.ModelViewSet):
             # The serializer validates its presence.
             # Validate if the user is part of the specified crew.
             crew = serializer.validated_data.get('crew')
-            if not CrewMembership.objects.filter(
-                crew=crew,
-                user=user,
-                status=CrewMembershipStatus.ACCEPTED
-            ).exists():
+            if not membership_cache.is_accepted_member(user, crew):
                  raise permissions.PermissionDenied("You do not have permission to create an analysis for this crew.")
             serializer.save(user=None, crew=crew)
         else:
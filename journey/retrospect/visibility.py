@@ -0,0 +1,122 @@
+"""
+Denormalized visibility index for retrospect listings.
+
+Every retrospect that somebody can see gets exactly one RetrospectVisibilityIndex row
+holding the narrowest scope that grants access:
+
+- PUBLIC visibility            -> 'PUBLIC' (everyone)
+- USER retrospect, not public  -> 'USER:<author id>' (author only)
+- CREW retrospect, CREW        -> 'CREW:<crew id>' (accepted members)
+- CREW retrospect, PRIVATE     -> no row (nobody, same as the original query)
+
+A viewer's scopes are derived from the membership cache, so crew membership changes
+need no index writes. Because a retrospect has at most one row, listing is a range
+scan on (scope, created_at) without OR conditions or DISTINCT.
+
+Challenges use the same scope names without an index: ``USER:<owner id>`` for personal
+challenges, ``CREW:<crew id>`` for crew challenges (see ``visible_challenges``).
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from crew import membership_cache
+
+from .models import (Challenge, ChallengeOwnerType, Retrospect, RetrospectVisibilityIndex,
+                     RetrospectVisibility, RetrospectOwnerType)
+
+PUBLIC_SCOPE = 'PUBLIC'
+
+
+def user_scope(user_id):
+    return f'USER:{user_id}'
+
+
+def crew_scope(crew_id):
+    return f'CREW:{crew_id}'
+
+
+def scope_for(retrospect):
+    """Returns the index scope of a retrospect, or None if nobody may list it."""
+    if retrospect.visibility == RetrospectVisibility.PUBLIC:
+        return PUBLIC_SCOPE
+    if retrospect.owner_type == RetrospectOwnerType.USER:
+        return user_scope(retrospect.user_id)
+    if (retrospect.owner_type == RetrospectOwnerType.CREW and retrospect.crew_id is not None
+            and retrospect.visibility == RetrospectVisibility.CREW):
+        return crew_scope(retrospect.crew_id)
+    return None
+
+
+def viewer_scopes(user):
+    """Returns every scope the user can read."""
+    if user is None or not user.is_authenticated:
+        return [PUBLIC_SCOPE]
+    scopes = [PUBLIC_SCOPE, user_scope(user.pk)]
+    scopes.extend(crew_scope(crew_id) for crew_id in membership_cache.get_accepted_crew_ids(user))
+    return scopes
+
+
+def visible_retrospects(user, queryset=None):
+    """Filters retrospects through the index, newest first."""
+    if queryset is None:
+        queryset = Retrospect.objects.all()
+    return queryset.filter(
+        visibility_index__scope__in=viewer_scopes(user)
+    ).order_by('-visibility_index__created_at', '-visibility_index__retrospect_id')
+
+
+def challenge_scope_for(challenge):
+    """Returns the scope that may see a challenge, or None for an ownerless one."""
+    if challenge.owner_type == ChallengeOwnerType.CREW:
+        return crew_scope(challenge.crew_id) if challenge.crew_id is not None else None
+    return user_scope(challenge.user_id) if challenge.user_id is not None else None
+
+
+def visible_challenges(user, queryset=None):
+    """Filters challenges to the user's own and those of crews they are an accepted member of."""
+    if queryset is None:
+        queryset = Challenge.objects.all()
+    if user is None or not user.is_authenticated:
+        return queryset.none()
+    return queryset.filter(
+        Q(owner_type=ChallengeOwnerType.USER, user=user) |
+        Q(owner_type=ChallengeOwnerType.CREW, crew_id__in=membership_cache.get_accepted_crew_ids(user))
+    )
+
+
+def sync_index(retrospect):
+    """Creates, updates or removes the index row of a single retrospect."""
+    scope = scope_for(retrospect)
+    if scope is None:
+        RetrospectVisibilityIndex.objects.filter(retrospect_id=retrospect.pk).delete()
+        return
+    RetrospectVisibilityIndex.objects.update_or_create(
+        retrospect_id=retrospect.pk,
+        defaults={'scope': scope, 'created_at': retrospect.created_at},
+    )
+
+
+def rebuild_index(batch_size=1000):
+    """Recomputes the whole index from the Retrospect table. Returns the number of rows written."""
+    written = 0
+    rows = []
+    retrospects = Retrospect.objects.only(
+        'id', 'user_id', 'crew_id', 'visibility', 'owner_type', 'created_at'
+    ).order_by('pk')
+    with transaction.atomic():
+        RetrospectVisibilityIndex.objects.all().delete()
+        for retrospect in retrospects.iterator(chunk_size=batch_size):
+            scope = scope_for(retrospect)
+            if scope is None:
+                continue
+            rows.append(RetrospectVisibilityIndex(
+                retrospect_id=retrospect.pk, scope=scope, created_at=retrospect.created_at
+            ))
+            if len(rows) >= batch_size:
+                RetrospectVisibilityIndex.objects.bulk_create(rows)
+                written += len(rows)
+                rows = []
+        if rows:
+            RetrospectVisibilityIndex.objects.bulk_create(rows)
+            written += len(rows)
+    return written
@@ -0,0 +1,174 @@
+"""
+Batch generation of RetrospectWeeklyAnalysis rows for every user and crew.
+
+One run:
+
+1. Aggregates retrospects per (owner, week) in the database (count, last update) and
+   compares them with the analyses written by earlier runs. Only weeks without an
+   analysis, with retrospects updated after the run that generated it started, or with
+   a different retrospect count are reprocessed.
+2. Streams the retrospects of those weeks ordered by owner with ``.iterator()``.
+3. Hands each owner's rows to ``weekly_summary.summarize_owner`` in a process pool,
+   a batch of owners at a time so memory stays bounded.
+4. Replaces the stale analyses of the batch and writes the new ones with ``bulk_create``,
+   stamped with the start of the run (``created_at``) so a retrospect edited while the
+   run reads the rows is picked up by the next one. Generated analyses of weeks that no
+   longer have retrospects are removed.
+
+Weeks are ISO weeks (Monday start) in the current time zone. Analyses posted by
+clients are left untouched; only rows marked ``summary.generated_by == 'batch'`` are
+managed here.
+"""
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Count, DateField, Max
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+
+from .models import Retrospect, RetrospectOwnerType, RetrospectWeeklyAnalysis, RetrospectWeeklyAnalysisOwnerType
+from .weekly_summary import summarize_owner
+
+# Retrospect owner type -> (owner column, analysis owner type)
+OWNERS = {
+    RetrospectOwnerType.USER: ('user_id', RetrospectWeeklyAnalysisOwnerType.USER),
+    RetrospectOwnerType.CREW: ('crew_id', RetrospectWeeklyAnalysisOwnerType.CREW),
+}
+GENERATED_BY = 'batch'
+
+
+def _week(field='created_at'):
+    return TruncWeek(field, output_field=DateField())
+
+
+def find_stale_weeks(full=False):
+    """Returns ``(stale, replace_ids, orphan_ids)``.
+
+    ``stale`` maps ``(owner_type, owner_id)`` to the set of week start dates to (re)generate;
+    ``replace_ids`` maps the same keys to ``{week: [analysis ids]}`` that the new rows replace;
+    ``orphan_ids`` are generated analyses whose week no longer has any retrospect.
+    """
+    generated = {}
+    existing = (RetrospectWeeklyAnalysis.objects
+                .filter(summary__generated_by=GENERATED_BY)
+                .values_list('id', 'owner_type', 'user_id', 'crew_id', 'start_date', 'created_at',
+                             'summary__retrospect_count'))
+    for pk, owner_type, user_id, crew_id, start_date, created_at, count in existing.iterator():
+        owner_id = user_id if owner_type == RetrospectWeeklyAnalysisOwnerType.USER else crew_id
+        entry = generated.setdefault((owner_type, owner_id, start_date), {'ids': [], 'created_at': created_at, 'count': count})
+        entry['ids'].append(pk)
+        entry['created_at'] = min(entry['created_at'], created_at)
+
+    stale = {}
+    replace_ids = {}
+    for retrospect_owner_type, (column, owner_type) in OWNERS.items():
+        weeks = (Retrospect.objects
+                 .filter(owner_type=retrospect_owner_type, **{f'{column}__isnull': False})
+                 .annotate(week=_week())
+                 .values(column, 'week')
+                 .annotate(count=Count('id'), last_updated=Max('updated_at'))
+                 .order_by())
+        for row in weeks.iterator():
+            key = (owner_type, row[column])
+            previous = generated.pop(key + (row['week'],), None)
+            if (not full and previous is not None
+                    and previous['created_at'] >= row['last_updated']
+                    and previous['count'] == row['count']):
+                continue
+            stale.setdefault(key, set()).add(row['week'])
+            if previous is not None:
+                replace_ids.setdefault(key, {})[row['week']] = previous['ids']
+    # Whatever was not matched above has lost all of its retrospects
+    orphan_ids = [pk for entry in generated.values() for pk in entry['ids']]
+    return stale, replace_ids, orphan_ids
+
+
+def _week_start_datetime(week):
+    return timezone.make_aware(datetime.combine(week, time.min))
+
+
+def iter_owner_payloads(stale, chunk_size=2000):
+    """Streams retrospect rows of the stale weeks and yields one payload per owner."""
+    for retrospect_owner_type, (column, owner_type) in OWNERS.items():
+        owner_weeks = {owner_id: weeks for (kind, owner_id), weeks in stale.items() if kind == owner_type}
+        if not owner_weeks:
+            continue
+        earliest = min(min(weeks) for weeks in owner_weeks.values())
+        rows = (Retrospect.objects
+                .filter(owner_type=retrospect_owner_type, **{f'{column}__isnull': False},
+                        created_at__gte=_week_start_datetime(earliest))
+                .annotate(week=_week(), day=TruncDate('created_at'))
+                .order_by(column, 'created_at')
+                .values_list(column, 'week', 'challenge_id', 'kpi_result', 'day')
+                .iterator(chunk_size=chunk_size))
+        for owner_id, owner_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            wanted = owner_weeks.get(owner_id)
+            if not wanted:
+                continue
+            weeks = {}
+            for _, week, challenge_id, kpi_result, day in owner_rows:
+                if week in wanted:
+                    weeks.setdefault(week, []).append((challenge_id, kpi_result, day))
+            if weeks:
+                yield (owner_type, owner_id, weeks)
+
+
+def _write_batch(results, replace_ids, batch_size, started_at):
+    analyses = []
+    obsolete = []
+    for result in itertools.chain.from_iterable(results):
+        owner_type, owner_id, week = result['owner_type'], result['owner_id'], result['start_date']
+        obsolete.extend(replace_ids.get((owner_type, owner_id), {}).get(week, ()))
+        analyses.append(RetrospectWeeklyAnalysis(
+            owner_type=owner_type,
+            user_id=owner_id if owner_type == RetrospectWeeklyAnalysisOwnerType.USER else None,
+            crew_id=owner_id if owner_type == RetrospectWeeklyAnalysisOwnerType.CREW else None,
+            start_date=week,
+            end_date=result['end_date'],
+            weekly_kpi=result['weekly_kpi'],
+            summary=result['summary'],
+        ))
+    with transaction.atomic():
+        if obsolete:
+            RetrospectWeeklyAnalysis.objects.filter(pk__in=obsolete).delete()
+        RetrospectWeeklyAnalysis.objects.bulk_create(analyses, batch_size=batch_size)
+        # created_at is auto_now_add, so the run start is set afterwards
+        RetrospectWeeklyAnalysis.objects.filter(pk__in=[analysis.pk for analysis in analyses]).update(
+            created_at=started_at,
+        )
+    return len(analyses), len(obsolete)
+
+
+def generate_weekly_analyses(workers=1, full=False, owners_per_batch=200, chunk_size=2000, batch_size=500):
+    """Runs one incremental pass. Returns counters for reporting."""
+    stats = {'owners': 0, 'weeks': 0, 'created': 0, 'replaced': 0, 'removed': 0}
+    # Retrospects updated from here on may be missing from this run's analyses
+    started_at = timezone.now()
+    stale, replace_ids, orphan_ids = find_stale_weeks(full=full)
+    if orphan_ids:
+        stats['removed'], _ = RetrospectWeeklyAnalysis.objects.filter(pk__in=orphan_ids).delete()
+    if not stale:
+        return stats
+    stats['weeks'] = sum(len(weeks) for weeks in stale.values())
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        payloads = iter_owner_payloads(stale, chunk_size=chunk_size)
+        while True:
+            batch = list(itertools.islice(payloads, owners_per_batch))
+            if not batch:
+                break
+            if executor is not None:
+                results = list(executor.map(summarize_owner, batch))
+            else:
+                results = [summarize_owner(payload) for payload in batch]
+            created, replaced = _write_batch(results, replace_ids, batch_size, started_at)
+            stats['owners'] += len(batch)
+            stats['created'] += created
+            stats['replaced'] += replaced
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return stats
@@ -0,0 +1,59 @@
+"""
+Pure weekly summary computation used by the batch weekly-analysis engine.
+
+This module deliberately has no Django imports: it runs inside process-pool workers,
+which only receive plain tuples and return plain dicts.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+
+def _average(values):
+    return round(sum(values) / len(values), 2) if values else None
+
+
+def summarize_owner(payload):
+    """Builds the analyses of one owner.
+
+    ``payload`` is ``(owner_type, owner_id, weeks)`` where ``weeks`` maps the week start
+    date to a list of ``(challenge_id, kpi_result, created_date)`` rows.
+    Returns one dict per week with the RetrospectWeeklyAnalysis field values.
+    """
+    owner_type, owner_id, weeks = payload
+    analyses = []
+    for week_start, rows in sorted(weeks.items()):
+        kpis = [kpi for _, kpi, _ in rows if kpi is not None]
+
+        per_challenge = defaultdict(list)
+        for challenge_id, kpi, _ in rows:
+            per_challenge[challenge_id].append(kpi)
+        challenges = [
+            {
+                'challenge_id': challenge_id,
+                'retrospect_count': len(values),
+                'kpi_average': _average([kpi for kpi in values if kpi is not None]),
+            }
+            for challenge_id, values in sorted(per_challenge.items())
+        ]
+
+        average = _average(kpis)
+        analyses.append({
+            'owner_type': owner_type,
+            'owner_id': owner_id,
+            'start_date': week_start,
+            'end_date': week_start + timedelta(days=6),
+            'weekly_kpi': round(average) if average is not None else None,
+            'summary': {
+                'retrospect_count': len(rows),
+                'active_days': len({created_date for _, _, created_date in rows}),
+                'kpi': {
+                    'count': len(kpis),
+                    'average': average,
+                    'min': min(kpis) if kpis else None,
+                    'max': max(kpis) if kpis else None,
+                },
+                'challenges': challenges,
+                'generated_by': 'batch',
+            },
+        })
+    return analyses
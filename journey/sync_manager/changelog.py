@@ -0,0 +1,137 @@
+"""
+Change log behind the delta sync endpoint (``/api/sync/?since=<token>``).
+
+Every write to a retrospect, challenge, crew, notification or crew membership appends a
+ChangeLog row in the same transaction: from model signals (sync_manager.signals) and,
+for ``QuerySet.update()`` / ``bulk_create()`` writers that send none, from explicit
+``record_*`` calls. Deletes append a tombstone. The row id is the sync token.
+
+Each row carries the scope allowed to see the change, named like the retrospect
+visibility index ('PUBLIC', 'USER:<id>', 'CREW:<id>'), so a client reads its changes
+with ``scope IN viewer_scopes(user)`` on the (scope, id) index. When an update narrows
+who can see a row (a retrospect made private, a challenge moved to a crew), the previous
+scope gets an entry too, and the endpoint turns it into a delete for viewers who lost
+access. A crew membership change is logged for the member, whose crew challenges and
+retrospects are then re-checked as a whole.
+
+Tokens are only safe if ids become visible in increasing order: a transaction that took
+a lower id but committed after a client read past it would be skipped for good. So
+writers of the log are serialized until they commit. SQLite does that by itself (one
+writer at a time, holding the lock from its first write to the commit); on PostgreSQL
+every write takes a transaction-level advisory lock first, which serializes the
+transactions that log changes. Other databases are rejected by a system check
+(``sync_manager.E001``). ``prune_change_log`` drops entries older than
+``RETENTION_DAYS``; a token from before the oldest remaining entry asks the client for a
+full reload.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from retrospect import visibility
+
+from .models import ChangeAction, ChangeKind, ChangeLog
+
+DEFAULTS = {
+    'MAX_CHANGES': 500,
+    'RETENTION_DAYS': 30,
+}
+
+SUPPORTED_VENDORS = ('sqlite', 'postgresql')
+# pg_advisory_xact_lock key serializing change-log writers (any constant shared by all processes)
+ADVISORY_LOCK_KEY = 0x6A6F75726E6579
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'SYNC', {}))
+    return options
+
+
+def scope_of(kind, instance):
+    """The scope that may see ``instance``, or None when nobody can."""
+    if kind == ChangeKind.RETROSPECT:
+        return visibility.scope_for(instance)
+    if kind == ChangeKind.CHALLENGE:
+        return visibility.challenge_scope_for(instance)
+    if kind == ChangeKind.CREW:
+        return visibility.PUBLIC_SCOPE  # Every user can list every crew
+    # Notifications and memberships only concern their user
+    return visibility.user_scope(instance.user_id)
+
+
+def _entries(kind, instance, action, previous_scope=None):
+    object_id = instance.crew_id if kind == ChangeKind.MEMBERSHIP else instance.pk
+    scopes = {scope_of(kind, instance), previous_scope} - {None}
+    return [ChangeLog(kind=kind, object_id=object_id, action=action, scope=scope) for scope in sorted(scopes)]
+
+
+def _insert(entries):
+    if not entries:
+        return
+    # Lock and insert in one transaction, so the lock is held until the ids are visible
+    with transaction.atomic(savepoint=False):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [ADVISORY_LOCK_KEY])
+        ChangeLog.objects.bulk_create(entries)
+
+
+def record(kind, instance, action=ChangeAction.UPSERT, previous_scope=None):
+    """Logs a change of one instance (and, if given, to the scope that could see it before)."""
+    _insert(_entries(kind, instance, action, previous_scope))
+
+
+def record_many(kind, instances, action=ChangeAction.UPSERT):
+    _insert([entry for instance in instances for entry in _entries(kind, instance, action)])
+
+
+def record_ids(kind, object_ids, scope, action=ChangeAction.UPSERT):
+    """Logs changes of rows sharing one scope without loading them."""
+    _insert([ChangeLog(kind=kind, object_id=object_id, action=action, scope=scope) for object_id in object_ids])
+
+
+def current_token():
+    """Token of the newest change (0 for an empty log)."""
+    return ChangeLog.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def is_expired(token):
+    """True when changes after ``token`` were already pruned."""
+    oldest = ChangeLog.objects.order_by('pk').values_list('pk', flat=True).first()
+    return oldest is not None and token + 1 < oldest
+
+
+def changes_since(user, token, limit=None):
+    """Collapses the changes the user may see after ``token``.
+
+    Returns ``(upserted, deleted, next_token, has_more)`` where the first two map a
+    ChangeKind to object ids; the latest entry of an object wins. Membership entries are
+    keyed by crew id.
+    """
+    limit = limit or get_options()['MAX_CHANGES']
+    # Read up to the newest entry, whoever it belongs to
+    head = current_token()
+    scopes = set(visibility.viewer_scopes(user))
+    # Crews the user left meanwhile: their entries (tombstones included) are still owed
+    scopes.update(
+        visibility.crew_scope(crew_id) for crew_id in ChangeLog.objects.filter(
+            pk__gt=token, pk__lte=head, scope=visibility.user_scope(user.pk), kind=ChangeKind.MEMBERSHIP,
+        ).values_list('object_id', flat=True)
+    )
+    entries = list(
+        ChangeLog.objects.filter(pk__gt=token, pk__lte=head, scope__in=scopes)
+        .order_by('pk').values_list('pk', 'kind', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for pk, kind, object_id, action in entries:
+        latest[kind, object_id] = action
+    upserted = {kind: set() for kind in ChangeKind.values}
+    deleted = {kind: set() for kind in ChangeKind.values}
+    for (kind, object_id), action in latest.items():
+        (upserted if action == ChangeAction.UPSERT else deleted)[kind].add(object_id)
+
+    next_token = entries[-1][0] if has_more else max(token, head)
+    return upserted, deleted, next_token, has_more
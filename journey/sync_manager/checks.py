@@ -0,0 +1,17 @@
+from django.core.checks import Error, register
+from django.db import connections
+
+from .changelog import SUPPORTED_VENDORS
+
+
+@register()
+def check_database_vendor(app_configs, **kwargs):
+    """Sync tokens rely on change-log ids becoming visible in order (see sync_manager.changelog)."""
+    vendor = connections['default'].vendor
+    if vendor in SUPPORTED_VENDORS:
+        return []
+    return [Error(
+        f"Delta sync does not support the '{vendor}' database backend.",
+        hint="The change log serializes its writers on SQLite and PostgreSQL only.",
+        id='sync_manager.E001',
+    )]
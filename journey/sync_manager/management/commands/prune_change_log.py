@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sync_manager.changelog import get_options
+from sync_manager.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = ("Deletes sync change-log entries older than --days (SYNC['RETENTION_DAYS']). "
+            "Clients holding an older token are told to reload. The newest entry is always kept.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None)
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_options()['RETENTION_DAYS']
+        newest = ChangeLog.objects.order_by('-pk').values_list('pk', flat=True).first()
+        if newest is None:
+            self.stdout.write("Change log is empty.")
+            return
+        cutoff = timezone.now() - timedelta(days=days)
+        # Keeping the newest entry lets is_expired() tell pruned tokens apart from an empty log
+        deleted, _ = ChangeLog.objects.filter(created_at__lt=cutoff, pk__lt=newest).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} change-log entries older than {days} days."))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('RETROSPECT', 'Retrospect'), ('CHALLENGE', 'Challenge'), ('CREW', 'Crew'), ('NOTIFICATION', 'Notification'), ('MEMBERSHIP', 'Crew Membership')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('UPSERT', 'Created or Updated'), ('DELETE', 'Deleted')], max_length=10)),
+                ('scope', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope', 'id'], name='changelog_scope_idx')],
+            },
+        ),
+    ]
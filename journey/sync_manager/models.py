@@ -0,0 +1,31 @@
+from django.db import models
+
+
+class ChangeKind(models.TextChoices):
+    RETROSPECT = 'RETROSPECT', 'Retrospect'
+    CHALLENGE = 'CHALLENGE', 'Challenge'
+    CREW = 'CREW', 'Crew'
+    NOTIFICATION = 'NOTIFICATION', 'Notification'
+    MEMBERSHIP = 'MEMBERSHIP', 'Crew Membership'  # object_id 는 크루 ID
+
+
+class ChangeAction(models.TextChoices):
+    UPSERT = 'UPSERT', 'Created or Updated'
+    DELETE = 'DELETE', 'Deleted'
+
+
+class ChangeLog(models.Model):
+    """동기화용 변경 기록 (삭제 시 tombstone 포함). id 가 동기화 토큰"""
+    kind = models.CharField(max_length=20, choices=ChangeKind.choices)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ChangeAction.choices)
+    scope = models.CharField(max_length=50) # 변경을 볼 수 있는 범위 (retrospect.visibility 와 같은 'PUBLIC' / 'USER:<id>' / 'CREW:<id>')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['scope', 'id'], name='changelog_scope_idx'), # 사용자 범위별 토큰 이후 변경 조회
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.kind} {self.object_id} ({self.scope})"
@@ -0,0 +1,55 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from crew.models import Crew, CrewMembership
+from retrospect.models import Challenge, Retrospect
+from user_manager.models import Notification
+
+from .models import ChangeAction, ChangeKind
+from . import changelog
+
+KINDS = {
+    Retrospect: ChangeKind.RETROSPECT,
+    Challenge: ChangeKind.CHALLENGE,
+    Crew: ChangeKind.CREW,
+    Notification: ChangeKind.NOTIFICATION,
+    CrewMembership: ChangeKind.MEMBERSHIP,
+}
+# Fields deciding who can see a row (see changelog.scope_of)
+SCOPE_FIELDS = {
+    Retrospect: ('id', 'visibility', 'owner_type', 'user_id', 'crew_id'),
+    Challenge: ('id', 'owner_type', 'user_id', 'crew_id'),
+}
+
+
+@receiver(pre_save, sender=Retrospect)
+@receiver(pre_save, sender=Challenge)
+def remember_previous_scope(sender, instance, raw=False, **kwargs):
+    """Keep the scope before the write, so viewers losing access get a delete."""
+    if raw or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).only(*SCOPE_FIELDS[sender]).first()
+    if previous is not None:
+        instance._sync_previous_scope = changelog.scope_of(KINDS[sender], previous)
+
+
+@receiver(post_save, sender=Retrospect)
+@receiver(post_save, sender=Challenge)
+@receiver(post_save, sender=Crew)
+@receiver(post_save, sender=Notification)
+@receiver(post_save, sender=CrewMembership)
+def record_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous_scope = instance.__dict__.pop('_sync_previous_scope', None)
+    changelog.record(KINDS[sender], instance, previous_scope=previous_scope)
+
+
+@receiver(post_delete, sender=Retrospect)
+@receiver(post_delete, sender=Challenge)
+@receiver(post_delete, sender=Crew)
+@receiver(post_delete, sender=Notification)
+@receiver(post_delete, sender=CrewMembership)
+def record_delete(sender, instance, **kwargs):
+    """Tombstone for clients that still hold the row."""
+    changelog.record(KINDS[sender], instance, ChangeAction.DELETE)
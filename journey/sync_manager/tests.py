@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from crew.models import Crew, CrewMembership, CrewMembershipStatus
+from retrospect.models import Challenge, ChallengeOwnerType, Retrospect, RetrospectOwnerType, RetrospectVisibility
+from user_manager.models import User
+
+from . import changelog
+from .models import ChangeLog
+
+
+class SyncTests(TestCase):
+    """/api/sync/ delta, tombstones, visibility loss, paging and reset."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create(email='viewer@example.com', nickname='viewer')
+        cls.author = User.objects.create(email='author@example.com', nickname='author')
+        cls.crew = Crew.objects.create(crew_name='sync crew')
+        cls.membership = CrewMembership.objects.create(user=cls.viewer, crew=cls.crew,
+                                                       status=CrewMembershipStatus.ACCEPTED)
+        CrewMembership.objects.create(user=cls.author, crew=cls.crew, status=CrewMembershipStatus.ACCEPTED)
+        deadline = timezone.now() + timedelta(days=7)
+        cls.challenge = Challenge.objects.create(user=cls.author, challenge_name='own', deadline=deadline,
+                                                 owner_type=ChallengeOwnerType.USER)
+        cls.crew_challenge = Challenge.objects.create(crew=cls.crew, challenge_name='crew', deadline=deadline,
+                                                      owner_type=ChallengeOwnerType.CREW)
+
+    def retrospect(self, visibility=RetrospectVisibility.PUBLIC, **kwargs):
+        return Retrospect.objects.create(challenge=self.challenge, user=self.author, content='done',
+                                         visibility=visibility, owner_type=RetrospectOwnerType.USER, **kwargs)
+
+    def sync(self, since=None, user=None):
+        client = APIClient()
+        client.force_authenticate(user or self.viewer)
+        response = client.get('/api/sync/', {} if since is None else {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def updated_ids(self, data, name):
+        return [row['id'] for row in data['changes'][name]['updated']]
+
+    def test_reset_without_token(self):
+        data = self.sync()
+        self.assertTrue(data['reset'])
+        self.assertEqual(data['token'], changelog.current_token())
+
+    def test_delta(self):
+        token = self.sync()['token']
+        retrospect = self.retrospect()
+        data = self.sync(token)
+        self.assertFalse(data['reset'])
+        self.assertEqual(self.updated_ids(data, 'retrospects'), [retrospect.pk])
+        self.assertGreater(data['token'], token)
+
+        data = self.sync(data['token'])
+        self.assertEqual(self.updated_ids(data, 'retrospects'), [])
+
+    def test_private_changes_of_others_are_not_sent(self):
+        token = self.sync()['token']
+        self.retrospect(RetrospectVisibility.PRIVATE)
+        data = self.sync(token)
+        self.assertEqual(data['changes']['retrospects'], {'updated': [], 'deleted': []})
+
+    def test_delete_tombstone(self):
+        retrospect = self.retrospect()
+        token = self.sync()['token']
+        retrospect_id = retrospect.pk
+        retrospect.delete()
+        data = self.sync(token)
+        self.assertEqual(data['changes']['retrospects'], {'updated': [], 'deleted': [retrospect_id]})
+
+    def test_visibility_narrowed(self):
+        retrospect = self.retrospect()
+        token = self.sync()['token']
+        retrospect.visibility = RetrospectVisibility.PRIVATE
+        retrospect.save()
+
+        self.assertEqual(self.sync(token)['changes']['retrospects'], {'updated': [], 'deleted': [retrospect.pk]})
+        self.assertEqual(self.updated_ids(self.sync(token, user=self.author), 'retrospects'), [retrospect.pk])
+
+    def test_left_crew(self):
+        crew_retrospect = Retrospect.objects.create(
+            challenge=self.crew_challenge, user=self.author, crew=self.crew, content='crew',
+            visibility=RetrospectVisibility.CREW, owner_type=RetrospectOwnerType.CREW,
+        )
+        token = self.sync()['token']
+        self.membership.delete()
+        changes = self.sync(token)['changes']
+        self.assertIn(crew_retrospect.pk, changes['retrospects']['deleted'])
+        self.assertIn(self.crew_challenge.pk, changes['challenges']['deleted'])
+
+    @override_settings(SYNC={'MAX_CHANGES': 1})
+    def test_has_more(self):
+        token = self.sync()['token']
+        first, second = self.retrospect(), self.retrospect()
+        data = self.sync(token)
+        self.assertTrue(data['has_more'])
+        self.assertEqual(self.updated_ids(data, 'retrospects'), [first.pk])
+        data = self.sync(data['token'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self.updated_ids(data, 'retrospects'), [second.pk])
+
+    def test_expired_token(self):
+        token = self.sync()['token']
+        self.retrospect()
+        self.retrospect()
+        # prune_change_log dropped everything up to the newest entry
+        ChangeLog.objects.filter(pk__lt=changelog.current_token()).delete()
+        self.assertTrue(self.sync(token)['reset'])
+
+    def test_invalid_token(self):
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        self.assertEqual(client.get('/api/sync/', {'since': 'abc'}).status_code, 400)
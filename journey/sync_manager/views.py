@@ -0,0 +1,77 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from crew.models import Crew
+from crew.serializers import CrewSerializer
+from retrospect import visibility
+from retrospect.models import Challenge, Retrospect
+from retrospect.serializers import ChallengeSerializer, RetrospectSerializer
+from user_manager.models import Notification
+from user_manager.serializer import NotificationSerializer
+
+from . import changelog
+from .models import ChangeKind
+
+# kind -> (response key, serializer, rows the user may see; the viewsets' rules)
+RESOURCES = {
+    ChangeKind.RETROSPECT: ('retrospects', RetrospectSerializer, lambda user: visibility.visible_retrospects(
+        user, Retrospect.objects.select_related('user', 'crew', 'challenge', 'template'))),
+    ChangeKind.CHALLENGE: ('challenges', ChallengeSerializer, lambda user: visibility.visible_challenges(
+        user, Challenge.objects.select_related('user', 'crew', 'plan'))),
+    ChangeKind.CREW: ('crews', CrewSerializer, lambda user: Crew.objects.all()),
+    ChangeKind.NOTIFICATION: ('notifications', NotificationSerializer, lambda user: Notification.objects.filter(user=user)),
+}
+
+
+class SyncView(APIView):
+    """
+    Delta sync for offline clients: GET /api/sync/?since=<token>
+
+    Returns the retrospects, challenges, crews and notifications created, updated or
+    deleted since the token, as ``changes.<name>.updated`` (serialized like the list
+    endpoints) and ``changes.<name>.deleted`` (ids to drop, including rows the user can
+    no longer see), plus the ``token`` for the next call. ``has_more`` asks the client to
+    call again right away. Without ``since``, or with a token older than the change log
+    keeps, ``reset`` is true: reload the lists from their endpoints, then sync from the
+    returned token.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since is None:
+            return self.reset_response()
+        try:
+            token = int(since)
+        except ValueError:
+            return Response({'detail': 'since must be a sync token (integer).'}, status=status.HTTP_400_BAD_REQUEST)
+        if token < 0 or changelog.is_expired(token):
+            return self.reset_response()
+
+        user = request.user
+        upserted, deleted, next_token, has_more = changelog.changes_since(user, token)
+
+        # Joining or leaving a crew changes the visibility of everything the crew owns
+        crew_ids = upserted.pop(ChangeKind.MEMBERSHIP) | deleted.pop(ChangeKind.MEMBERSHIP)
+        if crew_ids:
+            upserted[ChangeKind.CHALLENGE].update(
+                Challenge.objects.filter(crew_id__in=crew_ids).values_list('pk', flat=True))
+            upserted[ChangeKind.RETROSPECT].update(
+                Retrospect.objects.filter(crew_id__in=crew_ids).values_list('pk', flat=True))
+
+        changes = {}
+        context = {'request': request}
+        for kind, (name, serializer_class, visible) in RESOURCES.items():
+            ids = upserted[kind]
+            rows = list(visible(user).filter(pk__in=ids)) if ids else []
+            found = {row.pk for row in rows}
+            changes[name] = {
+                'updated': serializer_class(rows, many=True, context=context).data,
+                'deleted': sorted((ids - found) | deleted[kind]),
+            }
+        return Response({'token': next_token, 'has_more': has_more, 'reset': False, 'changes': changes})
+
+    def reset_response(self):
+        return Response({'token': changelog.current_token(), 'has_more': False, 'reset': True, 'changes': {}})
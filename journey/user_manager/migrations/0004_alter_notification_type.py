@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_manager', '0003_notification_user_notification_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(choices=[('INVITE_CREW', 'Crew Invitation'), ('REQUEST_JOIN_CREW', 'Crew Join Request'), ('ACCEPT_JOIN_CREW', 'Crew Join Accepted'), ('REJECT_JOIN_CREW', 'Crew Join Rejected'), ('WEEKLY_ANALYSIS_DONE', 'Weekly Analysis Completed'), ('CHALLENGE_READY', 'Challenge Generation Completed'), ('CHALLENGE_FAILED', 'Challenge Generation Failed'), ('ETC', 'Etc')], max_length=20),
+        ),
+    ]
@@ -10,6 +10,8 @@ class NotificationType(models.TextChoices):
     ACCEPT_JOIN_CREW = 'ACCEPT_JOIN_CREW', 'Crew Join Accepted'
     REJECT_JOIN_CREW = 'REJECT_JOIN_CREW', 'Crew Join Rejected'
     WEEKLY_ANALYSIS_DONE = 'WEEKLY_ANALYSIS_DONE', 'Weekly Analysis Completed'
+    CHALLENGE_READY = 'CHALLENGE_READY', 'Challenge Generation Completed'
+    CHALLENGE_FAILED = 'CHALLENGE_FAILED', 'Challenge Generation Failed'
     # ... 기타 필요한 타입
     ETC = 'ETC', 'Etc'
 
@@ -46,5 +48,10 @@ class Notification(models.Model):
     object_id = models.PositiveIntegerField(null=True, blank=True) # 관련된 객체의 PK
     related_object = GenericForeignKey('content_type', 'object_id') # 관련 객체에 직접 접근 가능
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='user_notification_recent_idx'), # 알림 목록 (keyset)
+        ]
+
     def __str__(self):
         return f"Notification for {self.user}: {self.content[:50]}"
\ No newline at end of file
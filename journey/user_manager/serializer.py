@@ -3,19 +3,37 @@ from django.contrib.auth.hashers import make_password
 from django.utils.translation import gettext_lazy as _
 from . models import Provider, Notification 
 from rest_framework import serializers
+from config.fieldsets import SparseFieldsetMixin
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
         read_only_fields = ['id']
+        extra_kwargs = {'password': {'write_only': True}} # 해시도 응답에 포함하지 않음
 
     def create(self, validated_data):
         validated_data['password'] = make_password(validated_data['password'])
         return super().create(validated_data)
     
+class PublicUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Public profile of another user, for nested representations (feeds, comments, crew members).
+    Reads only columns of the user row, so select_related('user') serves it without extra queries."""
+    class Meta:
+        model = User
+        fields = ['id', 'nickname', 'profile_image']
+        read_only_fields = fields
+
+class ProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """The signed-in user's own profile. Unlike UserSerializer it leaves out the groups and
+    permissions relations, so serializing request.user needs no query."""
+    class Meta:
+        model = User
+        fields = ['id', 'email', 'nickname', 'profile_image', 'provider', 'date_joined', 'last_login']
+        read_only_fields = fields
+
 class LoginSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -50,7 +68,7 @@ class KakaoUserSerializer(serializers.ModelSerializer):
         validated_data['password'] = make_password(validated_data['password'])
         return super().create(validated_data)
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ['id', 'user', 'type', 'content', 'is_read', 'created_at', 'content_type', 'object_id']
@@ -1,3 +1,175 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from config import batch
+from crew.models import Crew, CrewMembership, CrewMembershipStatus
+from crew.views import CrewViewSet
+from retrospect.models import (Challenge, ChallengeOwnerType, ChallengeStatus, Plan, Retrospect,
+                               RetrospectOwnerType, RetrospectWeeklyAnalysis, RetrospectWeeklyAnalysisOwnerType)
+
+from .models import Notification, NotificationType, User
+
+
+class DashboardTests(TestCase):
+    """/api/users/dashboard/ must stay within its query budget however much data the user has."""
+    QUERY_BUDGET = 5  # JWT user lookup + crews + challenges + unread count + weekly analysis
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='dash@example.com', nickname='dash')
+        other = User.objects.create(email='other@example.com', nickname='other')
+        plan = Plan.objects.create(plan_list=['step 1'])
+        deadline = timezone.now() + timedelta(days=7)
+
+        crews = [Crew.objects.create(crew_name=f'crew {i}') for i in range(3)]
+        for crew in crews:
+            CrewMembership.objects.create(user=cls.user, crew=crew, status=CrewMembershipStatus.ACCEPTED)
+        pending = Crew.objects.create(crew_name='pending crew')
+        CrewMembership.objects.create(user=cls.user, crew=pending, status=CrewMembershipStatus.PENDING)
+
+        def challenge(name, **kwargs):
+            return Challenge.objects.create(plan=plan, challenge_name=name, deadline=deadline, **kwargs)
+
+        cls.own = challenge('own', user=cls.user, owner_type=ChallengeOwnerType.USER)
+        challenge('done', user=cls.user, owner_type=ChallengeOwnerType.USER, status=ChallengeStatus.SUCCESS)
+        for crew in crews:
+            challenge(f'{crew.crew_name} challenge', crew=crew, owner_type=ChallengeOwnerType.CREW)
+        challenge('pending crew challenge', crew=pending, owner_type=ChallengeOwnerType.CREW)
+        challenge('someone else', user=other, owner_type=ChallengeOwnerType.USER)
+        for _ in range(3):
+            Retrospect.objects.create(challenge=cls.own, user=cls.user, content='x', owner_type=RetrospectOwnerType.USER)
+
+        for is_read in (False, False, True):
+            Notification.objects.create(user=cls.user, type=NotificationType.ETC, content='hi', is_read=is_read)
+        for weeks_ago in (2, 1):
+            end = date.today() - timedelta(weeks=weeks_ago)
+            RetrospectWeeklyAnalysis.objects.create(
+                user=cls.user, summary={'weeks_ago': weeks_ago}, start_date=end - timedelta(days=6), end_date=end,
+                owner_type=RetrospectWeeklyAnalysisOwnerType.USER,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_query_budget(self):
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get('/api/users/dashboard/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_content(self):
+        data = self.client.get('/api/users/dashboard/').json()
+        self.assertEqual(data['profile']['email'], 'dash@example.com')
+        self.assertNotIn('password', data['profile'])
+        self.assertEqual([crew['crew_name'] for crew in data['crews']], ['crew 0', 'crew 1', 'crew 2'])
+        self.assertEqual(
+            {challenge['challenge_name']: challenge['retrospect_count'] for challenge in data['live_challenges']},
+            {'own': 3, 'crew 0 challenge': 0, 'crew 1 challenge': 0, 'crew 2 challenge': 0},
+        )
+        self.assertEqual(data['unread_notifications'], 2)
+        self.assertEqual(data['weekly_analysis']['summary'], {'weeks_ago': 1})
+
+    def test_sections_ignore_sparse_fieldsets(self):
+        full = self.client.get('/api/users/dashboard/').json()
+        sparse = self.client.get('/api/users/dashboard/', {'fields': 'profile,crews', 'exclude': 'id'}).json()
+        self.assertEqual(sparse, full)
+        self.assertIn('crew_name', sparse['crews'][0])
+
+
+class SparseFieldsetFallbackTests(TestCase):
+    """Serializers with fields that are not plain columns keep the full query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(2):
+            User.objects.create(email=f'user{index}@example.com', nickname=f'user{index}')
+
+    def test_related_field_kept(self):
+        client = APIClient()
+        rows = client.get('/api/users/', {'exclude': 'email'}).json()['results']
+        self.assertEqual(len(rows), 2)
+        self.assertNotIn('email', rows[0])
+        # groups is a many-to-many relation, so the list query is left whole
+        self.assertEqual(rows[0]['groups'], [])
+        rows = client.get('/api/users/', {'fields': 'id,nickname'}).json()['results']
+        self.assertEqual({row['nickname'] for row in rows}, {'user0', 'user1'})
+        self.assertTrue(all(row.keys() == {'id', 'nickname'} for row in rows))
+
+
+class BatchTests(TestCase):
+    """POST /api/batch/ answers every sub-request on its own (sequentially inside a transaction)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='batch@example.com', nickname='batch')
+        cls.crew = Crew.objects.create(crew_name='batch crew')
+        CrewMembership.objects.create(user=cls.user, crew=cls.crew, status=CrewMembershipStatus.ACCEPTED)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, requests):
+        return self.client.post('/api/batch/', {'requests': requests}, format='json')
+
+    def test_mixed_batch(self):
+        response = self.batch([
+            {'id': 'crew', 'path': f'/api/crew/{self.crew.pk}/'},
+            {'id': 'mine', 'path': '/api/crew/my-crews/'},
+            {'id': 'missing', 'path': '/api/nowhere/'},
+            {'id': 'post', 'path': '/api/crew/', 'method': 'POST'},
+            {'id': 'nested', 'path': '/api/batch/'},
+            {'id': 'outside', 'path': '/admin/'},
+            'not an object',
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = {item['id']: (item['status'], item['body']) for item in response.json()['responses']}
+        self.assertEqual(results['crew'][0], 200)
+        self.assertEqual(results['crew'][1]['crew_name'], 'batch crew')
+        self.assertEqual(results['mine'], (200, [results['crew'][1]]))
+        self.assertEqual(results['missing'][0], 404)
+        for name in ('post', 'nested', 'outside', None):
+            self.assertEqual(results[name][0], 400, name)
+
+    def test_failing_sub_request(self):
+        with mock.patch.object(CrewViewSet, 'retrieve', side_effect=RuntimeError('boom')), \
+                self.assertLogs('config.batch', 'ERROR'):
+            response = self.batch([{'id': 'crew', 'path': f'/api/crew/{self.crew.pk}/'},
+                                   {'id': 'mine', 'path': '/api/crew/my-crews/'}])
+        statuses = [(item['id'], item['status']) for item in response.json()['responses']]
+        self.assertEqual(statuses, [('crew', 500), ('mine', 200)])
+        self.assertNotIn('boom', str(response.json()))
+
+    @override_settings(BATCH={'MAX_REQUESTS': 2})
+    def test_limits(self):
+        self.assertEqual(self.batch([{'path': '/api/crew/'}] * 3).status_code, 400)
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(APIClient().post('/api/batch/', {'requests': [{'path': '/api/crew/'}]},
+                                          format='json').status_code, 401)
+
+
+class ThreadedBatchTests(TransactionTestCase):
+    """Outside a transaction sub-requests run on the thread pool, each on its own connection."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='threads@example.com', nickname='threads')
+        self.crews = [Crew.objects.create(crew_name=f'thread crew {index}') for index in range(3)]
+
+    def test_thread_pool(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        requests = [{'id': crew.pk, 'path': f'/api/crew/{crew.pk}/'} for crew in self.crews]
+        requests.append({'id': 'missing', 'path': '/api/crew/0/'})
+        with mock.patch.object(batch, '_dispatch_in_thread', wraps=batch._dispatch_in_thread) as dispatched:
+            response = client.post('/api/batch/', {'requests': requests}, format='json')
+        self.assertEqual(dispatched.call_count, len(requests))
+        responses = response.json()['responses']
+        self.assertEqual([item['id'] for item in responses], [item['id'] for item in requests])
+        self.assertEqual([item['body'].get('crew_name') for item in responses[:3]],
+                         [crew.crew_name for crew in self.crews])
+        self.assertEqual(responses[3]['status'], 404)
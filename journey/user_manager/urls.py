@@ -3,10 +3,11 @@ from rest_framework.routers import DefaultRouter
 from .views import UserViewSet, NotificationViewSet, UserChallengeStatusView
 
 router = DefaultRouter()
-router.register(r'', UserViewSet, basename='user')
+# Register fixed prefixes before the empty one so '<pk>/' does not shadow them
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'', UserViewSet, basename='user')
 
 urlpatterns = [
-    path('', include(router.urls)),
     path('my-challenges/', UserChallengeStatusView.as_view(), name='my-challenges'),
-]
\ No newline at end of file
+    path('', include(router.urls)),
+]
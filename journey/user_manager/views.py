@@ -3,22 +3,32 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Count, Q
 from token_manager.serializer import CustomTokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth.hashers import check_password
 from .models import Notification
-from .serializer import UserSerializer, LoginSerializer, NotificationSerializer
-from retrospect.models import Challenge, ChallengeOwnerType, ChallengeStatus
-from retrospect.serializers import ChallengeSerializer
-from crew.models import Crew, CrewMembership, CrewMembershipStatus
+from .serializer import UserSerializer, LoginSerializer, NotificationSerializer, ProfileSerializer
+from retrospect.models import (Challenge, ChallengeOwnerType, ChallengeStatus, RetrospectWeeklyAnalysis,
+                               RetrospectWeeklyAnalysisOwnerType)
+from retrospect.serializers import ChallengeSerializer, ChallengeProgressSerializer, RetrospectWeeklyAnalysisSerializer
+from crew import membership_cache
+from crew.models import CrewMembership, CrewMembershipStatus
+from crew.serializers import CrewSerializer
+from config.conditional import ConditionalGetMixin
+from config.fieldsets import SparseFieldsetViewMixin
+from config.pagination import KeysetPagination
+from config.response_cache import cached_response, scope
+from retrospect.visibility import user_scope
+from sync_manager import changelog
+from sync_manager.models import ChangeKind
 
 
 User = get_user_model()
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     authentication_classes = [JWTAuthentication]
@@ -89,17 +99,53 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
 
-class NotificationViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def dashboard(self, request):
+        """Home screen data in one response: profile, accepted crews (with the user's role),
+        LIVE challenges with their retrospect counts, the unread notification count and the
+        latest personal weekly analysis. One query per section after the profile, which is
+        request.user itself: at most 5 including the authentication lookup.
+        """
+        user = request.user
+        context = self.get_serializer_context()
+
+        memberships = list(CrewMembership.objects.filter(user=user, status=CrewMembershipStatus.ACCEPTED)
+                           .select_related('crew').order_by('joined_at', 'id'))
+        # Crew ids come from the memberships above rather than the membership cache, so the count stays fixed
+        live_challenges = Challenge.objects.filter(
+            Q(owner_type=ChallengeOwnerType.USER, user=user) |
+            Q(owner_type=ChallengeOwnerType.CREW, crew_id__in=[membership.crew_id for membership in memberships]),
+            status=ChallengeStatus.LIVE,
+        ).annotate(retrospect_count=Count('retrospects')).order_by('deadline', 'id')
+        unread_count = Notification.objects.filter(user=user, is_read=False).count()
+        weekly_analysis = RetrospectWeeklyAnalysis.objects.filter(
+            owner_type=RetrospectWeeklyAnalysisOwnerType.USER, user=user,
+        ).order_by('-end_date', '-id').first()
+
+        # Sections are embedded by hand: ?fields= / ?exclude= must not reach into them
+        embedded = {'context': context, 'sparse_fieldsets': False}
+        return Response({
+            'profile': ProfileSerializer(user, **embedded).data,
+            'crews': [{**CrewSerializer(membership.crew, **embedded).data, 'role': membership.role}
+                      for membership in memberships],
+            'live_challenges': ChallengeProgressSerializer(live_challenges, many=True, **embedded).data,
+            'unread_notifications': unread_count,
+            'weekly_analysis': (RetrospectWeeklyAnalysisSerializer(weekly_analysis, **embedded).data
+                                if weekly_analysis else None),
+        })
+
+class NotificationViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     사용자의 알림을 조회, 생성, 읽음 처리하는 API (관리자 권한 필요)
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # 현재 로그인한 사용자의 알림만 반환 (GET 요청 시)
         # 생성(POST)은 permission_classes에서 제어
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return Notification.objects.filter(user=self.request.user).order_by('-created_at', '-id')
 
     @action(detail=True, methods=['patch'], url_path='mark-as-read')
     def mark_as_read(self, request, pk=None):
@@ -116,10 +162,23 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def mark_all_as_read(self, request):
         """ 사용자의 모든 알림을 읽음 상태로 변경합니다. """
         notifications = self.get_queryset().filter(is_read=False)
+        # QuerySet.update() sends no signals; log the change for delta sync
+        changelog.record_ids(ChangeKind.NOTIFICATION, list(notifications.values_list('pk', flat=True)),
+                             user_scope(request.user.pk))
         notifications.update(is_read=True)
         return Response({'status': 'all notifications marked as read'}, status=status.HTTP_200_OK)
 
-class UserChallengeStatusView(generics.ListAPIView):
+def challenge_cache_scopes(view, request):
+    """Response cache scopes of the user's own and crew challenges (see UserChallengeStatusView)."""
+    user = request.user
+    return [
+        scope('challenges', 'user', user.pk),
+        scope('memberships', user.pk),
+        *(scope('challenges', 'crew', crew_id) for crew_id in membership_cache.get_accepted_crew_ids(user)),
+    ]
+
+
+class UserChallengeStatusView(SparseFieldsetViewMixin, ConditionalGetMixin, generics.ListAPIView):
     """
     Lists challenges associated with the currently authenticated user.
     This includes challenges owned directly by the user and challenges
@@ -129,16 +188,14 @@ class UserChallengeStatusView(generics.ListAPIView):
     serializer_class = ChallengeSerializer
     permission_classes = [IsAuthenticated]
 
+    @cached_response(challenge_cache_scopes)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
         user = self.request.user
-        try:
-            # Get IDs of crews the user is an accepted member of
-            user_crew_ids = CrewMembership.objects.filter(
-                user=user, 
-                status=CrewMembershipStatus.ACCEPTED
-            ).values_list('crew_id', flat=True)
-        except NameError: # Catch NameError if CrewMembership/Status not imported
-             user_crew_ids = []
+        # Get IDs of crews the user is an accepted member of
+        user_crew_ids = membership_cache.get_accepted_crew_ids(user)
 
         # Base queryset: challenges owned by user OR owned by a crew the user is in
         queryset = Challenge.objects.filter(